@@ -0,0 +1,95 @@
+# benchmarks/bench_amount_sum.py
+"""
+SUM over an integer-cents column vs. the old float column, on the same rows:
+a whole-table total and a per-user GROUP BY. Also reports how far the float
+total drifts from the exact one.
+
+    python -m benchmarks.bench_amount_sum --rows 10000000
+"""
+import argparse
+import asyncio
+import random
+
+from benchmarks.common import timed, percentiles, emit
+
+from sqlalchemy import Table, Column, MetaData, Integer, BigInteger, Float, String, select, func, insert
+
+from db.database import engine
+
+metadata = MetaData()
+
+amounts = Table(
+    "bench_amounts",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("user_id", String(36), nullable=False),
+    Column("amount_float", Float, nullable=False),
+    Column("amount_cents", BigInteger, nullable=False),
+)
+
+
+async def seed(rows: int, users: int, chunk: int = 50_000):
+    rng = random.Random(42)
+    async with engine.begin() as conn:
+        await conn.run_sync(metadata.drop_all)
+        await conn.run_sync(metadata.create_all)
+        for start in range(0, rows, chunk):
+            batch = []
+            for _ in range(min(chunk, rows - start)):
+                cents = rng.randrange(1_000, 500_000)
+                batch.append({
+                    "user_id": f"bench-user-{rng.randrange(users):05d}",
+                    "amount_float": cents / 100,
+                    "amount_cents": cents,
+                })
+            await conn.execute(insert(amounts), batch)
+
+
+def queries() -> dict:
+    c = amounts.c
+    return {
+        "total_float": select(func.sum(c.amount_float)),
+        "total_cents": select(func.sum(c.amount_cents)),
+        "by_user_float": select(c.user_id, func.sum(c.amount_float)).group_by(c.user_id),
+        "by_user_cents": select(c.user_id, func.sum(c.amount_cents)).group_by(c.user_id),
+    }
+
+
+async def main(rows: int, users: int, repeat: int):
+    try:
+        await seed(rows, users)
+
+        results = {}
+        async with engine.connect() as conn:
+            for name, stmt in queries().items():
+                async def run():
+                    (await conn.execute(stmt)).all()
+
+                results[name] = percentiles(await timed(run, repeat))
+
+            float_total = (await conn.execute(select(func.sum(amounts.c.amount_float)))).scalar()
+            cents_total = int((await conn.execute(select(func.sum(amounts.c.amount_cents)))).scalar())
+            await conn.run_sync(metadata.drop_all)
+            await conn.commit()
+
+        emit({
+            "benchmark": "amount_sum",
+            "dialect": engine.dialect.name,
+            "rows": rows,
+            "users": users,
+            "latency": results,
+            "float_total": float_total,
+            "exact_total": cents_total / 100,
+            "float_drift_cents": round(float_total * 100 - cents_total, 4),
+        })
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+    asyncio.run(main(args.rows, args.users, args.repeat))
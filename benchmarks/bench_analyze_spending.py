@@ -0,0 +1,92 @@
+# benchmarks/bench_analyze_spending.py
+"""
+"How did this month compare to last, week by week?" answered by one
+`analyze_spending` call versus the `summarize` calls an LLM makes for the
+same answer (this month, last month, one per week). Reports tool calls,
+latency and response bytes (a proxy for tokens) per question. The result
+cache is off so every call reaches the database.
+
+    python -m benchmarks.bench_analyze_spending --rows 200000 --users 20
+"""
+import argparse
+import asyncio
+import json
+from datetime import date, timedelta
+
+from benchmarks.common import reset_schema, seed, timed, percentiles, emit, user_ids
+
+import main as server
+from db.database import engine
+from db.rollup import backfill
+
+summarize = server.summarize.fn
+analyze_spending = server.analyze_spending.fn
+
+MONTH_START, MONTH_END = date(2024, 3, 1), date(2024, 3, 31)
+PREVIOUS_START, PREVIOUS_END = date(2024, 2, 1), date(2024, 2, 29)
+
+
+def weeks(start: date, end: date):
+    cursor = start
+    while cursor <= end:
+        yield cursor, min(cursor + timedelta(days=6 - cursor.weekday()), end)
+        cursor += timedelta(days=7 - cursor.weekday())
+
+
+def summarize_calls(user_id: str) -> list:
+    ranges = [(MONTH_START, MONTH_END), (PREVIOUS_START, PREVIOUS_END), *weeks(MONTH_START, MONTH_END)]
+    return [lambda s=s, e=e: summarize(user_id, str(s), str(e)) for s, e in ranges]
+
+
+async def ask(calls: list) -> int:
+    """Run one question's calls in sequence (as the LLM would); return response bytes."""
+    size = 0
+    for call in calls:
+        result = await call()
+        size += len(json.dumps(result, default=str))
+    return size
+
+
+async def main(rows: int, users: int, repeat: int):
+    try:
+        await reset_schema(engine)
+        await seed(engine, rows, users)
+        async with engine.begin() as conn:
+            await conn.run_sync(backfill)
+        server.result_cache.enabled = False
+
+        user_id = user_ids(users)[0]
+        flows = {
+            "summarize_sequence": summarize_calls(user_id),
+            "analyze_spending": [
+                lambda: analyze_spending(user_id, str(MONTH_START), str(MONTH_END), bucket="week")
+            ],
+        }
+
+        results = {}
+        for name, calls in flows.items():
+            size = await ask(calls)
+            results[name] = {
+                "tool_calls": len(calls),
+                "response_bytes": size,
+                "latency": percentiles(await timed(lambda: ask(calls), repeat)),
+            }
+
+        emit({
+            "benchmark": "analyze_spending",
+            "dialect": engine.dialect.name,
+            "rows": rows,
+            "users": users,
+            "results": results,
+        })
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(main(args.rows, args.users, args.repeat))
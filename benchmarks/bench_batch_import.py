@@ -0,0 +1,75 @@
+# benchmarks/bench_batch_import.py
+"""
+Import throughput of `add_expenses_batch` (CSV input) versus one
+`add_expense` call per row.
+
+    python -m benchmarks.bench_batch_import --rows 100000 --chunk-size 1000
+"""
+import io
+import csv
+import time
+import argparse
+import asyncio
+
+from benchmarks.common import reset_schema, synthetic_expenses, emit, user_ids
+
+import main as server
+from db.database import engine
+from services.money import from_cents
+
+add_expense = server.add_expense.fn
+add_expenses_batch = server.add_expenses_batch.fn
+
+
+def as_csv(rows: list[dict]) -> str:
+    out = io.StringIO()
+    writer = csv.DictWriter(out, fieldnames=["date", "amount", "category", "subcategory", "note"])
+    writer.writeheader()
+    for row in rows:
+        writer.writerow({**{k: row.get(k) for k in writer.fieldnames}, "amount": from_cents(row["amount_cents"])})
+    return out.getvalue()
+
+
+async def main(rows: int, chunk_size: int, single_rows: int):
+    try:
+        await reset_schema(engine)
+        user_id = user_ids(1)[0]
+        data = list(synthetic_expenses(rows, users=1))
+        text = as_csv(data)
+
+        started = time.perf_counter()
+        result = await add_expenses_batch(user_id, csv_data=text, chunk_size=chunk_size)
+        batch_s = time.perf_counter() - started
+        assert result["status"] == "ok", result
+
+        started = time.perf_counter()
+        for row in data[:single_rows]:
+            await add_expense(
+                user_id, str(row["date"]), from_cents(row["amount_cents"]), row["category"],
+                row["subcategory"], row["note"] or ""
+            )
+        single_s = time.perf_counter() - started
+
+        batch_rate = rows / batch_s
+        single_rate = single_rows / single_s
+        emit({
+            "benchmark": "batch_import",
+            "dialect": engine.dialect.name,
+            "batch": {"rows": rows, "chunk_size": chunk_size, "seconds": round(batch_s, 3),
+                      "rows_per_sec": round(batch_rate)},
+            "single": {"rows": single_rows, "seconds": round(single_s, 3),
+                       "rows_per_sec": round(single_rate)},
+            "speedup": round(batch_rate / single_rate, 1),
+        })
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--single-rows", type=int, default=1000,
+                        help="rows inserted one add_expense call at a time, for comparison")
+    args = parser.parse_args()
+    asyncio.run(main(args.rows, args.chunk_size, args.single_rows))
@@ -0,0 +1,86 @@
+# benchmarks/bench_budget_status.py
+"""
+`budget_status` latency as one user's history grows, against recomputing
+spent-to-date from raw expenses (SUM over the month, GROUP BY category).
+budget_status reads the budgets and the month rollup rows only, so its
+cost should stay flat while the raw sum grows with the history.
+
+    python -m benchmarks.bench_budget_status --sizes 10000,100000,500000
+"""
+import argparse
+import asyncio
+from datetime import date
+
+from benchmarks.common import reset_schema, seed, timed, percentiles, emit, user_ids, CATEGORIES
+
+from sqlalchemy import insert, select, func
+
+import main as server
+from db.database import engine
+from db.rollup import backfill, next_month
+from models.Budget import Budget
+from models.Expense import Expense
+
+budget_status = server.budget_status.fn
+
+MONTH = date(2024, 6, 1)
+
+
+def raw_spent_query(user_id: str, month: date):
+    return (
+        select(Expense.category, func.sum(Expense.amount_cents), func.count())
+        .where(Expense.user_id == user_id)
+        .where(Expense.date >= month, Expense.date < next_month(month))
+        .group_by(Expense.category)
+    )
+
+
+async def run_size(rows: int, repeat: int) -> dict:
+    await reset_schema(engine)
+    await seed(engine, rows, 1)
+    (user_id,) = user_ids(1)
+    async with engine.begin() as conn:
+        await conn.run_sync(backfill)
+        await conn.execute(insert(Budget), [
+            {"user_id": user_id, "month": MONTH, "category": category, "limit_cents": 5_000_000}
+            for category in CATEGORIES
+        ])
+
+    async def counters():
+        result = await budget_status(user_id, MONTH.strftime("%Y-%m"))
+        assert result["status"] == "ok", result
+
+    async def raw():
+        async with engine.connect() as conn:
+            (await conn.execute(raw_spent_query(user_id, MONTH))).all()
+
+    return {
+        "rows": rows,
+        "budgets": len(CATEGORIES),
+        "budget_status": percentiles(await timed(counters, repeat)),
+        "raw_sum": percentiles(await timed(raw, repeat)),
+    }
+
+
+async def main(sizes: list[int], repeat: int):
+    try:
+        server.result_cache.enabled = False
+        server.single_flight.enabled = False
+        results = [await run_size(rows, repeat) for rows in sizes]
+        emit({
+            "benchmark": "budget_status",
+            "dialect": engine.dialect.name,
+            "month": MONTH.strftime("%Y-%m"),
+            "repeat": repeat,
+            "results": results,
+        })
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10000,100000,500000", help="comma-separated history sizes")
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(main([int(n) for n in args.sizes.split(",")], args.repeat))
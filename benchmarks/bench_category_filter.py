@@ -0,0 +1,81 @@
+# benchmarks/bench_category_filter.py
+"""
+Category filters: the old `category ILIKE '%food%'` against `category IN
+(...)` on the normalized values `category_keys` resolves to. Both shapes
+are run as a per-user range SUM and as the edit/delete single-day match,
+with query plans.
+
+    python -m benchmarks.bench_category_filter --rows 1000000 --users 200
+"""
+import argparse
+import asyncio
+from datetime import date
+
+from benchmarks.common import reset_schema, seed, explain, timed, percentiles, emit, user_ids
+
+from sqlalchemy import select, func
+
+from db.database import engine
+from models.Expense import Expense
+from services.categories import category_keys
+
+
+def queries(user_id: str, term: str) -> dict:
+    start, end = date(2023, 1, 1), date(2024, 12, 31)
+    keys = category_keys(term)
+    shapes = {
+        "ilike": Expense.category.ilike(f"%{term}%"),
+        "in": Expense.category.in_(keys),
+    }
+
+    out = {}
+    for shape, condition in shapes.items():
+        out[f"range_sum_{shape}"] = (
+            select(func.sum(Expense.amount_cents))
+            .where(Expense.user_id == user_id, condition, Expense.date.between(start, end))
+        )
+        out[f"day_match_{shape}"] = (
+            select(Expense.id)
+            .where(Expense.user_id == user_id, Expense.date == date(2024, 3, 1), condition)
+        )
+    return out
+
+
+async def main(rows: int, users: int, repeat: int, term: str):
+    try:
+        await reset_schema(engine)
+        await seed(engine, rows, users)
+        user_id = user_ids(users)[0]
+
+        results = {}
+        async with engine.connect() as conn:
+            for name, stmt in queries(user_id, term).items():
+                async def run():
+                    (await conn.execute(stmt)).all()
+
+                results[name] = {
+                    "plan": await explain(conn, stmt),
+                    "latency": percentiles(await timed(run, repeat)),
+                }
+
+        emit({
+            "benchmark": "category_filter",
+            "dialect": engine.dialect.name,
+            "rows": rows,
+            "users": users,
+            "term": term,
+            "keys": category_keys(term),
+            "results": results,
+        })
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=500_000)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--term", default="food")
+    args = parser.parse_args()
+    asyncio.run(main(args.rows, args.users, args.repeat, args.term))
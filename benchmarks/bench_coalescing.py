@@ -0,0 +1,114 @@
+# benchmarks/bench_coalescing.py
+"""
+Synthetic burst of identical read calls: each round, every user fires
+`--fanout` identical `summarize` and `list_expenses` calls at once (an agent
+retrying / fanning out). Run with coalescing and the per-user limit off, then
+each switched on; reports statements sent to the DB, pool checkouts and
+per-call latency. The result cache is disabled so only coalescing is measured.
+
+    python -m benchmarks.bench_coalescing --users 20 --fanout 10 --rounds 20
+"""
+import argparse
+import asyncio
+import time
+
+from benchmarks.common import reset_schema, seed, percentiles, emit, user_ids
+
+from sqlalchemy import event
+
+import main as server
+from db.database import engine
+from db.pool import pool_stats
+from db.rollup import backfill
+
+summarize = server.summarize.fn
+list_expenses = server.list_expenses.fn
+
+MODES = {
+    "baseline": {"coalesce": False, "limit": 0},
+    "coalesce": {"coalesce": True, "limit": 0},
+    "coalesce_and_limit": {"coalesce": True, "limit": 4},
+}
+
+
+async def timed_call(samples: list, fn, *args, **kwargs):
+    started = time.perf_counter()
+    result = await fn(*args, **kwargs)
+    samples.append(time.perf_counter() - started)
+    assert result["status"] in ("ok", "no_data"), result
+
+
+async def burst(users: list[str], fanout: int, samples: list):
+    calls = []
+    for user_id in users:
+        for _ in range(fanout):
+            calls.append(timed_call(samples, summarize, user_id, "2023-01-01", "2024-12-31"))
+            calls.append(timed_call(samples, list_expenses, user_id, "2024-01-01", "2024-03-31"))
+    await asyncio.gather(*calls)
+
+
+async def run_mode(name: str, users: list[str], fanout: int, rounds: int) -> dict:
+    server.single_flight.enabled = MODES[name]["coalesce"]
+    server.user_limiter.limit = MODES[name]["limit"]
+
+    counter = {"statements": 0}
+
+    def before_cursor_execute(*args):
+        counter["statements"] += 1
+
+    checkouts_before = pool_stats(engine, reset_max=True).get("checkouts", 0)
+    event.listen(engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+    samples = []
+    started = time.perf_counter()
+    try:
+        for _ in range(rounds):
+            await burst(users, fanout, samples)
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+    elapsed = time.perf_counter() - started
+    pool = pool_stats(engine)
+
+    return {
+        "mode": name,
+        **MODES[name],
+        "calls": len(samples),
+        "statements": counter["statements"],
+        "statements_per_call": round(counter["statements"] / len(samples), 3),
+        "pool_checkouts": pool.get("checkouts", 0) - checkouts_before,
+        "pool_wait_max_ms": pool.get("wait_max_ms"),
+        "calls_per_sec": round(len(samples) / elapsed),
+        "latency": percentiles(samples),
+    }
+
+
+async def main(rows: int, users: int, fanout: int, rounds: int):
+    try:
+        await reset_schema(engine)
+        await seed(engine, rows, users)
+        async with engine.begin() as conn:
+            await conn.run_sync(backfill)
+
+        server.result_cache.enabled = False
+        ids = user_ids(users)
+        results = [await run_mode(name, ids, fanout, rounds) for name in MODES]
+        emit({
+            "benchmark": "coalescing",
+            "dialect": engine.dialect.name,
+            "rows": rows,
+            "users": users,
+            "fanout": fanout,
+            "rounds": rounds,
+            "results": results,
+        })
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--fanout", type=int, default=10)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(main(args.rows, args.users, args.fanout, args.rounds))
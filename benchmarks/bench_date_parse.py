@@ -0,0 +1,56 @@
+# benchmarks/bench_date_parse.py
+"""
+Date parsing cost: the old per-call `datetime.strptime` versus the cached
+`services.dates.parse_date`, on a mix where a few dates repeat constantly.
+
+    python -m benchmarks.bench_date_parse --calls 200000
+"""
+import random
+import argparse
+import timeit
+from datetime import datetime, timedelta
+
+from benchmarks.common import emit, START_DATE
+
+from services.dates import parse_date, _parse_iso
+
+
+def workload(calls: int, distinct: int, seed: int = 42) -> list[str]:
+    rng = random.Random(seed)
+    pool = [str(START_DATE + timedelta(days=i)) for i in range(distinct)]
+    return [rng.choice(pool) for _ in range(calls)]
+
+
+def main(calls: int, distinct: int):
+    values = workload(calls, distinct)
+
+    def old():
+        for v in values:
+            datetime.strptime(v, "%Y-%m-%d").date()
+
+    def new():
+        for v in values:
+            parse_date(v)
+
+    _parse_iso.cache_clear()
+    new_s = min(timeit.repeat(new, number=1, repeat=3))
+    info = _parse_iso.cache_info()
+    old_s = min(timeit.repeat(old, number=1, repeat=3))
+
+    emit({
+        "benchmark": "date_parse",
+        "calls": calls,
+        "distinct_dates": distinct,
+        "strptime_ns_per_call": round(old_s / calls * 1e9),
+        "parse_date_ns_per_call": round(new_s / calls * 1e9),
+        "speedup": round(old_s / new_s, 1),
+        "cache": {"hits": info.hits, "misses": info.misses, "size": info.currsize},
+    })
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=200_000)
+    parser.add_argument("--distinct", type=int, default=60)
+    args = parser.parse_args()
+    main(args.calls, args.distinct)
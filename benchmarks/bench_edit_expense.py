@@ -0,0 +1,88 @@
+# benchmarks/bench_edit_expense.py
+"""
+Statements issued and latency per `edit_expense` call, for the id path and
+the match-search path, against the pre-rewrite flow (select matches →
+select by id → UPDATE → commit → get).
+
+    python -m benchmarks.bench_edit_expense --edits 500
+"""
+import argparse
+import asyncio
+import itertools
+
+from benchmarks.common import reset_schema, seed, timed, percentiles, emit, user_ids
+
+from sqlalchemy import select, update, and_
+
+import main as server
+from db.database import engine, AsyncSessionLocal
+from models.Expense import Expense
+from services.metrics import count_statements
+from services.money import from_cents
+
+edit_expense = server.edit_expense.fn
+
+
+async def legacy_edit(user_id: str, expense_id: int, new_note: str):
+    """The old four-round-trip flow, kept here for comparison."""
+    async with AsyncSessionLocal() as db:
+        matches = await db.execute(select(Expense).where(and_(Expense.user_id == user_id, Expense.id == expense_id)))
+        matches.scalars().all()
+        found = await db.execute(select(Expense).where(Expense.id == expense_id, Expense.user_id == user_id))
+        found.scalars().first()
+        await db.execute(
+            update(Expense).where(Expense.id == expense_id, Expense.user_id == user_id).values(note=new_note)
+        )
+        await db.commit()
+        await db.get(Expense, expense_id)
+
+
+async def measure(name: str, fn, edits: int) -> dict:
+    with count_statements(engine) as counter:
+        await fn()
+    samples = await timed(fn, edits)
+    return {"path": name, "statements_per_edit": counter["statements"], "latency": percentiles(samples)}
+
+
+async def main(edits: int):
+    try:
+        await reset_schema(engine)
+        await seed(engine, rows=1000, users=1)
+        user_id = user_ids(1)[0]
+
+        async with AsyncSessionLocal() as db:
+            row = (await db.execute(select(Expense.id, Expense.date, Expense.amount_cents)
+                                    .where(Expense.user_id == user_id).limit(1))).first()
+
+        bump = itertools.count(1)
+
+        results = [
+            await measure("legacy_by_id", lambda: legacy_edit(user_id, row.id, "legacy"), edits),
+            await measure("by_id_note", lambda: edit_expense(user_id, id=row.id, new_note="bench"), edits),
+            await measure(
+                "by_match_note",
+                lambda: edit_expense(user_id, date=str(row.date), amount=from_cents(row.amount_cents), new_note="bench"),
+                edits,
+            ),
+            # Runs last: it changes the amount the match path searches for
+            await measure(
+                "by_id_amount",
+                lambda: edit_expense(user_id, id=row.id, new_amount=from_cents(row.amount_cents) + next(bump)),
+                edits,
+            ),
+        ]
+        emit({
+            "benchmark": "edit_expense",
+            "dialect": engine.dialect.name,
+            "update_returning": engine.dialect.update_returning,
+            "results": results,
+        })
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--edits", type=int, default=500)
+    args = parser.parse_args()
+    asyncio.run(main(args.edits))
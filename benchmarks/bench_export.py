@@ -0,0 +1,139 @@
+# benchmarks/bench_export.py
+"""
+export_expenses throughput and peak memory on one user with `--rows`
+expenses (1M by default), against building the same rows as one
+list_expenses-style JSON response.
+
+Every case runs in a fresh interpreter, so its peak RSS is its own:
+
+- rows_per_sec:   exported rows / wall time of the tool call
+- rss_before_mb:  after `import main`, before the call
+- peak_rss_mb:    the process high-water mark once the call returned
+- growth_mb:      peak_rss_mb - rss_before_mb
+
+`listing` is the old path: every row fetched, serialized and dumped into
+one JSON string. Its growth scales with the row count; the exports' stays
+near EXPORT_CHUNK_ROWS rows whatever the total. Parquet is skipped when
+pyarrow is not installed.
+
+    python -m benchmarks.bench_export --rows 1000000 --chunk 10000
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import resource
+import subprocess
+
+from benchmarks.common import ROOT, reset_schema, seed, emit, user_ids
+
+CASES = ("listing", "csv", "csv_gzip", "parquet")
+FIRST_DAY, LAST_DAY = "2023-01-01", "2024-12-31"
+
+
+def rss_mb() -> float:
+    # ru_maxrss is KiB on Linux (bytes on macOS)
+    scale = 1 if sys.platform == "darwin" else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / 2**20
+
+
+# ---------- CHILD: one case per process ---------- #
+
+async def run_case(case: str) -> dict:
+    import main as server
+    from db.database import engine, AsyncSessionLocal
+    from db.reads import select_expenses, encode_rows
+    from models.Expense import Expense
+
+    server.user_limiter.limit = 0
+    user_id = user_ids(1)[0]
+    before = rss_mb()
+    started = time.perf_counter()
+
+    if case == "listing":
+        async with AsyncSessionLocal() as db:
+            rows = (await db.execute(
+                select_expenses(Expense.user_id == user_id).order_by(Expense.date, Expense.id)
+            )).all()
+        payload = json.dumps({"status": "ok", "expenses": encode_rows("rows", rows)})
+        exported, size = len(rows), len(payload)
+    else:
+        result = await server.export_expenses.fn(
+            user_id, FIRST_DAY, LAST_DAY,
+            format="parquet" if case == "parquet" else "csv",
+            compress=case == "csv_gzip",
+        )
+        assert result["status"] == "ok", result
+        exported, size = result["rows"], result["bytes"]
+        os.unlink(result["path"])
+
+    elapsed = time.perf_counter() - started
+    await engine.dispose()
+    peak = rss_mb()
+    return {
+        "case": case,
+        "rows": exported,
+        "seconds": round(elapsed, 3),
+        "rows_per_sec": round(exported / elapsed),
+        "output_mb": round(size / 2**20, 2),
+        "rss_before_mb": round(before, 1),
+        "peak_rss_mb": round(peak, 1),
+        "growth_mb": round(peak - before, 1),
+    }
+
+
+def spawn_case(case: str, chunk: int) -> dict:
+    out = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_export", "--case", case],
+        cwd=ROOT,
+        env={**os.environ, "PYTHONWARNINGS": "ignore", "EXPORT_CHUNK_ROWS": str(chunk)},
+        capture_output=True, text=True, check=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+# ---------- PARENT ---------- #
+
+async def prepare(rows: int):
+    from db.database import engine
+
+    await reset_schema(engine)
+    await seed(engine, rows, 1)
+    await engine.dispose()
+
+
+def main(rows: int, chunk: int, cases: list[str]):
+    from db.database import engine
+    from services.export import parquet_available
+
+    asyncio.run(prepare(rows))
+    results = []
+    for case in cases:
+        if case == "parquet" and not parquet_available():
+            results.append({"case": case, "skipped": "pyarrow not installed"})
+            continue
+        results.append(spawn_case(case, chunk))
+
+    emit({
+        "benchmark": "export",
+        "dialect": engine.dialect.name,
+        "rows": rows,
+        "chunk_rows": chunk,
+        "results": results,
+    })
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--chunk", type=int, default=10_000, help="EXPORT_CHUNK_ROWS for the exports")
+    parser.add_argument("--cases", default=",".join(CASES), help="comma-separated (default: %(default)s)")
+    parser.add_argument("--case", choices=CASES, help=argparse.SUPPRESS)    # child process
+    args = parser.parse_args()
+
+    if args.case:
+        print(json.dumps(asyncio.run(run_case(args.case))))
+    else:
+        main(args.rows, args.chunk, args.cases.split(","))
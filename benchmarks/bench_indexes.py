@@ -0,0 +1,97 @@
+# benchmarks/bench_indexes.py
+"""
+Query plan and latency for the range listing / summary queries, before and
+after migration 1 adds the composite expense indexes.
+
+    python -m benchmarks.bench_indexes --rows 1000000 --users 200
+"""
+import argparse
+import asyncio
+from datetime import date
+
+from benchmarks.common import reset_schema, seed, explain, timed, percentiles, emit, user_ids
+
+from sqlalchemy import select, func, delete
+
+from db.database import engine
+from db.migrations import apply_migrations, schema_version
+from models.Expense import Expense
+
+
+def queries(user_id: str):
+    start, end = date(2024, 3, 1), date(2024, 3, 31)
+    return {
+        "list_range": (
+            select(Expense)
+            .where(Expense.user_id == user_id)
+            .where(Expense.date.between(start, end))
+            .order_by(Expense.date.asc())
+        ),
+        "summarize": (
+            select(Expense.category, func.sum(Expense.amount_cents).label("total_cents"))
+            .where(Expense.user_id == user_id)
+            .where(Expense.date.between(start, end))
+            .group_by(Expense.category)
+            .order_by(Expense.category)
+        ),
+    }
+
+
+async def measure(user_id: str, repeat: int) -> dict:
+    out = {}
+    async with engine.connect() as conn:
+        for name, stmt in queries(user_id).items():
+            async def run():
+                (await conn.execute(stmt)).all()
+
+            out[name] = {
+                "plan": await explain(conn, stmt),
+                "latency": percentiles(await timed(run, repeat)),
+            }
+    return out
+
+
+async def run_benchmark(rows: int, users: int, repeat: int) -> dict:
+    await reset_schema(engine)
+    await seed(engine, rows, users)
+
+    # Simulate a live database created before the indexes existed.
+    async with engine.begin() as conn:
+        for index in Expense.__table__.indexes:
+            if index.name.startswith("ix_expenses_user_"):
+                await conn.run_sync(index.drop)
+        await conn.execute(delete(schema_version))
+
+    user_id = user_ids(users)[0]
+    before = await measure(user_id, repeat)
+
+    async with engine.begin() as conn:
+        applied = await conn.run_sync(apply_migrations)
+
+    after = await measure(user_id, repeat)
+
+    return {
+        "benchmark": "indexes",
+        "dialect": engine.dialect.name,
+        "rows": rows,
+        "users": users,
+        "migrations_applied": applied,
+        "before": before,
+        "after": after,
+    }
+
+
+async def main(rows: int, users: int, repeat: int):
+    try:
+        emit(await run_benchmark(rows, users, repeat))
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(main(args.rows, args.users, args.repeat))
@@ -0,0 +1,55 @@
+# benchmarks/bench_list_format.py
+"""
+Payload bytes and encode time (row handling + json.dumps) of a listing in
+the default per-row shape versus format="columnar", at several sizes.
+Runs in memory on synthetic rows shaped like the read layer's Row tuples.
+
+    python -m benchmarks.bench_list_format --sizes 10000 100000
+"""
+import argparse
+import json
+import timeit
+from collections import namedtuple
+
+from benchmarks.common import emit, synthetic_expenses
+
+from db.reads import serialize, columnar
+
+Row = namedtuple("Row", "id date amount_cents category subcategory note")
+
+
+def rows(n: int) -> list[Row]:
+    return [
+        Row(i, e["date"], e["amount_cents"], e["category"], e["subcategory"], e["note"])
+        for i, e in enumerate(synthetic_expenses(n, users=1), start=1)
+    ]
+
+
+def measure(data: list[Row], repeat: int) -> dict:
+    shapes = {
+        "rows": lambda: json.dumps({"expenses": [serialize(r) for r in data]}),
+        "columnar": lambda: json.dumps({"expenses": columnar(data)}),
+    }
+    out = {}
+    for name, encode in shapes.items():
+        seconds = min(timeit.repeat(encode, number=1, repeat=repeat))
+        out[name] = {"bytes": len(encode().encode("utf-8")), "encode_ms": round(seconds * 1000, 2)}
+
+    out["bytes_ratio"] = round(out["columnar"]["bytes"] / out["rows"]["bytes"], 3)
+    out["encode_speedup"] = round(out["rows"]["encode_ms"] / out["columnar"]["encode_ms"], 2)
+    return out
+
+
+def main(sizes: list[int], repeat: int):
+    emit({
+        "benchmark": "list_format",
+        "results": {str(n): measure(rows(n), repeat) for n in sizes},
+    })
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    main(args.sizes, args.repeat)
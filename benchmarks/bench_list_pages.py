@@ -0,0 +1,69 @@
+# benchmarks/bench_list_pages.py
+"""
+First-page latency and peak Python memory of `list_expenses` in range mode
+as the range widens. With keyset paging both should stay flat.
+
+    python -m benchmarks.bench_list_pages --rows 500000 --users 10
+"""
+import argparse
+import asyncio
+import tracemalloc
+from datetime import timedelta
+
+from benchmarks.common import reset_schema, seed, timed, percentiles, emit, user_ids, START_DATE
+
+import main as server
+from db.database import engine
+
+list_expenses = server.list_expenses.fn
+
+
+async def run_benchmark(rows: int, users: int, repeat: int, limit: int) -> dict:
+    await reset_schema(engine)
+    await seed(engine, rows, users)
+    user_id = user_ids(users)[0]
+
+    out = {}
+    for days in (31, 182, 365, 730):
+        start = str(START_DATE)
+        end = str(START_DATE + timedelta(days=days - 1))
+
+        async def first_page():
+            return await list_expenses(user_id, start_date=start, end_date=end, limit=limit)
+
+        tracemalloc.start()
+        page = await first_page()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        out[f"{days}d"] = {
+            "page_rows": page.get("total", 0),
+            "has_more": page.get("has_more"),
+            "peak_kib": round(peak / 1024, 1),
+            "first_page": percentiles(await timed(first_page, repeat)),
+        }
+    return out
+
+
+async def main(rows: int, users: int, repeat: int, limit: int):
+    try:
+        emit({
+            "benchmark": "list_pages",
+            "dialect": engine.dialect.name,
+            "rows": rows,
+            "users": users,
+            "limit": limit,
+            "ranges": await run_benchmark(rows, users, repeat, limit),
+        })
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--limit", type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(main(args.rows, args.users, args.repeat, args.limit))
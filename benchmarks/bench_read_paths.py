@@ -0,0 +1,68 @@
+# benchmarks/bench_read_paths.py
+"""
+Rows/sec for reading and serializing expenses through full ORM entities
+(`select(Expense)`) versus the column-only read layer in db/reads.py.
+
+    python -m benchmarks.bench_read_paths --rows 100000
+"""
+import argparse
+import asyncio
+import time
+
+from benchmarks.common import reset_schema, seed, emit, user_ids
+
+from sqlalchemy import select
+
+from db.database import engine, AsyncSessionLocal
+from db.reads import select_expenses, serialize
+from models.Expense import Expense
+
+
+async def orm_path(user_id: str) -> int:
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(select(Expense).where(Expense.user_id == user_id))
+        return len([serialize(e) for e in result.scalars().all()])
+
+
+async def core_path(user_id: str) -> int:
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(select_expenses(Expense.user_id == user_id))
+        return len([serialize(row) for row in result.all()])
+
+
+async def rows_per_sec(fn, user_id: str, repeat: int) -> dict:
+    best = float("inf")
+    count = 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        count = await fn(user_id)
+        best = min(best, time.perf_counter() - started)
+    return {"rows": count, "best_s": round(best, 4), "rows_per_sec": round(count / best)}
+
+
+async def main(rows: int, repeat: int):
+    try:
+        await reset_schema(engine)
+        # A single user so every row is read on each pass
+        await seed(engine, rows, users=1)
+        user_id = user_ids(1)[0]
+
+        orm = await rows_per_sec(orm_path, user_id, repeat)
+        core = await rows_per_sec(core_path, user_id, repeat)
+        emit({
+            "benchmark": "read_paths",
+            "dialect": engine.dialect.name,
+            "orm": orm,
+            "core": core,
+            "speedup": round(core["rows_per_sec"] / orm["rows_per_sec"], 2),
+        })
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(main(args.rows, args.repeat))
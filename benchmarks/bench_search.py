@@ -0,0 +1,152 @@
+# benchmarks/bench_search.py
+"""
+search_expenses latency at `--rows` notes (1M by default) spread over
+`--users` users, against the LIKE scan it replaces.
+
+Every row gets a note of 2-6 words. Words are drawn Zipf-style from a few
+real merchant/place words plus generated filler, so some terms are very
+common and most are rare. Cases:
+
+- common / rare / two_terms / prefix: one ranked page of 20
+- common_month: the common term restricted to one month
+- common_page3: third page via next_cursor
+- like_scan / like_scan_rare: the old way, `note LIKE '%term%' OR
+  subcategory LIKE ...` over the user's rows, newest first (unranked).
+  A common term stops after 20 hits; a rare one reads every row.
+
+Latency goes through the tool with the result cache off, rotating users.
+
+    python -m benchmarks.bench_search --rows 1000000 --users 100 --repeat 50
+"""
+import time
+import random
+import asyncio
+import argparse
+from itertools import accumulate, cycle
+
+from benchmarks.common import reset_schema, seed, synthetic_expenses, percentiles, emit, user_ids
+
+from sqlalchemy import insert, or_
+
+import main as server
+from db.database import engine, AsyncSessionLocal
+from db.reads import select_expenses, serialize
+from models.Expense import Expense
+
+search_expenses = server.search_expenses.fn
+
+REAL_WORDS = ["swiggy", "order", "uber", "airport", "office", "lunch", "zomato", "rent", "gift", "mom",
+              "petrol", "pump", "metro", "recharge", "amazon", "groceries", "dinner", "friends", "movie", "tickets"]
+SYLLABLES = ["ka", "ri", "mo", "ta", "ve", "lu", "shi", "po", "na", "de", "xa", "gu", "bel", "tor", "min", "zu"]
+
+
+def vocabulary(size: int, rng) -> list[str]:
+    words = list(REAL_WORDS)
+    seen = set(words)
+    while len(words) < size:
+        word = "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+        if word not in seen:
+            seen.add(word)
+            words.append(word)
+    return words
+
+
+def noted_expenses(rows: int, users: int, words: list[str], seed: int = 7):
+    """synthetic_expenses with a Zipf-distributed multi-word note on every row."""
+    rng = random.Random(seed)
+    cum_weights = list(accumulate(1 / (rank + 1) for rank in range(len(words))))
+    for row in synthetic_expenses(rows, users):
+        row["note"] = " ".join(rng.choices(words, cum_weights=cum_weights, k=rng.randint(2, 6)))
+        yield row
+
+
+async def load(rows: int, users: int, words: list[str], chunk: int = 10_000) -> float:
+    await reset_schema(engine)
+    await seed(engine, 0, users)
+    started = time.perf_counter()
+    async with engine.begin() as conn:
+        batch = []
+        for row in noted_expenses(rows, users, words):
+            batch.append(row)
+            if len(batch) >= chunk:
+                await conn.execute(insert(Expense), batch)
+                batch = []
+        if batch:
+            await conn.execute(insert(Expense), batch)
+    return time.perf_counter() - started
+
+
+async def like_scan(user_id: str, query: str, limit: int = 20):
+    pattern = f"%{query}%"
+    async with AsyncSessionLocal() as db:
+        rows = (await db.execute(
+            select_expenses(Expense.user_id == user_id, or_(Expense.note.like(pattern), Expense.subcategory.like(pattern)))
+            .order_by(Expense.date.desc(), Expense.id.desc())
+            .limit(limit)
+        )).all()
+    return [serialize(row) for row in rows]
+
+
+async def measure(call, users: list[str], repeat: int) -> dict:
+    await call(users[0])    # warm-up
+    rotation = cycle(users)
+    samples = []
+    for _ in range(repeat):
+        user_id = next(rotation)
+        started = time.perf_counter()
+        await call(user_id)
+        samples.append(time.perf_counter() - started)
+    return percentiles(samples)
+
+
+async def main(rows: int, users: int, repeat: int):
+    rng = random.Random(3)
+    words = vocabulary(5_000, rng)
+    common, rare = words[1], words[-1]      # "order" and the least likely word
+    try:
+        load_seconds = await load(rows, users, words)
+        server.user_limiter.limit = 0
+        server.result_cache.enabled = False
+        ids = user_ids(users)
+
+        async def page3(user_id):
+            cursor = None
+            for _ in range(3):
+                result = await search_expenses(user_id, common, cursor=cursor)
+                cursor = result["next_cursor"]
+
+        cases = {
+            "common": lambda u: search_expenses(u, common),
+            "rare": lambda u: search_expenses(u, rare),
+            "two_terms": lambda u: search_expenses(u, "uber airport"),
+            "prefix": lambda u: search_expenses(u, "swig"),
+            "common_month": lambda u: search_expenses(u, common, "2024-03-01", "2024-03-31"),
+            "common_page3": page3,
+            "like_scan": lambda u: like_scan(u, common),
+            "like_scan_rare": lambda u: like_scan(u, rare),
+        }
+        results = {name: await measure(call, ids, repeat) for name, call in cases.items()}
+
+        sample = await search_expenses(ids[0], common)
+        emit({
+            "benchmark": "search",
+            "dialect": engine.dialect.name,
+            "rows": rows,
+            "users": users,
+            "load_rows_per_sec": round(rows / load_seconds),
+            "common_term": common,
+            "rare_term": rare,
+            "common_matches_on_page": sample.get("total"),
+            "latency": results,
+        })
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(main(args.rows, args.users, args.repeat))
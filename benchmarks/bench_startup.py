@@ -0,0 +1,112 @@
+# benchmarks/bench_startup.py
+"""
+Cold-start cost of the server process, per DB_SCHEMA_CHECK mode:
+
+- import_ms: `import main` in a fresh interpreter
+- schema_ms: `ensure_schema` alone against an already-migrated database
+- ready_ms:  `python main.py` spawned until /metrics first answers over HTTP
+
+"always" is the old behaviour (create_all + migration check on every
+start); "auto" reads the schema_version row and skips the rest; "off"
+does no database work.
+
+    python -m benchmarks.bench_startup --repeat 5
+"""
+import os
+import sys
+import time
+import socket
+import asyncio
+import argparse
+import subprocess
+
+from benchmarks.common import ROOT, percentiles, emit
+
+import httpx
+
+from db.database import engine
+from db.migrations import ensure_schema, SCHEMA_CHECK_MODES
+
+IMPORT_SNIPPET = "import time; t = time.perf_counter(); import main; print(time.perf_counter() - t)"
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def server_env(**extra) -> dict:
+    return {**os.environ, "PYTHONWARNINGS": "ignore", **extra}
+
+
+def import_seconds() -> float:
+    out = subprocess.run(
+        [sys.executable, "-c", IMPORT_SNIPPET],
+        cwd=ROOT, env=server_env(), capture_output=True, text=True, check=True,
+    )
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def ready_seconds(mode: str, timeout: float = 60.0) -> float:
+    port = free_port()
+    started = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "main.py"],
+        cwd=ROOT,
+        env=server_env(PORT=str(port), DB_SCHEMA_CHECK=mode),
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            if proc.poll() is not None:
+                raise RuntimeError(f"server exited with {proc.returncode} (mode={mode})")
+            try:
+                if httpx.get(f"http://127.0.0.1:{port}/metrics", timeout=0.5).status_code == 200:
+                    return time.perf_counter() - started
+            except httpx.TransportError:
+                pass
+            time.sleep(0.01)
+        raise TimeoutError(f"server not ready after {timeout}s (mode={mode})")
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+async def schema_seconds(mode: str, repeat: int) -> list[float]:
+    samples = []
+    for _ in range(repeat):
+        await engine.dispose()      # every start opens fresh connections
+        started = time.perf_counter()
+        await ensure_schema(engine, mode)
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+async def main(repeat: int):
+    try:
+        await ensure_schema(engine, "always")   # an already-migrated database
+
+        results = {"import_ms": percentiles([import_seconds() for _ in range(repeat)])}
+        for mode in SCHEMA_CHECK_MODES:
+            results[mode] = {
+                "schema_ms": percentiles(await schema_seconds(mode, repeat * 10)),
+                "ready_ms": percentiles([ready_seconds(mode) for _ in range(repeat)]),
+            }
+
+        emit({
+            "benchmark": "startup",
+            "dialect": engine.dialect.name,
+            "repeat": repeat,
+            "results": results,
+        })
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(main(args.repeat))
@@ -0,0 +1,110 @@
+# benchmarks/bench_write_behind.py
+"""
+add_expense throughput and latency per EXPENSE_WRITE_MODE: `--concurrency`
+callers each add expenses for their own user until `--inserts` calls
+have been made.
+
+- inserts_per_sec: acknowledged calls per second
+- committed_per_sec: the same, counting the final flush on shutdown
+- latency: per-call time as the caller sees it
+
+`sync` commits per call; `group` waits for its batch's commit; `behind`
+replies on enqueue. Every mode is checked to have written every row.
+
+    python -m benchmarks.bench_write_behind --inserts 20000 --concurrency 64
+"""
+import time
+import random
+import asyncio
+import argparse
+from datetime import timedelta
+
+from benchmarks.common import reset_schema, seed, percentiles, emit, user_ids, CATEGORIES, START_DATE
+
+from sqlalchemy import select, func
+
+import main as server
+from db.database import engine
+from db.write_behind import write_behind, WRITE_MODES
+from models.Expense import Expense
+
+add_expense = server.add_expense.fn
+
+
+async def caller(user_id: str, calls: int, rng, samples: list):
+    for _ in range(calls):
+        category = rng.choice(list(CATEGORIES))
+        started = time.perf_counter()
+        result = await add_expense(
+            user_id,
+            date=str(START_DATE + timedelta(days=rng.randrange(365))),
+            amount=round(rng.uniform(10, 5000), 2),
+            category=category,
+            subcategory=rng.choice(CATEGORIES[category]),
+        )
+        samples.append(time.perf_counter() - started)
+        assert result["status"] == "ok", result
+
+
+async def run_mode(mode: str, inserts: int, concurrency: int) -> dict:
+    await reset_schema(engine)
+    await seed(engine, 0, concurrency)
+    users = user_ids(concurrency)
+
+    write_behind.mode = mode
+    write_behind.start(on_commit=server.invalidate_reads)
+    before = write_behind.stats()
+
+    per_caller = inserts // concurrency
+    samples = []
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        caller(user_id, per_caller, random.Random(i), samples)
+        for i, user_id in enumerate(users)
+    ))
+    acknowledged = time.perf_counter() - started
+    await write_behind.stop()
+    committed = time.perf_counter() - started
+    after = write_behind.stats()
+
+    async with engine.connect() as conn:
+        stored = (await conn.execute(select(func.count()).select_from(Expense))).scalar()
+    assert stored == len(samples), (mode, stored, len(samples))
+
+    batches = after["batches"] - before["batches"]
+    return {
+        "mode": mode,
+        "inserts": len(samples),
+        "inserts_per_sec": round(len(samples) / acknowledged),
+        "committed_per_sec": round(len(samples) / committed),
+        "drain_ms": round((committed - acknowledged) * 1000, 3),
+        "batches": batches,
+        "mean_batch": round((after["rows"] - before["rows"]) / batches, 1) if batches else None,
+        "latency": percentiles(samples),
+    }
+
+
+async def main(inserts: int, concurrency: int, modes: list[str]):
+    try:
+        server.user_limiter.limit = 0
+        results = [await run_mode(mode, inserts, concurrency) for mode in modes]
+        emit({
+            "benchmark": "write_behind",
+            "dialect": engine.dialect.name,
+            "inserts": inserts,
+            "concurrency": concurrency,
+            "batch_size": write_behind.batch_size,
+            "batch_delay_ms": write_behind.delay * 1000,
+            "results": results,
+        })
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--inserts", type=int, default=20_000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--modes", default=",".join(WRITE_MODES), help="comma-separated (default: %(default)s)")
+    args = parser.parse_args()
+    asyncio.run(main(args.inserts, args.concurrency, args.modes.split(",")))
@@ -0,0 +1,120 @@
+# benchmarks/common.py
+"""
+Shared setup for the benchmark scripts.
+
+Run them from the repo root, e.g. `python -m benchmarks.bench_indexes`.
+
+Benchmarks never pick up DATABASE_URL from .env — they default to a throwaway
+SQLite file (aiosqlite standing in for MySQL). aiosqlite is in the `dev`
+dependency group, which `uv sync` installs by default. Set
+BENCH_DATABASE_URL to run against a real server instead.
+"""
+import os
+import json
+import time
+import random
+import tempfile
+from datetime import date, timedelta
+
+BENCH_DB_PATH = os.path.join(tempfile.gettempdir(), "km_bench.sqlite3")
+os.environ["DATABASE_URL"] = os.getenv(
+    "BENCH_DATABASE_URL", f"sqlite+aiosqlite:///{BENCH_DB_PATH}"
+)
+
+from sqlalchemy import insert  # noqa: E402
+
+from db.database import Base  # noqa: E402
+from models.User import User  # noqa: E402
+from models.Expense import Expense  # noqa: E402
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+with open(os.path.join(ROOT, "categories.json"), "r", encoding="utf-8") as f:
+    CATEGORIES = json.load(f)
+
+START_DATE = date(2023, 1, 1)
+NOTES = [None, None, "swiggy order", "office lunch", "uber to airport", "monthly bill", "gift for mom"]
+
+
+def user_ids(users: int) -> list[str]:
+    return [f"bench-user-{i:05d}" for i in range(users)]
+
+
+def synthetic_expenses(rows: int, users: int, days: int = 730, seed: int = 42):
+    """Yield `rows` random expense dicts spread over `users` and `days`."""
+    rng = random.Random(seed)
+    ids = user_ids(users)
+    cats = list(CATEGORIES.items())
+    for _ in range(rows):
+        category, subs = rng.choice(cats)
+        yield {
+            "user_id": rng.choice(ids),
+            "date": START_DATE + timedelta(days=rng.randrange(days)),
+            "amount_cents": rng.randrange(1_000, 500_000),
+            "category": category,
+            "subcategory": rng.choice(subs),
+            "note": rng.choice(NOTES),
+        }
+
+
+async def reset_schema(engine):
+    """Drop and recreate every table."""
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+
+
+async def seed(engine, rows: int, users: int, chunk: int = 10_000, days: int = 730):
+    """Insert `users` users and `rows` synthetic expenses in chunks."""
+    async with engine.begin() as conn:
+        await conn.execute(
+            insert(User),
+            [{"id": uid, "email": f"{uid}@bench.local"} for uid in user_ids(users)],
+        )
+        batch = []
+        for row in synthetic_expenses(rows, users, days):
+            batch.append(row)
+            if len(batch) >= chunk:
+                await conn.execute(insert(Expense), batch)
+                batch = []
+        if batch:
+            await conn.execute(insert(Expense), batch)
+
+
+async def explain(conn, stmt) -> list[str]:
+    """Return the dialect's query plan for `stmt` as text lines."""
+    sql = str(stmt.compile(dialect=conn.dialect, compile_kwargs={"literal_binds": True}))
+    prefix = "EXPLAIN QUERY PLAN " if conn.dialect.name == "sqlite" else "EXPLAIN "
+    result = await conn.exec_driver_sql(prefix + sql)
+    return [" | ".join(str(col) for col in row) for row in result.all()]
+
+
+async def timed(fn, repeat: int) -> list[float]:
+    """Await `fn()` `repeat` times and return per-call latencies in seconds."""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await fn()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def percentiles(samples: list[float]) -> dict:
+    """p50/p95/p99/mean in milliseconds."""
+    ordered = sorted(samples)
+
+    def pick(q):
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000
+
+    return {
+        "count": len(ordered),
+        "mean_ms": round(sum(ordered) / len(ordered) * 1000, 3),
+        "p50_ms": round(pick(0.50), 3),
+        "p95_ms": round(pick(0.95), 3),
+        "p99_ms": round(pick(0.99), 3),
+    }
+
+
+def emit(results: dict):
+    """Print results as JSON so runs can be diffed or collected."""
+    print(json.dumps(results, indent=2, default=str))
@@ -0,0 +1,442 @@
+# benchmarks/load_test.py
+"""
+End-to-end load test: boots the `mcp` app in-process (uvicorn on a local
+port, real streamable-HTTP MCP sessions), seeds synthetic users and
+expenses, then replays a weighted tool mix at fixed concurrency and reports
+throughput and per-tool latency percentiles as JSON.
+
+    python -m benchmarks.load_test run --users 50 --rows 50000 --concurrency 16 --duration 30 --out base.json
+    python -m benchmarks.load_test run ... --out new.json
+    python -m benchmarks.load_test compare base.json new.json --threshold 10
+
+`--transport memory` skips HTTP and talks to the server object directly,
+which isolates tool cost from transport cost. `compare` exits non-zero
+when any tool's p99 or overall throughput regressed by more than
+`--threshold` percent.
+
+`--workers N` runs the server as `python main.py` with WEB_CONCURRENCY=N
+(N processes on one port) instead of in-process, and `--client-procs P`
+spreads the callers over P processes so the load generator isn't the
+bottleneck. `scale` repeats `run` for each worker count:
+
+    python -m benchmarks.load_test scale --workers 1,2,4 --client-procs 4 --duration 30
+"""
+import os
+import sys
+import json
+import time
+import socket
+import random
+import asyncio
+import argparse
+import contextlib
+import subprocess
+import multiprocessing
+from collections import defaultdict
+from datetime import timedelta
+
+from benchmarks.common import reset_schema, seed, percentiles, emit, user_ids, CATEGORIES, START_DATE, ROOT
+
+from sqlalchemy import select
+
+from db.rollup import backfill
+
+DEFAULT_MIX = "add_expense=20,list_expenses=30,summarize=30,edit_expense=10,delete_expense=10"
+
+# Seeded data spans START_DATE .. START_DATE + DAYS
+DAYS = 730
+
+
+def parse_mix(text: str) -> dict[str, int]:
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        mix[name.strip()] = int(weight or 1)
+    return mix
+
+
+class Workload:
+    """Turns (tool name, rng) into call arguments, tracking ids users own."""
+
+    def __init__(self, users: list[str], ids: dict[str, list[int]]):
+        self.users = users
+        self.ids = ids
+
+    def _month(self, rng) -> tuple[str, str]:
+        start = (START_DATE + timedelta(days=rng.randrange(DAYS))).replace(day=1)
+        end = (start.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
+        return str(start), str(end)
+
+    def _owned_id(self, user_id: str, rng, pop: bool = False):
+        owned = self.ids.get(user_id)
+        if not owned:
+            return None
+        i = rng.randrange(len(owned))
+        if not pop:
+            return owned[i]
+        owned[i], owned[-1] = owned[-1], owned[i]
+        return owned.pop()
+
+    def arguments(self, tool: str, rng) -> dict | None:
+        user_id = rng.choice(self.users)
+
+        if tool == "add_expense":
+            category = rng.choice(list(CATEGORIES))
+            return {
+                "user_id": user_id,
+                "date": str(START_DATE + timedelta(days=rng.randrange(DAYS))),
+                "amount": round(rng.uniform(10, 5000), 2),
+                "category": category,
+                "subcategory": rng.choice(CATEGORIES[category]),
+            }
+        if tool in ("list_expenses", "summarize", "analyze_spending"):
+            start, end = self._month(rng)
+            return {"user_id": user_id, "start_date": start, "end_date": end}
+        if tool == "edit_expense":
+            expense_id = self._owned_id(user_id, rng)
+            if expense_id is None:
+                return None
+            return {"user_id": user_id, "id": expense_id, "new_amount": round(rng.uniform(10, 5000), 2)}
+        if tool == "delete_expense":
+            expense_id = self._owned_id(user_id, rng, pop=True)
+            if expense_id is None:
+                return None
+            return {"user_id": user_id, "id": expense_id}
+        raise ValueError(f"No workload for tool '{tool}'")
+
+    def observe(self, tool: str, arguments: dict, result: dict):
+        if tool == "add_expense" and result.get("status") == "ok":
+            self.ids.setdefault(arguments["user_id"], []).append(result["data"]["id"])
+
+
+async def owned_ids(engine, users: list[str], per_user: int = 200) -> dict[str, list[int]]:
+    from models.Expense import Expense
+
+    ids = {}
+    async with engine.connect() as conn:
+        for user_id in users:
+            result = await conn.execute(
+                select(Expense.id).where(Expense.user_id == user_id).limit(per_user)
+            )
+            ids[user_id] = list(result.scalars().all())
+    return ids
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@contextlib.asynccontextmanager
+async def serve(server, transport: str):
+    """Yield a factory returning a new fastmcp Client for the chosen transport."""
+    from fastmcp import Client
+
+    if transport == "memory":
+        yield lambda: Client(server)
+        return
+
+    import uvicorn
+
+    port = free_port()
+    config = uvicorn.Config(server.http_app(), host="127.0.0.1", port=port, log_level="warning", lifespan="on")
+    http = uvicorn.Server(config)
+    task = asyncio.create_task(http.serve())
+    while not http.started:
+        if task.done():
+            task.result()   # surfaces the startup error
+        await asyncio.sleep(0.05)
+    try:
+        yield lambda: Client(f"http://127.0.0.1:{port}/mcp")
+    finally:
+        http.should_exit = True
+        await task
+
+
+@contextlib.asynccontextmanager
+async def spawn_server(workers: int, timeout: float = 120.0):
+    """`python main.py` with `workers` processes; yields its MCP URL once /metrics answers."""
+    import httpx
+
+    port = free_port()
+    proc = subprocess.Popen(
+        [sys.executable, "main.py"],
+        cwd=ROOT,
+        env={**os.environ, "WEB_CONCURRENCY": str(workers), "PORT": str(port), "PYTHONWARNINGS": "ignore"},
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    base = f"http://127.0.0.1:{port}"
+    try:
+        async with httpx.AsyncClient() as http:
+            deadline = time.perf_counter() + timeout
+            while True:
+                if proc.poll() is not None:
+                    raise RuntimeError(f"server exited with {proc.returncode}")
+                if time.perf_counter() > deadline:
+                    raise TimeoutError(f"server not ready after {timeout}s")
+                try:
+                    if (await http.get(f"{base}/metrics")).status_code == 200:
+                        break
+                except httpx.TransportError:
+                    pass
+                await asyncio.sleep(0.1)
+        yield f"{base}/mcp"
+    finally:
+        proc.terminate()
+        await asyncio.to_thread(proc.wait)
+
+
+async def worker(client_factory, workload: Workload, mix: dict, rng, deadline: float, samples, failures):
+    tools, weights = list(mix), list(mix.values())
+    async with client_factory() as client:
+        while time.perf_counter() < deadline:
+            tool = rng.choices(tools, weights)[0]
+            arguments = workload.arguments(tool, rng)
+            if arguments is None:
+                continue
+
+            started = time.perf_counter()
+            try:
+                result = await client.call_tool(tool, arguments, raise_on_error=False)
+                data = result.structured_content or {}
+                data = data.get("result", data)
+                ok = not result.is_error and data.get("status") != "error"
+            except Exception:
+                data, ok = {}, False
+            samples[tool].append(time.perf_counter() - started)
+
+            if ok:
+                workload.observe(tool, arguments, data)
+            else:
+                failures[tool] += 1
+
+
+def generate(url: str, workload: Workload, mix: dict, seeds: list[int], duration: float):
+    """Client process body: `len(seeds)` callers against `url` for `duration` seconds."""
+    from fastmcp import Client
+
+    async def main():
+        samples = defaultdict(list)
+        failures = defaultdict(int)
+        deadline = time.perf_counter() + duration
+        await asyncio.gather(*(
+            worker(lambda: Client(url), workload, mix, random.Random(s), deadline, samples, failures)
+            for s in seeds
+        ))
+        return dict(samples), dict(failures)
+
+    return asyncio.run(main())
+
+
+async def generate_in_processes(url: str, workload: Workload, mix: dict, args, samples, failures):
+    """Split users (and the ids they own) and callers over `args.client_procs` processes."""
+    procs = args.client_procs
+    jobs = []
+    for k in range(procs):
+        users = workload.users[k::procs]
+        part = Workload(users, {user_id: workload.ids.get(user_id, []) for user_id in users})
+        seeds = [args.seed + i for i in range(k, args.concurrency, procs)]
+        jobs.append((url, part, mix, seeds, args.duration))
+
+    ctx = multiprocessing.get_context("spawn")
+    with ctx.Pool(procs) as pool:
+        results = await asyncio.to_thread(pool.starmap, generate, jobs)
+
+    for part_samples, part_failures in results:
+        for tool, values in part_samples.items():
+            samples[tool].extend(values)
+        for tool, n in part_failures.items():
+            failures[tool] += n
+
+
+async def run(args) -> dict:
+    from db.database import engine
+
+    users = user_ids(args.users)
+    mix = parse_mix(args.mix)
+
+    await reset_schema(engine)
+    await seed(engine, args.rows, args.users, days=DAYS)
+    async with engine.begin() as conn:
+        await conn.run_sync(backfill)   # summarize reads the rollup
+    workload = Workload(users, await owned_ids(engine, users))
+    await engine.dispose()
+
+    samples = defaultdict(list)
+    failures = defaultdict(int)
+    if args.workers:
+        async with spawn_server(args.workers) as url:
+            started = time.perf_counter()
+            if args.client_procs > 1:
+                await generate_in_processes(url, workload, mix, args, samples, failures)
+            else:
+                from fastmcp import Client
+
+                deadline = started + args.duration
+                await asyncio.gather(*(
+                    worker(lambda: Client(url), workload, mix, random.Random(args.seed + i), deadline, samples, failures)
+                    for i in range(args.concurrency)
+                ))
+            elapsed = time.perf_counter() - started
+    else:
+        import main as server
+
+        async with serve(server.mcp, args.transport) as client_factory:
+            started = time.perf_counter()
+            deadline = started + args.duration
+            await asyncio.gather(*(
+                worker(client_factory, workload, mix, random.Random(args.seed + i), deadline, samples, failures)
+                for i in range(args.concurrency)
+            ))
+            elapsed = time.perf_counter() - started
+
+    calls = sum(len(s) for s in samples.values())
+    return {
+        "benchmark": "load_test",
+        "transport": args.transport,
+        "dialect": engine.dialect.name,
+        "workers": args.workers or "in-process",
+        "client_procs": args.client_procs if args.workers else 1,
+        "rows": args.rows,
+        "users": args.users,
+        "concurrency": args.concurrency,
+        "duration_s": round(elapsed, 2),
+        "mix": mix,
+        "calls": calls,
+        "throughput_per_sec": round(calls / elapsed, 1),
+        "tools": {
+            tool: {
+                "calls": len(s),
+                "errors": failures[tool],
+                "throughput_per_sec": round(len(s) / elapsed, 1),
+                "latency": percentiles(s),
+            }
+            for tool, s in sorted(samples.items())
+        },
+    }
+
+
+def _pct(old: float, new: float) -> float | None:
+    return round((new - old) * 100 / old, 1) if old else None
+
+
+def compare(base: dict, new: dict, threshold: float) -> dict:
+    """Per-tool change from `base` to `new`; regressions are beyond `threshold` %."""
+    tools = {}
+    regressions = []
+
+    for tool in sorted(base["tools"].keys() | new["tools"].keys()):
+        old_t, new_t = base["tools"].get(tool), new["tools"].get(tool)
+        if not old_t or not new_t:
+            tools[tool] = {"only_in": "base" if old_t else "new"}
+            continue
+
+        row = {"throughput_change_pct": _pct(old_t["throughput_per_sec"], new_t["throughput_per_sec"])}
+        for key in ("p50_ms", "p95_ms", "p99_ms"):
+            row[f"{key}_base"] = old_t["latency"][key]
+            row[f"{key}_new"] = new_t["latency"][key]
+            row[f"{key}_change_pct"] = _pct(old_t["latency"][key], new_t["latency"][key])
+        tools[tool] = row
+
+        if (row["p99_ms_change_pct"] or 0) > threshold:
+            regressions.append(f"{tool}: p99 {row['p99_ms_base']} -> {row['p99_ms_new']} ms")
+
+    throughput_change = _pct(base["throughput_per_sec"], new["throughput_per_sec"])
+    if (throughput_change or 0) < -threshold:
+        regressions.append(f"throughput {base['throughput_per_sec']} -> {new['throughput_per_sec']}/s")
+
+    return {
+        "benchmark": "load_test_compare",
+        "threshold_pct": threshold,
+        "throughput_change_pct": throughput_change,
+        "tools": tools,
+        "regressions": regressions,
+    }
+
+
+async def scale(args) -> dict:
+    """`run` once per worker count; throughput and speedup relative to the first."""
+    runs = []
+    for workers in [int(n) for n in args.workers.split(",")]:
+        report = await run(argparse.Namespace(**{**vars(args), "workers": workers}))
+        runs.append({
+            "workers": workers,
+            "calls": report["calls"],
+            "throughput_per_sec": report["throughput_per_sec"],
+            "errors": sum(t["errors"] for t in report["tools"].values()),
+            "p99_ms": {tool: t["latency"]["p99_ms"] for tool, t in report["tools"].items()},
+        })
+
+    base = runs[0]["throughput_per_sec"]
+    for row in runs:
+        row["speedup"] = round(row["throughput_per_sec"] / base, 2) if base else None
+
+    return {
+        "benchmark": "load_test_scale",
+        "cpus": os.cpu_count(),
+        "client_procs": args.client_procs,
+        "concurrency": args.concurrency,
+        "duration_s": args.duration,
+        "mix": parse_mix(args.mix),
+        "runs": runs,
+    }
+
+
+def _load_args(cmd):
+    cmd.add_argument("--users", type=int, default=50)
+    cmd.add_argument("--rows", type=int, default=50_000)
+    cmd.add_argument("--concurrency", type=int, default=16)
+    cmd.add_argument("--duration", type=float, default=30.0, help="seconds of load")
+    cmd.add_argument("--mix", default=DEFAULT_MIX, help="tool=weight,... (default: %(default)s)")
+    cmd.add_argument("--transport", choices=("http", "memory"), default="http")
+    cmd.add_argument("--client-procs", type=int, default=1, help="load-generator processes (with --workers)")
+    cmd.add_argument("--seed", type=int, default=42)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_cmd = commands.add_parser("run", help="seed, replay the tool mix, print JSON")
+    _load_args(run_cmd)
+    run_cmd.add_argument("--workers", type=int, default=0, help="serve from `python main.py` with N workers")
+    run_cmd.add_argument("--out", help="also write the JSON report to this file")
+
+    scale_cmd = commands.add_parser("scale", help="`run` once per worker count, print throughput scaling")
+    _load_args(scale_cmd)
+    scale_cmd.add_argument("--workers", default="1,2,4", help="comma-separated worker counts")
+
+    compare_cmd = commands.add_parser("compare", help="diff two `run` reports")
+    compare_cmd.add_argument("base")
+    compare_cmd.add_argument("new")
+    compare_cmd.add_argument("--threshold", type=float, default=10.0, help="regression threshold in percent")
+
+    args = parser.parse_args()
+
+    if args.command == "compare":
+        with open(args.base) as f:
+            base = json.load(f)
+        with open(args.new) as f:
+            new = json.load(f)
+        report = compare(base, new, args.threshold)
+        emit(report)
+        sys.exit(1 if report["regressions"] else 0)
+
+    if args.command == "scale":
+        emit(asyncio.run(scale(args)))
+        return
+
+    if args.workers and args.transport == "memory":
+        parser.error("--workers needs --transport http")
+
+    report = asyncio.run(run(args))
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+    emit(report)
+
+
+if __name__ == "__main__":
+    main()
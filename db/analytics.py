@@ -0,0 +1,124 @@
+# db/analytics.py
+"""
+Spending analysis for `analyze_spending` in one grouped query.
+
+`spending_query` returns SUM/COUNT per (date, category, subcategory) over
+the requested window *and* the window it is compared against, in a single
+index range scan on (user_id, date). `fold` turns those rows into the
+bucketed series, top-N lists and period-over-period deltas in Python —
+every sum stays in integer cents until the response.
+"""
+from collections import defaultdict
+from datetime import date
+
+from sqlalchemy import select, func
+
+from models.Expense import Expense
+from services.dates import bucket_start, next_bucket
+from services.money import from_cents
+
+
+def spending_query(user_id: str, start: date, end: date, categories: tuple[str, ...] = ()):
+    """SUM(amount_cents), COUNT(*) GROUP BY date, category, subcategory over [start, end]."""
+    query = (
+        select(
+            Expense.date,
+            Expense.category,
+            Expense.subcategory,
+            func.sum(Expense.amount_cents).label("total_cents"),
+            func.count().label("expense_count"),
+        )
+        .where(Expense.user_id == user_id)
+        .where(Expense.date.between(start, end))
+    )
+    if categories:
+        query = query.where(Expense.category.in_(categories))
+    return query.group_by(Expense.date, Expense.category, Expense.subcategory)
+
+
+def _change(current: int, previous: int) -> dict:
+    return {
+        "change_amount": from_cents(current - previous),
+        "change_pct": round((current - previous) * 100 / previous, 1) if previous else None,
+    }
+
+
+def _share(part: int, whole: int) -> float:
+    return round(part * 100 / whole, 1) if whole else 0.0
+
+
+def fold(rows, start: date, end: date, bucket: str, top_n: int) -> dict:
+    """Grouped rows from both windows (current = on/after `start`) → series, top-N and deltas."""
+    totals = {"current": [0, 0], "previous": [0, 0]}
+    buckets = defaultdict(lambda: [0, 0])
+    by_category = defaultdict(lambda: [0, 0])          # category -> [current, previous]
+    by_subcategory = defaultdict(int)
+
+    for day, category, subcategory, cents, count in rows:
+        cents = int(cents)
+        window = "current" if day >= start else "previous"
+        totals[window][0] += cents
+        totals[window][1] += count
+        by_category[category][0 if window == "current" else 1] += cents
+
+        if window == "current":
+            acc = buckets[bucket_start(day, bucket)]
+            acc[0] += cents
+            acc[1] += count
+            by_subcategory[(category, subcategory)] += cents
+
+    total, count = totals["current"]
+    previous_total, previous_count = totals["previous"]
+
+    # Every bucket in the window, empty ones included, each compared with the one before
+    series = []
+    prior = None
+    cursor = bucket_start(start, bucket)
+    while cursor <= end:
+        cents, n = buckets.get(cursor, (0, 0))
+        # A partial first bucket is labelled with the window start
+        point = {"period_start": max(cursor, start).isoformat(), "total_amount": from_cents(cents), "count": n}
+        if prior is not None:
+            point.update(_change(cents, prior))
+        series.append(point)
+        prior = cents
+        cursor = next_bucket(cursor, bucket)
+
+    top_categories = sorted(
+        ((name, cur, prev) for name, (cur, prev) in by_category.items() if cur),
+        key=lambda item: (-item[1], item[0]),
+    )[:top_n]
+    top_subcategories = sorted(
+        by_subcategory.items(),
+        key=lambda item: (-item[1], item[0][0], item[0][1] or ""),
+    )[:top_n]
+
+    return {
+        "total_spent": from_cents(total),
+        "expense_count": count,
+        "previous": {
+            "total_spent": from_cents(previous_total),
+            "expense_count": previous_count,
+            **_change(total, previous_total),
+        },
+        "series": series,
+        "top_categories": [
+            {
+                "category": name,
+                "total_amount": from_cents(cur),
+                "share_pct": _share(cur, total),
+                "previous_amount": from_cents(prev),
+                **_change(cur, prev),
+            }
+            for name, cur, prev in top_categories
+        ],
+        "top_subcategories": [
+            {
+                "category": category,
+                "subcategory": subcategory,
+                "total_amount": from_cents(cents),
+                "share_pct": _share(cents, total),
+            }
+            for (category, subcategory), cents in top_subcategories
+        ],
+    }
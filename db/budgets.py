@@ -0,0 +1,272 @@
+# db/budgets.py
+"""
+Budget reads and the spent-counter reconciliation job.
+
+A budget is a limit per (user, month, category). What has been spent
+against it is never summed from raw expenses. It is the `month` row of
+expense_rollups, which add/edit/delete (and the write-behind flush) keep
+current in the same transaction as the expense. `budgets_query` and
+`spent_query` both read by primary-key prefix, so `budget_status` costs
+O(categories) no matter how long the user's history is.
+
+`reconcile` re-sums raw expenses for every budgeted (user, category) in a
+month and compares them with those counters, in one statement. Users with
+drift are re-checked by `verify_user` with their writes locked out, and
+get their rollup rebuilt if the drift is still there. It runs every
+BUDGET_RECONCILE_INTERVAL seconds from the server lifespan (0 = off,
+the default) or on demand. With several workers, only the one holding
+the BUDGET_RECONCILE_LOCK file lock runs it (serve_workers sets the path;
+workers on separate hosts each need their own lock, or the job off on
+all but one).
+
+    python -m db.budgets [YYYY-MM] [--repair]
+"""
+import os
+import asyncio
+import logging
+from datetime import date
+
+from sqlalchemy import select, func, and_
+
+from db.database import engine
+from db.rollup import MONTH, next_month, verify_user
+from models.Budget import Budget
+from models.Expense import Expense
+from models.ExpenseRollup import ExpenseRollup
+from services.dates import today
+from services.env import env_int
+from services.money import from_cents
+
+logger = logging.getLogger(__name__)
+
+RECONCILE_INTERVAL = env_int("BUDGET_RECONCILE_INTERVAL", 0)
+# A file every worker process can see; only the process holding its lock reconciles
+RECONCILE_LOCK = os.getenv("BUDGET_RECONCILE_LOCK") or None
+
+_lock_file = None
+
+# A budget at or above this share of its limit is reported as "warning"
+WARNING_PCT = 80
+
+
+def budgets_query(user_id: str, month: date, categories: tuple[str, ...] = ()):
+    """(category, limit_cents) for every budget the user set for `month`, optionally only `categories`."""
+    query = select(Budget.category, Budget.limit_cents).where(Budget.user_id == user_id, Budget.month == month)
+    if categories:
+        query = query.where(Budget.category.in_(categories))
+    return query
+
+
+def upsert_budget(user_id: str, month: date, category: str, limit_cents: int):
+    """Dialect-specific INSERT that sets the limit, whether or not the budget exists yet."""
+    table = Budget.__table__
+    dialect = engine.dialect.name
+    values = {"user_id": user_id, "month": month, "category": category, "limit_cents": limit_cents}
+
+    if dialect == "mysql":
+        from sqlalchemy.dialects.mysql import insert as dialect_insert
+
+        stmt = dialect_insert(table).values(**values)
+        return stmt.on_duplicate_key_update(limit_cents=stmt.inserted.limit_cents, updated_at=func.now())
+
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    elif dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        raise ValueError(f"budget upsert supports mysql/sqlite/postgresql, not {dialect!r}")
+
+    stmt = dialect_insert(table).values(**values)
+    return stmt.on_conflict_do_update(
+        index_elements=[table.c.user_id, table.c.month, table.c.category],
+        set_={"limit_cents": stmt.excluded.limit_cents, "updated_at": func.now()},
+    )
+
+
+def spent_query(user_id: str, month: date, categories: tuple[str, ...] = ()):
+    """(category, total_cents, expense_count) from the month's rollup rows, optionally only `categories`."""
+    R = ExpenseRollup
+    query = (
+        select(R.category, R.total_cents, R.expense_count)
+        .where(R.user_id == user_id, R.period == MONTH, R.period_start == month)
+    )
+    if categories:
+        query = query.where(R.category.in_(categories))
+    return query
+
+
+def _state(spent: int, limit: int) -> str:
+    if spent > limit:
+        return "over"
+    if spent * 100 >= limit * WARNING_PCT:
+        return "warning"
+    return "under"
+
+
+def fold(budgets, spent, month: date, as_of: date) -> dict:
+    """Budget rows + month rollup rows → per-category and overall status (amounts in cents until here)."""
+    spent = {category: (int(total), count) for category, total, count in spent}
+
+    # Days left including today, only while the month is current
+    days_left = None
+    if month <= as_of < next_month(month):
+        days_left = (next_month(month) - as_of).days
+
+    categories = []
+    total_limit = total_spent = 0
+    for category, limit in sorted(budgets):
+        cents, count = spent.pop(category, (0, 0))
+        limit = int(limit)
+        total_limit += limit
+        total_spent += cents
+        remaining = limit - cents
+        row = {
+            "category": category,
+            "limit": from_cents(limit),
+            "spent": from_cents(cents),
+            "remaining": from_cents(remaining),
+            "used_pct": round(cents * 100 / limit, 1) if limit else None,
+            "expense_count": count,
+            "state": _state(cents, limit),
+        }
+        if days_left:
+            row["daily_allowance"] = from_cents(max(remaining, 0) // days_left)
+        categories.append(row)
+
+    return {
+        "month": month.strftime("%Y-%m"),
+        "days_left": days_left,
+        "total_limit": from_cents(total_limit),
+        "total_spent": from_cents(total_spent),
+        "total_remaining": from_cents(total_limit - total_spent),
+        "budgets": categories,
+        # Spending in categories without a budget
+        "unbudgeted": [
+            {"category": category, "spent": from_cents(cents), "expense_count": count}
+            for category, (cents, count) in sorted(spent.items())
+        ],
+    }
+
+
+# ---------- RECONCILIATION ---------- #
+
+async def reconcile(db, month: date, repair: bool = False) -> dict:
+    """
+    Compare the spent counters behind every budget in `month` with
+    SUM(amount_cents) over raw expenses. With repair=True, each user with
+    a mismatch is re-checked under `lock_user` and, if the drift is real,
+    gets their whole rollup rebuilt (caller commits).
+    """
+    R = ExpenseRollup
+    end = next_month(month)
+
+    raw = (
+        select(
+            Expense.user_id, Expense.category,
+            func.sum(Expense.amount_cents).label("total_cents"), func.count().label("expense_count"),
+        )
+        .where(Expense.user_id.in_(select(Budget.user_id).where(Budget.month == month)))
+        .where(Expense.date >= month, Expense.date < end)
+        .group_by(Expense.user_id, Expense.category)
+        .subquery()
+    )
+    # Counters and raw sums in one statement, so both come from one snapshot:
+    # a write committing between two reads would look like drift
+    counters = (
+        select(
+            Budget.user_id, Budget.category, R.total_cents, R.expense_count,
+            raw.c.total_cents, raw.c.expense_count,
+        )
+        .select_from(Budget)
+        .outerjoin(R, and_(
+            R.user_id == Budget.user_id,
+            R.period == MONTH,
+            R.period_start == Budget.month,
+            R.category == Budget.category,
+        ))
+        .outerjoin(raw, and_(raw.c.user_id == Budget.user_id, raw.c.category == Budget.category))
+        .where(Budget.month == month)
+        .order_by(Budget.user_id, Budget.category)
+    )
+    rows = (await db.execute(counters)).all()
+
+    mismatches = []
+    for user_id, category, have_total, have_count, want_total, want_count in rows:
+        have = (int(have_total or 0), have_count or 0)
+        want = (int(want_total or 0), want_count or 0)
+        if want != have:
+            mismatches.append({
+                "user_id": user_id,
+                "category": category,
+                "expected": {"total_cents": want[0], "expense_count": want[1]},
+                "stored": {"total_cents": have[0], "expense_count": have[1]},
+            })
+
+    repaired = []
+    if repair:
+        for user_id in dict.fromkeys(m["user_id"] for m in mismatches):
+            if (await verify_user(db, user_id, repair=True))["repaired"]:
+                repaired.append(user_id)
+
+    return {
+        "month": month.isoformat(),
+        "checked": len(rows),
+        "mismatches": mismatches,
+        "repaired_users": repaired,
+    }
+
+
+def _holds_reconcile_lock() -> bool:
+    """True in the one process holding RECONCILE_LOCK (always, when it is unset)."""
+    global _lock_file
+    if RECONCILE_LOCK is None or _lock_file is not None:
+        return True
+
+    import fcntl
+
+    f = open(RECONCILE_LOCK, "a")
+    try:
+        fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        f.close()
+        return False
+    _lock_file = f      # held until this process exits
+    return True
+
+
+async def reconcile_periodically(session_factory, interval: float):
+    """Reconcile (and repair) the current month every `interval` seconds until cancelled."""
+    while True:
+        await asyncio.sleep(interval)
+        if not _holds_reconcile_lock():
+            continue    # another worker runs the job
+        try:
+            async with session_factory() as db:
+                report = await reconcile(db, today().replace(day=1), repair=True)
+                await db.commit()
+        except Exception:
+            logger.exception("budget reconciliation failed")
+            continue
+        if report["repaired_users"]:
+            logger.warning(
+                "budget counters drifted for %d of %d budgets in %s; rebuilt rollups for %s",
+                len(report["mismatches"]), report["checked"], report["month"], report["repaired_users"],
+            )
+
+
+if __name__ == "__main__":
+    # python -m db.budgets [YYYY-MM] [--repair]
+    import sys
+    import json
+    from db.database import engine, AsyncSessionLocal
+    from services.dates import parse_month
+
+    async def _check(month: date, repair: bool):
+        async with AsyncSessionLocal() as db:
+            report = await reconcile(db, month, repair=repair)
+            await db.commit()
+        await engine.dispose()
+        print(json.dumps(report, indent=2))
+
+    args = [arg for arg in sys.argv[1:] if arg != "--repair"]
+    asyncio.run(_check(parse_month(args[0] if args else None), "--repair" in sys.argv[1:]))
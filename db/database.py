@@ -2,6 +2,8 @@ import os
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
 from dotenv import load_dotenv
+from db.pool import pool_settings
+from services.env import env_int
 
 # Load .env variables
 load_dotenv()
@@ -12,13 +14,21 @@ DATABASE_URL = os.getenv("DATABASE_URL")
 if not DATABASE_URL:
     raise Exception("DATABASE_URL missing in .env")
 
-# Async Engine
+# Async Engine (pool sizing/recycling from DB_POOL_* env vars, see db/pool.py)
 engine = create_async_engine(
     DATABASE_URL,
     echo=False,
-    future=True
+    future=True,
+    **pool_settings(DATABASE_URL)
 )
 
+# Startup warm-up and periodic pool-stats logging
+POOL_WARMUP = env_int("DB_POOL_WARMUP", env_int("DB_POOL_SIZE", 5))
+POOL_STATS_INTERVAL = env_int("DB_POOL_STATS_INTERVAL", 0)
+
+# Startup schema check: auto | always | off (see db/migrations.ensure_schema)
+SCHEMA_CHECK = os.getenv("DB_SCHEMA_CHECK", "auto").strip().lower()
+
 # Async Session Factory
 AsyncSessionLocal = sessionmaker(
     bind=engine,
@@ -0,0 +1,286 @@
+# db/migrations.py
+"""
+Versioned schema migrations.
+
+`Base.metadata.create_all` only creates missing tables — it never touches a
+table that already exists. Every change to a live table (new index, new
+column, data backfill) goes here as a numbered step instead.
+
+Each step is a plain sync function that receives a SQLAlchemy Connection
+(we run them through `conn.run_sync`). Steps must be idempotent: a fresh
+database already has everything `create_all` produced, and the step simply
+records its version. Steps describe the schema as it was at their version,
+not the current models, so an old database can replay all of them.
+
+`ensure_schema` is what the server runs at startup. By default it first
+reads the schema_version row (one cheap query) and skips `create_all`'s
+per-table reflection entirely when the database is already current.
+Run `python -m db.migrations` to migrate ahead of a deploy and start the
+replicas with DB_SCHEMA_CHECK=off.
+"""
+from sqlalchemy import (
+    Table, Column, MetaData, Index, Integer, BigInteger, String, Date, DateTime, Float,
+    func, select, insert, update, cast, inspect, text,
+)
+from sqlalchemy.exc import DBAPIError
+
+from db.database import Base
+
+
+schema_version = Table(
+    "schema_version",
+    Base.metadata,
+    Column("version", Integer, primary_key=True),
+    Column("description", String(255), nullable=False),
+    Column("applied_at", DateTime(timezone=True), server_default=func.now()),
+)
+
+
+# ---------- STEPS ---------- #
+
+def _legacy_expenses() -> Table:
+    """`expenses` as it was before migration 3 (float `amount`)."""
+    return Table(
+        "expenses",
+        MetaData(),
+        Column("id", Integer, primary_key=True),
+        Column("user_id", String(36)),
+        Column("date", Date),
+        Column("category", String(255)),
+        Column("amount", Float),
+        Column("amount_cents", BigInteger),
+    )
+
+
+def _expense_columns(conn) -> set[str]:
+    return {column["name"] for column in inspect(conn).get_columns("expenses")}
+
+
+def _add_expense_indexes(conn):
+    """Composite (user_id, date) and (user_id, category, date, amount) indexes."""
+    legacy = _legacy_expenses()
+    c = legacy.c
+    # A database created after migration 3 already has both (amount_cents flavour)
+    trailing = c.amount if "amount" in _expense_columns(conn) else c.amount_cents
+
+    Index("ix_expenses_user_date", c.user_id, c.date).create(conn, checkfirst=True)
+    Index("ix_expenses_user_category_date", c.user_id, c.category, c.date, trailing).create(
+        conn, checkfirst=True
+    )
+
+
+def _backfill_expense_rollups(conn):
+    """Populate expense_rollups (created by create_all) from existing expenses."""
+    from db.rollup import backfill
+
+    # Float-era table: migration 3 converts amounts and rebuilds the rollup
+    if "amount_cents" not in _expense_columns(conn):
+        return
+    backfill(conn)
+
+
+def _amounts_to_cents(conn):
+    """
+    expenses.amount (FLOAT) → expenses.amount_cents (BIGINT), rounded to the
+    cent, and expense_rollups rebuilt with integer totals.
+    """
+    from db.rollup import backfill
+    from models.Expense import Expense
+    from models.ExpenseRollup import ExpenseRollup
+
+    columns = _expense_columns(conn)
+    mysql = conn.dialect.name == "mysql"
+
+    if "amount" in columns:
+        legacy = _legacy_expenses()
+        if "amount_cents" not in columns:
+            conn.execute(text("ALTER TABLE expenses ADD COLUMN amount_cents BIGINT"))
+        conn.execute(
+            update(legacy).values(amount_cents=cast(func.round(legacy.c.amount * 100), BigInteger))
+        )
+
+        # A column can't be dropped while an index still covers it
+        for index in inspect(conn).get_indexes("expenses"):
+            if "amount" in index["column_names"]:
+                Index(index["name"], legacy.c.amount).drop(conn)
+        conn.execute(text("ALTER TABLE expenses DROP COLUMN amount"))
+
+        if mysql:
+            conn.execute(text("ALTER TABLE expenses MODIFY amount_cents BIGINT NOT NULL"))
+        # SQLite can't add NOT NULL to an existing column; the model enforces it
+
+    for index in Expense.__table__.indexes:
+        index.create(conn, checkfirst=True)
+
+    # Rollup rows are derived data — recreate the table in its integer shape
+    rollups = ExpenseRollup.__table__
+    rollups.drop(conn, checkfirst=True)
+    rollups.create(conn)
+    backfill(conn)
+
+
+def _normalize_column(conn, column) -> bool:
+    """Rewrite every distinct value of `column` to its normalized form. True if any changed."""
+    from services.categories import normalize_category
+
+    changed = False
+    for (stored,) in conn.execute(select(column).distinct().where(column.is_not(None))).all():
+        normalized = normalize_category(stored)
+        if not normalized and column.nullable:
+            normalized = None   # a blank subcategory is no subcategory
+        if normalized != stored:
+            conn.execute(update(column.table).where(column == stored).values({column.name: normalized}))
+            changed = True
+    return changed
+
+
+def _normalize_categories(conn):
+    """Rewrite expenses.category to its normalized form and rebuild the rollup."""
+    from db.rollup import backfill
+    from models.Expense import Expense
+
+    # Buckets that differed only by case/spacing now merge
+    if _normalize_column(conn, Expense.__table__.c.category):
+        backfill(conn)
+
+
+def _normalize_subcategories(conn):
+    """Rewrite expenses.subcategory like migration 4 did category (the rollup has no subcategory)."""
+    from models.Expense import Expense
+
+    _normalize_column(conn, Expense.__table__.c.subcategory)
+
+
+def _create_id_sequences(conn):
+    """High-water marks for ids reserved ahead of their INSERT (db/write_behind.py)."""
+    from models.IdSequence import IdSequence
+
+    IdSequence.__table__.create(conn, checkfirst=True)
+    _seed_expense_ids(conn)
+
+
+def _seed_expense_ids(conn):
+    """
+    The `expenses` row of id_sequences, starting above MAX(expenses.id).
+    With the row in place `IdBlocks._reserve` only ever locks an existing
+    row: two workers creating it at once would gap-lock each other on
+    MySQL and one would fail with a deadlock.
+    """
+    from models.IdSequence import IdSequence
+
+    seq = IdSequence.__table__
+    if conn.execute(select(seq.c.name).where(seq.c.name == "expenses")).first() is None:
+        expenses = _legacy_expenses()
+        conn.execute(
+            insert(seq).from_select(
+                ["name", "next_id"],
+                select(text("'expenses'"), func.coalesce(func.max(expenses.c.id), 0) + 1),
+            )
+        )
+
+
+def _create_budgets(conn):
+    """Monthly spending limits; spent-to-date comes from the month rollup rows."""
+    from models.Budget import Budget
+
+    Budget.__table__.create(conn, checkfirst=True)
+
+
+def _add_expense_search(conn):
+    """Full-text index over note/subcategory: MySQL FULLTEXT, SQLite FTS5 + triggers."""
+    from db.search import install
+
+    install(conn)
+
+
+# (version, description, step) — append only, never renumber.
+MIGRATIONS = [
+    (1, "expenses: composite user/date and user/category/date indexes", _add_expense_indexes),
+    (2, "expense_rollups: backfill day/month totals from expenses", _backfill_expense_rollups),
+    (3, "expenses/expense_rollups: amounts as integer cents", _amounts_to_cents),
+    (4, "expenses: normalized category values", _normalize_categories),
+    (5, "id_sequences: reserved id blocks for write-behind inserts", _create_id_sequences),
+    (6, "budgets: monthly limits per user and category", _create_budgets),
+    (7, "expenses: full-text search index over note and subcategory", _add_expense_search),
+    (8, "expenses: normalized subcategory values", _normalize_subcategories),
+    (9, "id_sequences: seed the expenses row above MAX(expenses.id)", _seed_expense_ids),
+]
+
+
+# ---------- RUNNER ---------- #
+
+def current_version(conn) -> int:
+    """Highest applied migration version (0 if none)."""
+    if not inspect(conn).has_table(schema_version.name):
+        return 0
+    result = conn.execute(select(func.max(schema_version.c.version)))
+    return result.scalar() or 0
+
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+SCHEMA_CHECK_MODES = ("auto", "always", "off")
+
+
+def apply_migrations(conn) -> list[int]:
+    """Apply every pending step in order. Returns the versions applied."""
+    schema_version.create(conn, checkfirst=True)
+    version = current_version(conn)
+
+    applied = []
+    for step_version, description, step in MIGRATIONS:
+        if step_version <= version:
+            continue
+        step(conn)
+        conn.execute(
+            insert(schema_version).values(version=step_version, description=description)
+        )
+        applied.append(step_version)
+
+    return applied
+
+
+async def is_current(engine) -> bool:
+    """True when the schema_version row says every migration is applied."""
+    async with engine.connect() as conn:
+        try:
+            version = (await conn.execute(select(func.max(schema_version.c.version)))).scalar()
+        except DBAPIError:
+            return False    # no schema_version table yet
+    return (version or 0) >= LATEST_VERSION
+
+
+async def ensure_schema(engine, mode: str = "auto") -> list[int]:
+    """
+    Create missing tables and apply pending migrations. Returns the versions applied.
+
+    auto    skip everything when the schema_version row is current (default)
+    always  run create_all + migrations unconditionally
+    off     no database work at all (migrated out of band)
+    """
+    if mode not in SCHEMA_CHECK_MODES:
+        raise ValueError(f"DB_SCHEMA_CHECK must be one of {SCHEMA_CHECK_MODES}, got {mode!r}")
+    if mode == "off" or (mode == "auto" and await is_current(engine)):
+        return []
+
+    # create_all only knows the tables whose models have been imported
+    import models.User, models.Expense, models.ExpenseRollup, models.IdSequence, models.Budget  # noqa: F401,E401
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        return await conn.run_sync(apply_migrations)
+
+
+if __name__ == "__main__":
+    # python -m db.migrations  → create tables / apply pending migrations, then exit
+    import asyncio
+    from db.database import engine
+
+    async def _migrate():
+        try:
+            applied = await ensure_schema(engine, "always")
+        finally:
+            await engine.dispose()
+        print(f"schema at version {LATEST_VERSION}; applied: {applied or 'nothing'}")
+
+    asyncio.run(_migrate())
@@ -0,0 +1,65 @@
+# db/pagination.py
+"""
+Keyset (seek) pagination on (date, id), and on (score, id) for ranked
+search results.
+
+Pages are addressed by an opaque cursor holding the last row's sort key,
+so fetching page N costs the same as page 1 — no OFFSET scan.
+"""
+import base64
+from datetime import date
+
+from sqlalchemy import and_, or_
+
+DEFAULT_PAGE_SIZE = 200
+MAX_PAGE_SIZE = 1000
+
+
+def encode_cursor(last_date: date, last_id: int) -> str:
+    raw = f"{last_date.isoformat()}|{last_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[date, int]:
+    """Inverse of `encode_cursor`. Raises ValueError on a malformed token."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        raw_date, raw_id = base64.urlsafe_b64decode(padded).decode().split("|")
+        return date.fromisoformat(raw_date), int(raw_id)
+    except (UnicodeDecodeError, TypeError, ValueError) as exc:
+        raise ValueError("Invalid cursor") from exc
+
+
+def after(date_col, id_col, cursor: str):
+    """WHERE clause selecting rows strictly after `cursor` in (date, id) order."""
+    last_date, last_id = decode_cursor(cursor)
+    # Expanded form instead of a row-value comparison so MySQL can range-scan the index
+    return or_(date_col > last_date, and_(date_col == last_date, id_col > last_id))
+
+
+def encode_ranked_cursor(last_score: float, last_id: int) -> str:
+    # repr() round-trips the float exactly, so the next page starts right after it
+    raw = f"{last_score!r}|{last_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_ranked_cursor(cursor: str) -> tuple[float, int]:
+    """Inverse of `encode_ranked_cursor`. Raises ValueError on a malformed token."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        raw_score, raw_id = base64.urlsafe_b64decode(padded).decode().split("|")
+        return float(raw_score), int(raw_id)
+    except (UnicodeDecodeError, TypeError, ValueError) as exc:
+        raise ValueError("Invalid cursor") from exc
+
+
+def after_ranked(score, id_col, cursor: str):
+    """WHERE clause selecting rows strictly after `cursor` in (score DESC, id DESC) order."""
+    last_score, last_id = decode_ranked_cursor(cursor)
+    return or_(score < last_score, and_(score == last_score, id_col < last_id))
+
+
+def clamp_limit(limit) -> int:
+    if not limit or limit < 1:
+        return DEFAULT_PAGE_SIZE
+    return min(int(limit), MAX_PAGE_SIZE)
@@ -0,0 +1,142 @@
+# db/pool.py
+"""
+Connection pool configuration, warm-up and stats for the async engine.
+
+Pool settings come from the environment (defaults in brackets):
+
+    DB_POOL_SIZE            persistent connections kept open        [5]
+    DB_MAX_OVERFLOW         extra connections allowed under burst   [10]
+    DB_POOL_TIMEOUT         seconds to wait for a free connection   [30]
+    DB_POOL_RECYCLE         reconnect connections older than this   [1800]
+                            (keep below MySQL's wait_timeout)
+    DB_POOL_PRE_PING        test connections on checkout            [true]
+    DB_POOL_WARMUP          connections to open at startup          [DB_POOL_SIZE]
+    DB_POOL_STATS_INTERVAL  seconds between pool-stat log lines     [0 = off]
+    DB_CONNECTION_BUDGET    connections for all workers together    [0 = no cap]
+    WEB_CONCURRENCY         HTTP worker processes sharing the budget [1]
+
+With a budget, each worker's pool_size + max_overflow is capped at its
+share (budget // workers), so adding workers never pushes the database
+past its max_connections.
+"""
+import time
+import asyncio
+import logging
+from contextlib import AsyncExitStack
+
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from services.env import env_int, env_bool
+
+logger = logging.getLogger(__name__)
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """AsyncAdaptedQueuePool that records how long checkouts wait for a connection."""
+
+    # Log under SQLAlchemy's pool logger (gated by echo_pool), not ours
+    _sqla_logger_namespace = "sqlalchemy.pool.impl.AsyncAdaptedQueuePool"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            waited = time.perf_counter() - started
+            self.checkouts += 1
+            self.wait_total += waited
+            self.wait_max = max(self.wait_max, waited)
+
+
+def _is_memory_sqlite(url) -> bool:
+    return url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:")
+
+
+def worker_pool_size(pool_size: int, max_overflow: int, budget: int, workers: int) -> tuple[int, int]:
+    """(pool_size, max_overflow) for one worker, capped at its share of `budget` (0 = no cap)."""
+    if budget <= 0:
+        return pool_size, max_overflow
+    share = max(1, budget // max(1, workers))
+    size = max(1, min(pool_size, share))
+    return size, max(0, min(max_overflow, share - size))
+
+
+def pool_settings(database_url: str) -> dict:
+    """create_async_engine() keyword arguments for the configured pool."""
+    settings = {
+        "pool_pre_ping": env_bool("DB_POOL_PRE_PING", True),
+        "pool_recycle": env_int("DB_POOL_RECYCLE", 1800),
+    }
+
+    # In-memory SQLite must stay on a single shared connection (StaticPool)
+    if _is_memory_sqlite(make_url(database_url)):
+        return settings
+
+    pool_size, max_overflow = worker_pool_size(
+        env_int("DB_POOL_SIZE", 5),
+        env_int("DB_MAX_OVERFLOW", 10),
+        budget=env_int("DB_CONNECTION_BUDGET", 0),
+        workers=env_int("WEB_CONCURRENCY", 1),
+    )
+    settings.update(
+        poolclass=TimedQueuePool,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=env_int("DB_POOL_TIMEOUT", 30),
+    )
+    return settings
+
+
+async def warm_pool(engine, connections: int) -> int:
+    """Open `connections` connections at once, then hand them back to the pool."""
+    pool = engine.pool
+    if isinstance(pool, QueuePool):
+        connections = min(connections, pool.size())
+    else:
+        connections = min(connections, 1)
+
+    async with AsyncExitStack() as stack:
+        for _ in range(connections):
+            conn = await stack.enter_async_context(engine.connect())
+            await conn.exec_driver_sql("SELECT 1")
+
+    return max(connections, 0)
+
+
+def pool_stats(engine, reset_max: bool = False) -> dict:
+    """Snapshot of pool occupancy and checkout wait times."""
+    pool = engine.pool
+    stats = {"pool": type(pool).__name__}
+
+    if isinstance(pool, QueuePool):
+        stats.update(
+            size=pool.size(),
+            checked_in=pool.checkedin(),
+            checked_out=pool.checkedout(),
+            overflow=pool.overflow(),
+        )
+
+    if isinstance(pool, TimedQueuePool):
+        stats.update(
+            checkouts=pool.checkouts,
+            wait_total_ms=round(pool.wait_total * 1000, 3),
+            wait_max_ms=round(pool.wait_max * 1000, 3),
+        )
+        if reset_max:
+            pool.wait_max = 0.0
+
+    return stats
+
+
+async def report_pool_stats(engine, interval: float):
+    """Log a pool snapshot every `interval` seconds until cancelled."""
+    while True:
+        await asyncio.sleep(interval)
+        logger.info("db pool: %s", pool_stats(engine, reset_max=True))
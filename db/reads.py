@@ -0,0 +1,120 @@
+# db/reads.py
+"""
+Shared read layer for the tools.
+
+Read-only paths select plain columns instead of `Expense` entities, so no
+ORM objects are built and nothing lands in the session's identity map.
+Rows come back as lightweight Row tuples; `serialize` is the single place
+that turns one into the dict the tools return, and `columnar` the place
+that turns a whole listing into parallel arrays. `encode_rows` picks
+between them for a listing.
+"""
+from collections import namedtuple
+
+from sqlalchemy import select
+
+from models.Expense import Expense
+from services.money import from_cents
+from services.categories import get_index
+
+EXPENSE_COLUMNS = (
+    Expense.id,
+    Expense.date,
+    Expense.amount_cents,
+    Expense.category,
+    Expense.subcategory,
+    Expense.note,
+)
+
+
+# Plain-tuple stand-in for a Row, for rows that crossed a process boundary
+ExpenseRow = namedtuple("ExpenseRow", [column.key for column in EXPENSE_COLUMNS])
+
+
+def select_expenses(*where):
+    """`SELECT id, date, amount_cents, category, subcategory, note FROM expenses WHERE ...`"""
+    return select(*EXPENSE_COLUMNS).where(*where)
+
+
+def serialize(row) -> dict:
+    """Expense row (Row, mapping-like or ORM object) → response dict."""
+    return {
+        "id": row.id,
+        "date": row.date.isoformat(),
+        "amount": from_cents(row.amount_cents),
+        "category": row.category,
+        "subcategory": row.subcategory,
+        "note": row.note,
+    }
+
+
+def _encoder(codes, next_code: int):
+    """Value → code: categories.json codes first, other values numbered after them."""
+    extra = {}
+    used = {}
+
+    def encode(value):
+        if value is None:
+            return None
+        code = codes.get(value)
+        if code is None:
+            code = extra.get(value)
+            if code is None:
+                code = extra[value] = next_code + len(extra)
+        used[code] = value
+        return code
+
+    return encode, used
+
+
+def columnar(rows) -> dict:
+    """
+    Expense rows → parallel arrays. category/subcategory are codes from
+    categories.json (stable for a given `dictionary.version`); `dictionary`
+    maps the codes used here back to names. Notes are sparse: `note[i]`
+    belongs to row `note_index[i]`, rows without a note are left out.
+    """
+    index = get_index()
+    encode_category, categories = _encoder(index.category_codes, len(index.category_codes))
+    encode_subcategory, subcategories = _encoder(index.subcategory_codes, len(index.subcategory_codes))
+
+    ids, dates, amounts, category_col, subcategory_col = [], [], [], [], []
+    note_index, notes = [], []
+    for i, row in enumerate(rows):
+        ids.append(row.id)
+        dates.append(row.date.isoformat())
+        amounts.append(from_cents(row.amount_cents))
+        category_col.append(encode_category(row.category))
+        subcategory_col.append(encode_subcategory(row.subcategory))
+        if row.note is not None:
+            note_index.append(i)
+            notes.append(row.note)
+
+    return {
+        "id": ids,
+        "date": dates,
+        "amount": amounts,
+        "category": category_col,
+        "subcategory": subcategory_col,
+        "note_index": note_index,
+        "note": notes,
+        "dictionary": {
+            "version": index.version,
+            # JSON object keys are strings: {"0": "food", ...}
+            "category": {str(code): name for code, name in sorted(categories.items())},
+            "subcategory": {str(code): name for code, name in sorted(subcategories.items())},
+        },
+    }
+
+
+def encode_rows(format: str, rows):
+    """
+    A listing in `format` ("rows" or "columnar"). `rows` may be Rows or plain
+    tuples in EXPENSE_COLUMNS order — module-level, so the CPU offload pool
+    can run it on tuples (which pickle far cheaper than Rows).
+    """
+    if rows and type(rows[0]) is tuple:
+        rows = [ExpenseRow._make(row) for row in rows]
+    if format == "columnar":
+        return columnar(rows)
+    return [serialize(row) for row in rows]
@@ -0,0 +1,294 @@
+# db/rollup.py
+"""
+Maintenance and reads for the expense_rollups table.
+
+The write tools call `apply_deltas` inside their own session, so rollup rows
+commit (or roll back) together with the expense row they describe.
+`summarize` reads whole months from the `month` rows and the partial months
+at either edge of the range from the `day` rows — it never scans raw
+expenses.
+
+`verify_user(repair=True)` rebuilds a user's rows from raw expenses. It
+first takes `lock_user`, so no add, edit or delete for that user can
+commit between the rebuild's reads and its rewrite (the write would be
+lost from the rollup).
+"""
+from collections import defaultdict
+from datetime import date, timedelta
+
+from sqlalchemy import select, update, delete, insert, func, and_, or_
+
+from db.database import engine
+from models.Expense import Expense
+from models.ExpenseRollup import ExpenseRollup
+
+DAY = "day"
+MONTH = "month"
+
+def month_start(d: date) -> date:
+    return d.replace(day=1)
+
+
+def next_month(d: date) -> date:
+    return (d.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+# ---------- WRITES ---------- #
+
+def delta(user_id: str, day: date, category: str, cents: int, count: int = 1) -> list[dict]:
+    """Rollup rows adding `cents`/`count` to the day and month of `day`."""
+    return [
+        {
+            "user_id": user_id,
+            "period": period,
+            "period_start": start,
+            "category": category,
+            "total_cents": int(cents),
+            "expense_count": count,
+        }
+        for period, start in ((DAY, day), (MONTH, month_start(day)))
+    ]
+
+
+def _upsert_statement():
+    """Dialect-specific INSERT that adds onto an existing rollup row."""
+    table = ExpenseRollup.__table__
+    dialect = engine.dialect.name
+
+    if dialect == "mysql":
+        from sqlalchemy.dialects.mysql import insert as dialect_insert
+
+        stmt = dialect_insert(table)
+        return stmt.on_duplicate_key_update(
+            total_cents=table.c.total_cents + stmt.inserted.total_cents,
+            expense_count=table.c.expense_count + stmt.inserted.expense_count,
+        )
+
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    elif dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        raise ValueError(f"rollup upsert supports mysql/sqlite/postgresql, not {dialect!r}")
+
+    stmt = dialect_insert(table)
+    return stmt.on_conflict_do_update(
+        index_elements=[table.c.user_id, table.c.period, table.c.period_start, table.c.category],
+        set_={
+            "total_cents": table.c.total_cents + stmt.excluded.total_cents,
+            "expense_count": table.c.expense_count + stmt.excluded.expense_count,
+        },
+    )
+
+
+def _merge(rows: list[dict]) -> list[dict]:
+    """Net out deltas hitting the same bucket (e.g. an amount-only edit)."""
+    merged = {}
+    for row in rows:
+        key = (row["user_id"], row["period"], row["period_start"], row["category"])
+        if key in merged:
+            acc = merged[key]
+            acc["total_cents"] += row["total_cents"]
+            acc["expense_count"] += row["expense_count"]
+        else:
+            merged[key] = dict(row)
+    return [
+        row for row in merged.values()
+        if row["expense_count"] != 0 or row["total_cents"] != 0
+    ]
+
+
+async def apply_deltas(db, rows: list[dict]):
+    """Add `rows` (built with `delta`) onto the rollup. Caller commits."""
+    rows = _merge(rows)
+    if not rows:
+        return
+
+    await db.execute(_upsert_statement(), rows)
+
+    # Drop buckets that no longer hold any expense
+    if any(row["expense_count"] < 0 for row in rows):
+        await db.execute(
+            delete(ExpenseRollup).where(
+                ExpenseRollup.user_id.in_({row["user_id"] for row in rows}),
+                ExpenseRollup.expense_count <= 0,
+            )
+        )
+
+
+# ---------- READS ---------- #
+
+def summary_query(user_id: str, start: date, end: date, categories: tuple[str, ...] = ()):
+    """SUM(total_cents) GROUP BY category over [start, end], optionally only `categories`."""
+    R = ExpenseRollup
+
+    first_full = start if start.day == 1 else next_month(start)
+    after_last_full = month_start(end + timedelta(days=1))
+
+    if first_full >= after_last_full:
+        # No whole month inside the range → day rows only
+        windows = [and_(R.period == DAY, R.period_start.between(start, end))]
+    else:
+        windows = [
+            and_(
+                R.period == MONTH,
+                R.period_start >= first_full,
+                R.period_start < after_last_full,
+            )
+        ]
+        if start < first_full:
+            windows.append(and_(R.period == DAY, R.period_start >= start, R.period_start < first_full))
+        if after_last_full <= end:
+            windows.append(and_(R.period == DAY, R.period_start.between(after_last_full, end)))
+
+    query = (
+        select(R.category, func.sum(R.total_cents).label("total_cents"))
+        .where(R.user_id == user_id)
+        .where(or_(*windows))
+    )
+
+    if categories:
+        query = query.where(R.category.in_(categories))
+
+    return query.group_by(R.category).order_by(R.category)
+
+
+# ---------- REBUILD / CHECK ---------- #
+
+def daily_totals_query(user_id: str = None):
+    """Raw per-(user, day, category) totals straight from the expenses table."""
+    query = select(
+        Expense.user_id,
+        Expense.date,
+        Expense.category,
+        func.sum(Expense.amount_cents),
+        func.count(),
+    )
+    if user_id is not None:
+        query = query.where(Expense.user_id == user_id)
+    else:
+        query = query.where(Expense.user_id.is_not(None))
+    return query.group_by(Expense.user_id, Expense.date, Expense.category)
+
+
+def build_rollup_rows(daily_totals) -> list[dict]:
+    """Fold raw daily totals into day + month rollup rows."""
+    totals = defaultdict(lambda: [0, 0])
+    for user_id, day, category, cents, count in daily_totals:
+        for row in delta(user_id, day, category, cents, count):
+            acc = totals[(user_id, row["period"], row["period_start"], category)]
+            acc[0] += row["total_cents"]
+            acc[1] += count
+
+    return [
+        {
+            "user_id": user_id,
+            "period": period,
+            "period_start": start,
+            "category": category,
+            "total_cents": total,
+            "expense_count": count,
+        }
+        for (user_id, period, start, category), (total, count) in totals.items()
+    ]
+
+
+def backfill(conn, chunk: int = 10_000):
+    """Rebuild the whole rollup from raw rows (sync; used by migrations)."""
+    conn.execute(delete(ExpenseRollup))
+    rows = build_rollup_rows(conn.execute(daily_totals_query()).all())
+    for i in range(0, len(rows), chunk):
+        conn.execute(insert(ExpenseRollup), rows[i:i + chunk])
+
+
+async def lock_user(db, user_id: str):
+    """
+    Hold off every write to `user_id`'s expenses until the caller commits.
+    Every write tool (and the write-behind flush) changes expenses in the
+    transaction that moves the rollup, so this also freezes the rollup.
+    """
+    if engine.dialect.name == "sqlite":
+        # No row locks: any write takes the database write lock (as BEGIN IMMEDIATE would)
+        await db.execute(
+            update(ExpenseRollup)
+            .where(ExpenseRollup.user_id == user_id)
+            .values(expense_count=ExpenseRollup.expense_count)
+        )
+    else:
+        # Row and gap locks on the user's index range: edits, deletes and inserts wait
+        await db.execute(select(Expense.id).where(Expense.user_id == user_id).with_for_update())
+
+
+def _current(query):
+    # MySQL's plain SELECT reads the transaction's snapshot, which may predate
+    # lock_user; a locking read sees every commit made before the lock
+    return query.with_for_update(read=True) if engine.dialect.name == "mysql" else query
+
+
+async def verify_user(db, user_id: str, repair: bool = False) -> dict:
+    """
+    Rebuild one user's rollup from raw rows and diff it against the stored one.
+    With repair=True the user's writes are locked out (`lock_user`) and the
+    stored rows are replaced by the rebuilt ones (caller commits, which
+    releases the lock). Without it, a write committing mid-check can show
+    up as a mismatch.
+    """
+    if repair:
+        await lock_user(db, user_id)
+        daily, stored = _current(daily_totals_query(user_id)), _current(select(ExpenseRollup))
+    else:
+        daily, stored = daily_totals_query(user_id), select(ExpenseRollup)
+
+    expected = {
+        (row["period"], row["period_start"], row["category"]): row
+        for row in build_rollup_rows((await db.execute(daily)).all())
+    }
+
+    result = await db.execute(stored.where(ExpenseRollup.user_id == user_id))
+    stored = {(r.period, r.period_start, r.category): r for r in result.scalars().all()}
+
+    mismatches = []
+    for key in sorted(expected.keys() | stored.keys()):
+        want = expected.get(key)
+        have = stored.get(key)
+        want_total, want_count = (want["total_cents"], want["expense_count"]) if want else (0, 0)
+        have_total, have_count = (have.total_cents, have.expense_count) if have else (0, 0)
+
+        if want_count != have_count or want_total != have_total:
+            period, start, category = key
+            mismatches.append({
+                "period": period,
+                "period_start": str(start),
+                "category": category,
+                "expected": {"total_cents": want_total, "expense_count": want_count},
+                "stored": {"total_cents": have_total, "expense_count": have_count},
+            })
+
+    if repair and mismatches:
+        await db.execute(delete(ExpenseRollup).where(ExpenseRollup.user_id == user_id))
+        if expected:
+            await db.execute(insert(ExpenseRollup), list(expected.values()))
+
+    return {
+        "user_id": user_id,
+        "checked": len(expected),
+        "mismatches": mismatches,
+        "repaired": bool(repair and mismatches),
+    }
+
+
+if __name__ == "__main__":
+    # python -m db.rollup <user_id> [--repair]
+    import sys
+    import json
+    import asyncio
+    from db.database import AsyncSessionLocal
+
+    async def _check(user_id: str, repair: bool):
+        async with AsyncSessionLocal() as db:
+            report = await verify_user(db, user_id, repair=repair)
+            await db.commit()
+        await engine.dispose()
+        print(json.dumps(report, indent=2))
+
+    asyncio.run(_check(sys.argv[1], "--repair" in sys.argv[2:]))
@@ -0,0 +1,172 @@
+# db/search.py
+"""
+Full-text search over expense notes and subcategories.
+
+    mysql   FULLTEXT index `ft_expenses_note_subcategory` on (note,
+            subcategory), queried with MATCH ... AGAINST in boolean mode.
+            score = InnoDB relevance. A FULLTEXT index can't lead with
+            user_id, so MySQL matches across all users before the
+            user_id filter.
+    sqlite  FTS5 table `expenses_fts` with external content: it keeps
+            only the index, not a copy of the text. Besides note and
+            subcategory it indexes an `owner` column, the user id as one
+            hex token, and every query ANDs that token in, so the index
+            lookup itself is user-scoped. The owner column has weight 0
+            in bm25. Triggers on `expenses` keep the index in step with
+            every insert, update and delete path, so no tool has to.
+            score = -bm25 (higher is better, as on MySQL).
+
+`install` creates whichever one the dialect needs. Migration 7 runs it
+for existing databases, and `create_all` runs it after creating
+`expenses` (see models/Expense.py). Benchmarks that rebuild the schema
+get it too.
+
+A search string is reduced to word terms. Every term must match, and
+each one matches as a prefix, so "swig ord" finds "swiggy order". MySQL
+ignores words shorter than innodb_ft_min_token_size (3 by default), so
+those terms are dropped there. Results are ranked by score, then newest
+id first. Pages use keyset cursors on (score, id); see
+db/pagination.py.
+"""
+import re
+
+from sqlalchemy import select, inspect, text, table, column, literal_column
+from sqlalchemy.dialects.mysql import match
+
+from db.reads import EXPENSE_COLUMNS
+from models.Expense import Expense
+
+SEARCH_DIALECTS = ("mysql", "sqlite")
+
+FULLTEXT_INDEX = "ft_expenses_note_subcategory"
+FTS_TABLE = "expenses_fts"
+FTS_CONTENT = "expenses_fts_content"
+
+DEFAULT_SEARCH_PAGE_SIZE = 20
+MAX_SEARCH_PAGE_SIZE = 100
+MAX_TERMS = 8
+
+# InnoDB's default innodb_ft_min_token_size; shorter words are not indexed
+MYSQL_MIN_TERM = 3
+
+_WORD = re.compile(r"\w+")
+
+_FTS_DDL = (
+    # The content the FTS table indexes: note, subcategory and the owner token
+    f"""
+    CREATE VIEW IF NOT EXISTS {FTS_CONTENT} AS
+    SELECT id, note, subcategory, lower(hex(user_id)) AS owner FROM expenses
+    """,
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE}
+    USING fts5(note, subcategory, owner, content='{FTS_CONTENT}', content_rowid='id')
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON expenses BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, note, subcategory, owner)
+        VALUES (new.id, new.note, new.subcategory, lower(hex(new.user_id)));
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON expenses BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, note, subcategory, owner)
+        VALUES ('delete', old.id, old.note, old.subcategory, lower(hex(old.user_id)));
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF note, subcategory, user_id ON expenses BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, note, subcategory, owner)
+        VALUES ('delete', old.id, old.note, old.subcategory, lower(hex(old.user_id)));
+        INSERT INTO {FTS_TABLE}(rowid, note, subcategory, owner)
+        VALUES (new.id, new.note, new.subcategory, lower(hex(new.user_id)));
+    END
+    """,
+    # Rank on note and subcategory only; the owner column just scopes the match
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rank) VALUES ('rank', 'bm25(1.0, 1.0, 0.0)')",
+)
+
+
+# ---------- SCHEMA ---------- #
+
+def install(conn):
+    """Create the dialect's full-text index if it is missing (sync; idempotent)."""
+    dialect = conn.dialect.name
+    if dialect == "mysql":
+        existing = {index["name"] for index in inspect(conn).get_indexes("expenses")}
+        if FULLTEXT_INDEX not in existing:
+            conn.execute(text(f"CREATE FULLTEXT INDEX {FULLTEXT_INDEX} ON expenses (note, subcategory)"))
+
+    elif dialect == "sqlite":
+        created = not inspect(conn).has_table(FTS_TABLE)
+        for statement in _FTS_DDL:
+            conn.exec_driver_sql(statement)
+        # Index the rows that were there before the triggers were
+        if created:
+            conn.exec_driver_sql(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+
+def uninstall(conn):
+    """Drop the SQLite FTS table and its view (the triggers go with `expenses`)."""
+    if conn.dialect.name == "sqlite":
+        conn.exec_driver_sql(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+        conn.exec_driver_sql(f"DROP VIEW IF EXISTS {FTS_CONTENT}")
+
+
+# ---------- QUERIES ---------- #
+
+def search_terms(query: str, dialect: str) -> list[str]:
+    """Lower-cased word terms of `query`, de-duplicated, at most MAX_TERMS."""
+    terms = dict.fromkeys(word.lower() for word in _WORD.findall(query or ""))
+    if dialect == "mysql":
+        terms = [term for term in terms if len(term) >= MYSQL_MIN_TERM]
+    return list(terms)[:MAX_TERMS]
+
+
+def clamp_search_limit(limit) -> int:
+    if not limit or limit < 1:
+        return DEFAULT_SEARCH_PAGE_SIZE
+    return min(int(limit), MAX_SEARCH_PAGE_SIZE)
+
+
+def owner_token(user_id: str) -> str:
+    """The FTS5 `owner` value for `user_id`: its UTF-8 bytes as lower-case hex (one token)."""
+    return user_id.encode().hex()
+
+
+def search_query(dialect: str, user_id: str, terms: list[str], *where):
+    """
+    `(select, score)`: EXPENSE_COLUMNS plus `score` for the user's expenses
+    matching every term and `where`, best first. `score` is the expression
+    the keyset cursor compares against.
+    """
+    if dialect == "mysql":
+        score = match(
+            Expense.note, Expense.subcategory,
+            against=" ".join(f"+{term}*" for term in terms),
+        ).in_boolean_mode()
+        query = select(*EXPENSE_COLUMNS, score.label("score")).where(
+            score > 0, Expense.user_id == user_id, *where  # 🔐 only this user's rows
+        )
+
+    elif dialect == "sqlite":
+        fts = table(FTS_TABLE, column("rowid"), column("rank"))
+        # Terms are quoted so they are never read as FTS5 operators (AND,
+        # NEAR, column:). The owner phrase makes the index itself user-scoped.
+        expression = 'owner : "{}" AND {{note subcategory}} : ({})'.format(
+            owner_token(user_id), " AND ".join(f'"{term}"*' for term in terms)
+        )
+        score = -fts.c.rank
+        query = (
+            select(*EXPENSE_COLUMNS, score.label("score"))
+            .select_from(fts.join(Expense.__table__, Expense.id == fts.c.rowid))
+            .where(
+                literal_column(FTS_TABLE).op("MATCH")(expression),
+                Expense.user_id == user_id,  # 🔐 only this user's rows
+                *where
+            )
+        )
+
+    else:
+        raise ValueError(f"Full-text search supports {SEARCH_DIALECTS}, not {dialect!r}")
+
+    return query.order_by(score.desc(), Expense.id.desc()), score
@@ -0,0 +1,340 @@
+# db/write_behind.py
+"""
+Write-behind batching for `add_expense`.
+
+In the default `sync` mode every add_expense call opens its own session
+and commits. In the queued modes, add_expense puts the validated row on
+an in-process asyncio queue instead. One background task drains the
+queue and commits whole batches: one INSERT executemany, one rollup
+upsert and one COMMIT. A batch is flushed once `WRITE_BATCH_SIZE` rows
+are waiting, or `WRITE_BATCH_DELAY_MS` after its first row.
+
+    sync    commit per call, reply after COMMIT              (durable)
+    group   queue, reply once the row's batch has committed  (durable)
+    behind  queue, reply as soon as the row is queued        (rows still
+            queued are lost if the process dies without shutting down)
+
+A row needs its id before it is inserted, so queued rows take ids from
+blocks reserved in the `id_sequences` table (`IdBlocks`). A block
+always starts above MAX(expenses.id). Migrations create the table's
+`expenses` row, so reserving a block only locks that existing row. While the writer runs
+(`assigns_ids`), the synchronous insert paths draw their ids from the
+same blocks, so AUTO_INCREMENT never hands out an id that is still
+queued. Every worker sharing a database must run the same mode.
+
+Read, edit and delete tools are wrapped in `settled`. It waits for the
+user's queued rows to commit first, so users always see their own
+writes. `stop` (called from the server lifespan) flushes whatever is
+still queued; a call that was still reserving its id when `stop` began
+writes its own row. If a batch fails, it is retried one row at a time so a
+single bad row doesn't lose its neighbours.
+
+Settings (defaults in brackets):
+
+    EXPENSE_WRITE_MODE      sync | group | behind                   [sync]
+    WRITE_BATCH_SIZE        rows per group commit                   [200]
+    WRITE_BATCH_DELAY_MS    how long a batch waits to fill up       [5]
+    WRITE_QUEUE_MAX         queued rows before add_expense waits    [10000]
+    WRITE_ID_BLOCK          ids reserved per id_sequences update    [1000]
+"""
+import os
+import time
+import asyncio
+import logging
+import functools
+
+from sqlalchemy import select, insert, update, func
+from sqlalchemy.exc import IntegrityError, OperationalError
+
+from db.database import engine, AsyncSessionLocal
+from db.rollup import apply_deltas, build_rollup_rows
+from models.Expense import Expense
+from models.IdSequence import IdSequence
+from services.env import env_int
+
+logger = logging.getLogger(__name__)
+
+WRITE_MODES = ("sync", "group", "behind")
+
+MYSQL_DEADLOCK = 1213   # ER_LOCK_DEADLOCK
+
+
+class IdBlocks:
+    """Ids for `table`, claimed from id_sequences a block at a time."""
+
+    def __init__(self, table, block_size: int):
+        self.table = table
+        self.block_size = block_size
+        self._next = 0
+        self._end = 0
+        self._lock = asyncio.Lock()
+        self.reservations = 0
+
+    async def _reserve(self, n: int) -> int:
+        """Claim [start, start + n) in one short transaction. Returns start."""
+        seq = IdSequence.__table__
+        name = self.table.name
+        while True:
+            try:
+                async with engine.begin() as conn:
+                    row = (await conn.execute(
+                        select(seq.c.next_id).where(seq.c.name == name).with_for_update()
+                    )).first()
+                    # Rows inserted with AUTO_INCREMENT move the floor up too
+                    floor = (await conn.execute(select(func.max(self.table.c.id)))).scalar() or 0
+                    start = max(row.next_id if row else 0, floor + 1)
+
+                    if row is None:
+                        await conn.execute(insert(seq).values(name=name, next_id=start + n))
+                    else:
+                        await conn.execute(update(seq).where(seq.c.name == name).values(next_id=start + n))
+            except IntegrityError:
+                continue    # another worker created the row first; lock it and retry
+            except OperationalError as exc:
+                # Only without the row migrations seed: two workers creating it
+                # can gap-lock each other on MySQL (1213), and one is rolled back
+                if getattr(exc.orig, "args", (None,))[0] != MYSQL_DEADLOCK:
+                    raise
+                continue
+            self.reservations += 1
+            return start
+
+    async def take(self, n: int = 1) -> range:
+        """`n` unused ids, in ascending order."""
+        async with self._lock:
+            if n > self.block_size:
+                start = await self._reserve(n)
+                return range(start, start + n)
+
+            if self._end - self._next < n:
+                self._next = await self._reserve(self.block_size)
+                self._end = self._next + self.block_size
+
+            start = self._next
+            self._next += n
+            return range(start, start + n)
+
+
+class WriteBehind:
+    def __init__(self, mode: str, batch_size: int, delay: float, queue_max: int, id_block: int):
+        if mode not in WRITE_MODES:
+            raise ValueError(f"EXPENSE_WRITE_MODE must be one of {WRITE_MODES}, got {mode!r}")
+        self.mode = mode
+        self.batch_size = max(1, batch_size)
+        self.delay = delay
+        self.queue_max = queue_max
+        self.ids = IdBlocks(Expense.__table__, id_block)
+
+        self._queue = None
+        self._task = None
+        self._closing = False
+        self._on_commit = None
+        self._pending = {}      # user_id -> futures of rows not yet committed
+
+        self.batches = 0
+        self.rows = 0
+        self.failed = 0
+        self.max_batch = 0
+        self.commit_seconds = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        """True when add_expense should queue (a queued mode and the writer running)."""
+        return self.mode != "sync" and self._task is not None and not self._closing
+
+    @property
+    def assigns_ids(self) -> bool:
+        """True while queued rows may be outstanding: every insert must take its id from `ids`."""
+        return self._task is not None
+
+    def start(self, on_commit=None):
+        """Start the writer task. `on_commit(user_id)` runs after each batch commits."""
+        if self.mode == "sync" or self._task is not None:
+            return
+        self._queue = asyncio.Queue(self.queue_max)
+        self._on_commit = on_commit
+        self._closing = False
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Flush every queued row, then stop the writer."""
+        if self._task is None:
+            return
+        self._closing = True    # new add_expense calls commit synchronously from here on
+        await self._queue.put(None)
+        await self._task
+        # Callers that were waiting on a full queue when the stop signal went in
+        await self._flush_leftovers()
+        self._task = None
+
+    # ---------- PRODUCERS ---------- #
+
+    async def submit(self, row: dict) -> int:
+        """
+        Queue one expense row (every column but `id`). Returns its id.
+        In `group` mode, waits for the commit and raises if it failed.
+        """
+        (expense_id,) = await self.ids.take()
+        row["id"] = expense_id
+
+        # take() may have waited on the database while stop() ran: the
+        # writer may be gone, so write the row here rather than queue it.
+        if self._closing or self._task is None:
+            await self._commit([row])
+            if self._on_commit:
+                await self._on_commit(row["user_id"])
+            return expense_id
+
+        user_id = row["user_id"]
+        future = asyncio.get_running_loop().create_future()
+        self._pending.setdefault(user_id, set()).add(future)
+        future.add_done_callback(functools.partial(self._landed, user_id))
+
+        await self._queue.put((row, future))
+        if self._task is None:
+            # Waited on a full queue until after stop() finished: nobody else will drain it
+            await self._flush_leftovers()
+        if self.mode == "group":
+            await asyncio.shield(future)
+        return expense_id
+
+    def _landed(self, user_id: str, future):
+        pending = self._pending.get(user_id)
+        if pending is not None:
+            pending.discard(future)
+            if not pending:
+                del self._pending[user_id]
+        if not future.cancelled():
+            future.exception()      # retrieved: in `behind` mode nobody awaits it
+
+    async def settle(self, user_id: str):
+        """Wait until every row queued for `user_id` so far has been written (or failed)."""
+        pending = self._pending.get(user_id)
+        if pending:
+            await asyncio.wait(list(pending))
+
+    def settled(self, fn):
+        """Decorator: run `fn` (first parameter `user_id`) after the user's queued rows commit."""
+
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            if self._pending:
+                await self.settle(args[0] if args else kwargs["user_id"])
+            return await fn(*args, **kwargs)
+
+        return wrapper
+
+    # ---------- WRITER ---------- #
+
+    def _drain(self) -> list:
+        entries = []
+        while len(entries) < self.batch_size:
+            try:
+                entries.append(self._queue.get_nowait())
+            except asyncio.QueueEmpty:
+                break
+        return entries
+
+    async def _fill(self, batch: list) -> bool:
+        """Add entries to `batch` until it is full or the delay runs out. True on the stop signal."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.delay
+        while len(batch) < self.batch_size:
+            try:
+                entry = self._queue.get_nowait()
+            except asyncio.QueueEmpty:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    entry = await asyncio.wait_for(self._queue.get(), remaining)
+                except TimeoutError:
+                    break
+            if entry is None:
+                return True
+            batch.append(entry)
+        return False
+
+    async def _flush_leftovers(self):
+        while not self._queue.empty():
+            await self._flush([entry for entry in self._drain() if entry is not None])
+
+    async def _run(self):
+        while True:
+            first = await self._queue.get()
+            if first is None:
+                return
+            batch = [first]
+            stopping = await self._fill(batch)
+            await self._flush(batch)
+            if stopping:
+                return
+
+    async def _commit(self, rows: list[dict]):
+        started = time.perf_counter()
+        async with AsyncSessionLocal() as db:
+            await db.execute(insert(Expense.__table__), rows)
+            await apply_deltas(
+                db,
+                build_rollup_rows((r["user_id"], r["date"], r["category"], r["amount_cents"], 1) for r in rows)
+            )
+            await db.commit()
+
+        self.commit_seconds += time.perf_counter() - started
+        self.batches += 1
+        self.rows += len(rows)
+        self.max_batch = max(self.max_batch, len(rows))
+
+    async def _flush(self, batch: list):
+        if not batch:
+            return
+        try:
+            await self._commit([row for row, _ in batch])
+        except Exception as exc:
+            if len(batch) > 1:
+                logger.warning("write-behind batch of %d failed (%s); retrying row by row", len(batch), exc)
+                for entry in batch:
+                    await self._flush([entry])
+                return
+
+            row, future = batch[0]
+            self.failed += 1
+            logger.error("write-behind dropped expense id=%s user_id=%s: %s", row["id"], row["user_id"], exc)
+            if not future.done():
+                future.set_exception(exc)
+            return
+
+        # Invalidate before resolving, so a settled read can't see stale results
+        if self._on_commit:
+            for user_id in dict.fromkeys(row["user_id"] for row, _ in batch):
+                try:
+                    await self._on_commit(user_id)
+                except Exception:
+                    logger.exception("write-behind on_commit failed for user_id=%s", user_id)
+
+        for _, future in batch:
+            if not future.done():
+                future.set_result(None)
+
+    def stats(self) -> dict:
+        return {
+            "mode": self.mode,
+            "running": self._task is not None,
+            "queued": self._queue.qsize() if self._queue else 0,
+            "pending_users": len(self._pending),
+            "batches": self.batches,
+            "rows": self.rows,
+            "failed": self.failed,
+            "max_batch": self.max_batch,
+            "commit_ms_total": round(self.commit_seconds * 1000, 3),
+            "id_reservations": self.ids.reservations,
+        }
+
+
+write_behind = WriteBehind(
+    mode=os.getenv("EXPENSE_WRITE_MODE", "sync").strip().lower(),
+    batch_size=env_int("WRITE_BATCH_SIZE", 200),
+    delay=env_int("WRITE_BATCH_DELAY_MS", 5) / 1000,
+    queue_max=env_int("WRITE_QUEUE_MAX", 10_000),
+    id_block=env_int("WRITE_ID_BLOCK", 1000),
+)
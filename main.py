@@ -1,32 +1,122 @@
 # main.py
+import os
+import sys
 import asyncio
+import anyio
+from contextlib import asynccontextmanager
 from fastmcp import FastMCP
 from sqlalchemy.future import select
-from sqlalchemy import update, delete, func
-from db.database import engine, get_db, Base, AsyncSessionLocal
+from sqlalchemy import update, delete, insert, func, and_
+from db.database import engine, AsyncSessionLocal, POOL_WARMUP, POOL_STATS_INTERVAL, SCHEMA_CHECK
+from db.pool import warm_pool, report_pool_stats, pool_stats
+from db.rollup import apply_deltas, delta, summary_query, build_rollup_rows
+from db.analytics import spending_query, fold as fold_spending
+from db import pagination
+from db.reads import select_expenses, serialize, encode_rows, EXPENSE_COLUMNS
+from db.write_behind import write_behind
+from db.search import search_terms, search_query, clamp_search_limit, SEARCH_DIALECTS
+from db.budgets import (
+    budgets_query, spent_query, upsert_budget, fold as fold_budgets, reconcile_periodically, RECONCILE_INTERVAL,
+)
+from services.dates import (
+    parse_date, parse_month, today, is_period, period_range, expand_period, previous_window, BUCKETS,
+)
+from services.money import to_cents, from_cents
+from services.categories import get_index, normalize_category, category_keys, category_warning
+from services.cache import result_cache
+from services.flight import single_flight, user_limiter
+from services.offload import cpu_offload
+from services import export as exports
+from services.metrics import (
+    instrument, track_db_time, render as render_metrics, publish as publish_metrics,
+    publish_periodically as publish_metrics_periodically, METRICS_DIR, METRICS_PUBLISH_SECONDS,
+)
+from services.env import env_int
+from services.log import setup_logging, get_logger
 from models.Expense import Expense
-from datetime import datetime
-from sqlalchemy import delete, and_
+from models.Budget import Budget
 from typing import Optional
+from types import SimpleNamespace
+from collections import Counter
 
-mcp = FastMCP("ExpenseTracker")
+setup_logging()
+logger = get_logger("kharchamind")
+track_db_time(engine)
+
+
+# In-memory clients (tests, benchmarks) each enter the lifespan; only the
+# first one in sets things up and only the last one out tears them down.
+_lifespan = {"entered": 0, "ready": False, "tasks": [], "setup": asyncio.Lock()}
 
 
-#  Ensure tables exist (MySQL)
 async def init_db():
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+    """Ensure tables exist and migrations are applied (DB_SCHEMA_CHECK=auto|always|off)."""
+    from db.migrations import ensure_schema   # startup-only
+
+    applied = await ensure_schema(engine, SCHEMA_CHECK)
+    if applied:
+        logger.info("applied schema migrations %s", applied)
+
+
+@asynccontextmanager
+async def lifespan(server):
+    """
+    Runs inside the server's event loop: bring the schema up to date, warm
+    the pool, report its stats. Connections opened here belong to the
+    loop that serves requests, so nothing has to be thrown away.
+    """
+    _lifespan["entered"] += 1
+    try:
+        async with _lifespan["setup"]:
+            if not _lifespan["ready"]:
+                await init_db()
+                await warm_pool(engine, POOL_WARMUP)
+                if POOL_STATS_INTERVAL > 0:
+                    _lifespan["tasks"].append(asyncio.create_task(
+                        report_pool_stats(engine, POOL_STATS_INTERVAL)
+                    ))
+                if RECONCILE_INTERVAL > 0:
+                    _lifespan["tasks"].append(asyncio.create_task(
+                        reconcile_periodically(AsyncSessionLocal, RECONCILE_INTERVAL)
+                    ))
+                if METRICS_DIR is not None and METRICS_PUBLISH_SECONDS > 0:
+                    _lifespan["tasks"].append(asyncio.create_task(
+                        publish_metrics_periodically(metric_gauges, METRICS_PUBLISH_SECONDS)
+                    ))
+                write_behind.start(on_commit=invalidate_reads)
+                _lifespan["ready"] = True
+        yield {}
+    finally:
+        _lifespan["entered"] -= 1
+        if _lifespan["entered"] == 0:
+            _lifespan["ready"] = False
+            for task in _lifespan["tasks"]:
+                task.cancel()
+            _lifespan["tasks"].clear()
+            # The closing client's cancel scope must not abort the flush or
+            # the dispose, or queued rows are lost and open driver
+            # connections (and their threads) outlive the loop.
+            with anyio.CancelScope(shield=True):
+                await write_behind.stop()
+                await engine.dispose()
+                await asyncio.to_thread(cpu_offload.shutdown)
+            publish_metrics(None)       # keep this worker's counts in the total, drop its gauges
+
+
+mcp = FastMCP("ExpenseTracker", lifespan=lifespan)
 
 
 # ---------- TOOLS ---------- #
 
-from datetime import datetime
-# from fastmcp import tool
-from models.Expense import Expense
-from db.database import AsyncSessionLocal
+async def invalidate_reads(user_id: str):
+    """After a write commits: drop the user's cached and in-flight read results."""
+    single_flight.forget_user(user_id)
+    await result_cache.invalidate_user(user_id)
 
 
 @mcp.tool()
+@instrument
+@user_limiter.limited
 async def add_expense(
     user_id: str,
     date: str = None,
@@ -36,7 +126,7 @@ async def add_expense(
     note: str = ""
 ):
     """Add a new expense entry (user-specific). only amount date and category is mandatory."""
-    print(">>> TOOL RECEIVED USER_ID:", user_id)
+    logger.debug("add_expense user_id=%s", user_id)
     if not date:
         return {
             "status": "ask_input",
@@ -51,6 +141,7 @@ async def add_expense(
             "message": "How much did you spend?"
         }
 
+    category = normalize_category(category or "")
     if not category:
         return {
             "status": "ask_input",
@@ -59,68 +150,242 @@ async def add_expense(
         }
 
     try:
-        parsed_date = datetime.strptime(date, "%Y-%m-%d").date()
+        parsed_date = parse_date(date)
     except ValueError:
         return {"status": "error", "message": "Invalid date format."}
 
+    try:
+        amount_cents = to_cents(amount)
+    except ValueError:
+        return {"status": "error", "message": "Invalid amount."}
+
+    row = {
+        "user_id": user_id,   # IMPORTANT
+        "date": parsed_date,
+        "amount_cents": amount_cents,
+        "category": category,
+        "subcategory": normalize_category(subcategory or "") or None,
+        "note": note or None,
+    }
+
+    if write_behind.enabled:
+        # Group commit by the write-behind task (see db/write_behind.py)
+        try:
+            expense_id = await write_behind.submit(row)
+        except Exception:
+            return {"status": "error", "message": "Could not save the expense. Please try again."}
+    else:
+        if write_behind.assigns_ids:
+            (row["id"],) = await write_behind.ids.take()
+        async with AsyncSessionLocal() as db:
+            new_expense = Expense(**row)
+            db.add(new_expense)
+            await apply_deltas(db, delta(user_id, parsed_date, category, amount_cents))
+            await db.commit()
+            await invalidate_reads(user_id)
+            await db.refresh(new_expense)
+            expense_id = new_expense.id
+
+    response = {
+        "status": "ok",
+        "message": f"Expense added!",
+        "data": {
+            "id": expense_id,
+            "user_id": user_id,
+            "date": str(parsed_date),
+            "amount": from_cents(amount_cents),
+            "category": category
+        }
+    }
+    # Saved either way; flag it so the user can fix a typo
+    warning = category_warning(category, row["subcategory"])
+    if warning:
+        response["warning"] = warning
+    return response
+
+
+BATCH_CHUNK_SIZE = 1000
+MAX_BATCH_CHUNK_SIZE = 10_000
+
+
+@mcp.tool()
+@instrument
+@user_limiter.limited
+async def add_expenses_batch(
+    user_id: str,
+    expenses: Optional[list[dict]] = None,
+    csv_data: Optional[str] = None,
+    jsonl_data: Optional[str] = None,
+    chunk_size: int = BATCH_CHUNK_SIZE
+):
+    """
+    Add many expenses in one call (user-specific), e.g. a bank statement import.
+    Provide exactly one of:
+    - expenses: list of {date, amount, category, subcategory, note}
+    - csv_data: CSV text with a header row (date,amount,category,subcategory,note)
+    - jsonl_data: one JSON expense object per line
+
+    Every row is validated first; nothing is saved unless all rows are valid.
+    """
+    sources = [s for s in (expenses, csv_data, jsonl_data) if s]
+    if len(sources) != 1:
+        return {
+            "status": "ask_input",
+            "field": "expenses",
+            "message": "Please provide the expenses as exactly one of: a list, CSV text, or JSONL text."
+        }
+
+    from services.ingest import parse_csv, parse_jsonl, validate_rows   # batch imports only
+
+    if expenses:
+        rows = expenses
+    elif csv_data:
+        rows = parse_csv(csv_data)
+    else:
+        rows = parse_jsonl(jsonl_data)
+
+    if not rows:
+        return {"status": "error", "message": "No expense rows found in the input."}
+
+    # -------------------------------------------------
+    # 1. Validate everything before touching the DB
+    # -------------------------------------------------
+    clean, errors = validate_rows(rows)
+    if errors:
+        return {
+            "status": "error",
+            "message": f"{len(errors)} of {len(rows)} rows are invalid. Nothing was saved.",
+            "results": errors
+        }
+
+    for row in clean:
+        row["user_id"] = user_id   # IMPORTANT
+
+    chunk_size = max(1, min(int(chunk_size or BATCH_CHUNK_SIZE), MAX_BATCH_CHUNK_SIZE))
+
+    # -------------------------------------------------
+    # 2. executemany in chunks, one transaction
+    # -------------------------------------------------
+    # MySQL can't return ids from an executemany INSERT; ids are only
+    # reported where the dialect supports RETURNING. Autoincrement ids are
+    # handed out in VALUES order, so sorting them restores input order —
+    # sort_by_parameter_order=True would fall back to one INSERT per row.
+    # While write-behind rows may be queued, ids come from its reserved
+    # blocks instead (autoincrement could reuse an id that is still queued).
+    ids = []
+    preassigned = write_behind.assigns_ids
+    if preassigned:
+        ids = list(await write_behind.ids.take(len(clean)))
+        for row, expense_id in zip(clean, ids):
+            row["id"] = expense_id
+
+    with_ids = not preassigned and engine.dialect.insert_executemany_returning
+    stmt = insert(Expense.__table__)
+    if with_ids:
+        stmt = stmt.returning(Expense.__table__.c.id)
+
     async with AsyncSessionLocal() as db:
-        new_expense = Expense(
-            user_id=user_id,   # IMPORTANT
-            date=parsed_date,
-            amount=amount,
-            category=category,
-            subcategory=subcategory or None,
-            note=note or None
+        for start in range(0, len(clean), chunk_size):
+            result = await db.execute(stmt, clean[start:start + chunk_size])
+            if with_ids:
+                ids.extend(sorted(result.scalars().all()))
+
+        await apply_deltas(
+            db,
+            build_rollup_rows((user_id, r["date"], r["category"], r["amount_cents"], 1) for r in clean)
         )
-        db.add(new_expense)
         await db.commit()
-        await db.refresh(new_expense)
+        await invalidate_reads(user_id)
 
-        return {
-            "status": "ok",
-            "message": f"Expense added!",
-            "data": {
-                "id": new_expense.id,
-                "user_id": user_id,
-                "date": str(parsed_date),
-                "amount": amount,
-                "category": category
-            }
-        }
+    response = {
+        "status": "ok",
+        "message": f"{len(clean)} expenses added!",
+        "inserted": len(clean),
+        "total_amount": from_cents(sum(r["amount_cents"] for r in clean)),
+    }
+    if with_ids or preassigned:
+        response["ids"] = ids   # same order as the input rows
+
+    # Categories outside categories.json: one note per distinct value, with its row count
+    warnings = Counter(
+        warning for warning in (category_warning(r["category"], r["subcategory"]) for r in clean) if warning
+    )
+    if warnings:
+        response["warnings"] = [{"message": message, "rows": rows} for message, rows in warnings.items()]
+    return response
 
 
 
 
+LIST_FORMATS = ("rows", "columnar")
+
+
+async def _encode_listing(format: str, rows):
+    """Listing payload; very large ones are encoded in the CPU offload pool."""
+    if cpu_offload.offloads(len(rows)):
+        rows = [tuple(row) for row in rows]     # Rows pickle several times slower than tuples
+    return await cpu_offload.run(encode_rows, format, rows, size=len(rows))
+
+
 @mcp.tool()
+@instrument
+@write_behind.settled
+@result_cache.cached("list_expenses")
+@single_flight.coalesced("list_expenses")
+@user_limiter.limited
 async def list_expenses(
     user_id: str,
     start_date: Optional[str] = None,
     end_date: Optional[str] = None,
-    date: Optional[str] = None
+    date: Optional[str] = None,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    format: str = "rows"
 ):
     """
     List expenses:
     - for a specific date (date="YYYY-MM-DD")
     - OR for a date range (start_date + end_date)
+
+    Range listings are paged: pass the returned `next_cursor` back as `cursor`
+    to fetch the next page (`limit` rows per page, default 200, max 1000).
+
+    Dates may also be "today"/"yesterday", and a period such as "this week",
+    "last month" or "this year" may be given as `date` or `start_date`.
+
+    format="columnar" returns `expenses` as parallel arrays (id, date, amount,
+    category, subcategory) instead of one object per expense — much smaller
+    for big listings. category/subcategory are codes decoded by
+    `expenses.dictionary`; notes are listed only for the rows (`note_index`) that have one.
     """
 
+    if format not in LIST_FORMATS:
+        return {"status": "error", "message": f"format must be one of: {', '.join(LIST_FORMATS)}."}
+
+    # Relative periods ("last month") become a plain date range
+    if is_period(date):
+        start, end = period_range(date)
+        start_date, end_date, date = start.isoformat(), end.isoformat(), None
+    start_date, end_date = expand_period(start_date, end_date)
+
     # -------------------------------------------------
     # 1. LIST FOR SPECIFIC DATE
     # -------------------------------------------------
     if date:
         try:
-            parsed_date = datetime.strptime(date, "%Y-%m-%d").date()
+            parsed_date = parse_date(date)
         except ValueError:
             return {"status": "error", "message": "Invalid date format. Use YYYY-MM-DD."}
 
         async with AsyncSessionLocal() as db:
             result = await db.execute(
-                select(Expense)
-                .where(Expense.user_id == user_id)
-                .where(Expense.date == parsed_date)
+                select_expenses(
+                    Expense.user_id == user_id,
+                    Expense.date == parsed_date
+                )
             )
 
-            expenses = result.scalars().all()
+            expenses = result.all()
 
             if not expenses:
                 return {"status": "no_data", "message": f"No expenses found on {parsed_date}."}
@@ -128,19 +393,10 @@ async def list_expenses(
             return {
                 "status": "ok",
                 "mode": "single_date",
+                "format": format,
                 "date": str(parsed_date),
                 "total": len(expenses),
-                "expenses": [
-                    {
-                        "id": e.id,
-                        "date": e.date.isoformat(),
-                        "amount": e.amount,
-                        "category": e.category,
-                        "subcategory": e.subcategory,
-                        "note": e.note
-                    }
-                    for e in expenses
-                ]
+                "expenses": await _encode_listing(format, expenses)
             }
 
     # -------------------------------------------------
@@ -149,49 +405,63 @@ async def list_expenses(
     if start_date and end_date:
         # Validate dates
         try:
-            parsed_start = datetime.strptime(start_date, "%Y-%m-%d").date()
-            parsed_end = datetime.strptime(end_date, "%Y-%m-%d").date()
+            parsed_start = parse_date(start_date)
+            parsed_end = parse_date(end_date)
         except ValueError:
             return {"status": "error", "message": "Invalid date format. Use YYYY-MM-DD."}
 
         if parsed_end < parsed_start:
             return {"status": "error", "message": "End date cannot be earlier than start date."}
 
-        async with AsyncSessionLocal() as db:
-            result = await db.execute(
-                select(Expense)
-                .where(Expense.user_id == user_id)
-                .where(Expense.date.between(parsed_start, parsed_end))
-                .order_by(Expense.date.asc())
-            )
+        page_size = pagination.clamp_limit(limit)
 
-            expenses = result.scalars().all()
+        query = select_expenses(
+            Expense.user_id == user_id,
+            Expense.date.between(parsed_start, parsed_end)
+        )
 
-            if not expenses:
-                return {
-                    "status": "no_data",
-                    "message": f"No expenses found between {parsed_start} and {parsed_end}."
-                }
+        if cursor:
+            try:
+                query = query.where(pagination.after(Expense.date, Expense.id, cursor))
+            except ValueError:
+                return {"status": "error", "message": "Invalid cursor. Start again without a cursor."}
+
+        # One extra row tells us whether another page exists
+        query = query.order_by(Expense.date.asc(), Expense.id.asc()).limit(page_size + 1)
 
+        expenses = []
+        has_more = False
+        last_key = None
+        async with AsyncSessionLocal() as db:
+            result = await db.stream(query)
+            async for e in result:
+                if len(expenses) == page_size:
+                    has_more = True
+                    break
+                expenses.append(e)
+                last_key = (e.date, e.id)
+            await result.close()
+
+        if not expenses:
+            if cursor:
+                return {"status": "no_data", "message": "No more expenses in this range."}
             return {
-                "status": "ok",
-                "mode": "range",
-                "start_date": str(parsed_start),
-                "end_date": str(parsed_end),
-                "total": len(expenses),
-                "expenses": [
-                    {
-                        "id": e.id,
-                        "date": e.date.isoformat(),
-                        "amount": e.amount,
-                        "category": e.category,
-                        "subcategory": e.subcategory,
-                        "note": e.note
-                    }
-                    for e in expenses
-                ]
+                "status": "no_data",
+                "message": f"No expenses found between {parsed_start} and {parsed_end}."
             }
 
+        return {
+            "status": "ok",
+            "mode": "range",
+            "format": format,
+            "start_date": str(parsed_start),
+            "end_date": str(parsed_end),
+            "total": len(expenses),
+            "has_more": has_more,
+            "next_cursor": pagination.encode_cursor(*last_key) if has_more else None,
+            "expenses": await _encode_listing(format, expenses)
+        }
+
     # -------------------------------------------------
     # 3. Missing inputs → Ask the user
     # -------------------------------------------------
@@ -217,6 +487,104 @@ async def list_expenses(
 
 
 @mcp.tool()
+@instrument
+@write_behind.settled
+@user_limiter.limited
+async def export_expenses(
+    user_id: str,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    category: Optional[str] = None,
+    format: str = "csv",
+    compress: bool = False
+):
+    """
+    Export expenses in a date range to a file, for requests like "all my
+    expenses this year" that are too big for `list_expenses`.
+    `start_date` may also be a period such as "this year".
+
+    format="csv" (compress=True → .csv.gz) or "parquet" (needs the `parquet` extra).
+    Returns the file's `path` on the server and an `export_id`. The file can
+    be downloaded through the `expense://exports/{user_id}/{export_id}/{part}`
+    resource, parts 0 .. parts - 1.
+    """
+
+    if format not in exports.EXPORT_FORMATS:
+        return {"status": "error", "message": f"format must be one of: {', '.join(exports.EXPORT_FORMATS)}."}
+    if format == "parquet" and not exports.parquet_available():
+        return {"status": "error", "message": "Parquet export needs pyarrow on the server (the `parquet` extra). Use format='csv'."}
+
+    start_date, end_date = expand_period(start_date, end_date)
+
+    #  Step 1: Both ends of the range are required
+    if not start_date or not end_date:
+        return {
+            "status": "ask_input",
+            "field": "end_date" if start_date else "start_date",
+            "message": "Please provide a start_date and end_date (or a period such as 'this year') to export."
+        }
+
+    #  Step 2: Validate dates
+    try:
+        parsed_start = parse_date(start_date)
+        parsed_end = parse_date(end_date)
+    except ValueError:
+        return {"status": "error", "message": "Invalid date format. Use YYYY-MM-DD."}
+
+    if parsed_end < parsed_start:
+        return {"status": "error", "message": "End date cannot be earlier than start date."}
+
+    query = select_expenses(
+        Expense.user_id == user_id,  # 🔐 only this user's rows
+        Expense.date.between(parsed_start, parsed_end)
+    )
+    if category:
+        query = query.where(Expense.category.in_(category_keys(category)))
+    query = query.order_by(Expense.date.asc(), Expense.id.asc())
+
+    #  Step 3: Stream chunk by chunk into the file (server-side cursor)
+    await asyncio.to_thread(exports.sweep)
+    export = await asyncio.to_thread(exports.ExportFile, user_id, format, compress)
+    try:
+        async with AsyncSessionLocal() as db:
+            result = await db.stream(query.execution_options(yield_per=exports.EXPORT_CHUNK_ROWS))
+            async for chunk in result.partitions():
+                await asyncio.to_thread(export.write, chunk)
+        if not export.rows:
+            await asyncio.to_thread(export.discard)
+            return {
+                "status": "no_data",
+                "message": f"No expenses found between {parsed_start} and {parsed_end}."
+            }
+        size = await asyncio.to_thread(export.finish)
+    except BaseException:
+        await asyncio.to_thread(export.discard)
+        raise
+
+    #  Step 4: Where to find it
+    parts = exports.part_count(size)
+    return {
+        "status": "ok",
+        "message": f"Exported {export.rows} expenses from {parsed_start} to {parsed_end} as {export.path.name}.",
+        "export_id": export.export_id,
+        "format": format,
+        "compressed": compress,
+        "mime_type": exports.mime_type(format, compress),
+        "rows": export.rows,
+        "bytes": size,
+        "path": str(export.path),
+        "parts": parts,
+        "resource_uri": f"expense://exports/{user_id}/{export.export_id}/{{part}}",
+        "expires_in_seconds": exports.EXPORT_TTL_SECONDS or None,
+    }
+
+
+@mcp.tool()
+@instrument
+@write_behind.settled
+@result_cache.cached("summarize")
+@single_flight.coalesced("summarize")
+@user_limiter.limited
 async def summarize(
     user_id: str,
     start_date: Optional[str] = None,
@@ -225,8 +593,11 @@ async def summarize(
 ):
     """
     Summarize total expenses (user-specific) within a date range.
+    `start_date` may also be a period such as "this month" or "last year".
     """
 
+    start_date, end_date = expand_period(start_date, end_date)
+
     #  Step 1: Check missing dates politely
     if not start_date and not end_date:
         return {
@@ -251,8 +622,8 @@ async def summarize(
 
     #  Step 2: Validate date formats
     try:
-        parsed_start = datetime.strptime(start_date, "%Y-%m-%d").date()
-        parsed_end = datetime.strptime(end_date, "%Y-%m-%d").date()
+        parsed_start = parse_date(start_date)
+        parsed_end = parse_date(end_date)
     except ValueError:
         return {"status": "error", "message": "Invalid date format. Use YYYY-MM-DD."}
 
@@ -263,18 +634,11 @@ async def summarize(
             "message": f"End date ({parsed_end}) cannot be earlier than start date ({parsed_start})."
         }
 
-    #  Step 4: Build user-specific query
+    #  Step 4: Build user-specific query (pre-aggregated day/month rollup)
     async with AsyncSessionLocal() as db:
-        query = (
-            select(Expense.category, func.sum(Expense.amount).label("total_amount"))
-            .where(Expense.user_id == user_id)   # 🔥 Only this user's data
-            .where(Expense.date.between(parsed_start, parsed_end))
-        )
-
-        if category:
-            query = query.where(Expense.category.ilike(f"%{category}%"))
-
-        query = query.group_by(Expense.category).order_by(Expense.category)
+        query = summary_query(
+            user_id, parsed_start, parsed_end, category_keys(category) if category else ()
+        )  # 🔥 Only this user's data
 
         result = await db.execute(query)
         data = result.all()
@@ -291,10 +655,10 @@ async def summarize(
                 "message": f"No expenses found between {parsed_start} and {parsed_end}."
             }
 
-        #  Step 6: Compute summary
-        total_sum = sum(float(row.total_amount) for row in data)
+        #  Step 6: Compute summary (integer cents until the response)
+        total_cents = sum(int(row.total_cents) for row in data)
         breakdown = [
-            {"category": row.category, "total_amount": float(row.total_amount)}
+            {"category": row.category, "total_amount": from_cents(row.total_cents)}
             for row in data
         ]
 
@@ -306,12 +670,201 @@ async def summarize(
         return {
             "status": "ok",
             "message": msg,
-            "total_spent": round(total_sum, 2),
+            "total_spent": from_cents(total_cents),
             "breakdown": breakdown,
         }
 
 
 @mcp.tool()
+@instrument
+@write_behind.settled
+@result_cache.cached("search_expenses")
+@single_flight.coalesced("search_expenses")
+@user_limiter.limited
+async def search_expenses(
+    user_id: str,
+    query: str,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None
+):
+    """
+    Full-text search over the user's expense notes and subcategories, e.g.
+    "swiggy", "uber airport". Every word must match (as a word prefix);
+    results are ranked best first, each with its relevance `score`.
+
+    Optionally restrict to start_date and/or end_date (YYYY-MM-DD, or a
+    period such as "last month" as `start_date`). Results are paged: pass
+    the returned `next_cursor` back as `cursor` (`limit` per page, default
+    20, max 100).
+    """
+
+    dialect = engine.dialect.name
+    if dialect not in SEARCH_DIALECTS:
+        return {"status": "error", "message": "Search is not available on this database."}
+
+    #  Step 1: Search terms
+    terms = search_terms(query, dialect)
+    if not terms:
+        return {
+            "status": "ask_input",
+            "field": "query",
+            "message": "Please tell me what to search for (a word from the note or subcategory, e.g. 'swiggy')."
+        }
+
+    #  Step 2: Optional date filters
+    start_date, end_date = expand_period(start_date, end_date)
+    try:
+        parsed_start = parse_date(start_date) if start_date else None
+        parsed_end = parse_date(end_date) if end_date else None
+    except ValueError:
+        return {"status": "error", "message": "Invalid date format. Use YYYY-MM-DD."}
+
+    if parsed_start and parsed_end and parsed_end < parsed_start:
+        return {"status": "error", "message": "End date cannot be earlier than start date."}
+
+    where = []
+    if parsed_start:
+        where.append(Expense.date >= parsed_start)
+    if parsed_end:
+        where.append(Expense.date <= parsed_end)
+
+    #  Step 3: Ranked page (one extra row tells us whether another exists)
+    page_size = clamp_search_limit(limit)
+    select_query, score = search_query(dialect, user_id, terms, *where)  # 🔐 user-scoped
+    if cursor:
+        try:
+            select_query = select_query.where(pagination.after_ranked(score, Expense.id, cursor))
+        except ValueError:
+            return {"status": "error", "message": "Invalid cursor. Start again without a cursor."}
+
+    async with AsyncSessionLocal() as db:
+        rows = (await db.execute(select_query.limit(page_size + 1))).all()
+
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+
+    #  Step 4: Handle no matches
+    if not rows:
+        if cursor:
+            return {"status": "no_data", "message": "No more matching expenses."}
+        return {"status": "no_data", "message": f"No expenses match '{query}'."}
+
+    #  Step 5: Build response
+    last = rows[-1]
+    return {
+        "status": "ok",
+        "query": query,
+        "terms": terms,
+        "start_date": str(parsed_start) if parsed_start else None,
+        "end_date": str(parsed_end) if parsed_end else None,
+        "total": len(rows),
+        "has_more": has_more,
+        "next_cursor": pagination.encode_ranked_cursor(last.score, last.id) if has_more else None,
+        "expenses": [{**serialize(row), "score": round(row.score, 4)} for row in rows],
+    }
+
+
+DEFAULT_TOP_N = 5
+MAX_TOP_N = 20
+MAX_SERIES_DAYS = 400
+
+
+@mcp.tool()
+@instrument
+@write_behind.settled
+@result_cache.cached("analyze_spending")
+@single_flight.coalesced("analyze_spending")
+@user_limiter.limited
+async def analyze_spending(
+    user_id: str,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    bucket: str = "month",
+    top_n: int = DEFAULT_TOP_N,
+    category: Optional[str] = None
+):
+    """
+    Analyze spending (user-specific) in one call — use this instead of several
+    `summarize` calls for comparisons and trends. Returns:
+    - totals per day / week / month bucket (`bucket`), each with its change vs the previous bucket
+    - top `top_n` categories (with change vs the previous period) and subcategories
+    - total change vs the previous period: the preceding month(s) for whole-month
+      ranges, otherwise the same number of days just before `start_date`
+    `start_date` may also be a period such as "this month" or "last year".
+    """
+
+    start_date, end_date = expand_period(start_date, end_date)
+
+    #  Step 1: Validate input
+    if not start_date or not end_date:
+        return {
+            "status": "ask_input",
+            "field": "end_date" if start_date else "start_date",
+            "message": "Please tell me the period to analyze (e.g., 'this month', or a start and end date)."
+        }
+
+    try:
+        parsed_start = parse_date(start_date)
+        parsed_end = parse_date(end_date)
+    except ValueError:
+        return {"status": "error", "message": "Invalid date format. Use YYYY-MM-DD."}
+
+    if parsed_end < parsed_start:
+        return {
+            "status": "error",
+            "message": f"End date ({parsed_end}) cannot be earlier than start date ({parsed_start})."
+        }
+
+    if bucket not in BUCKETS:
+        return {"status": "error", "message": f"bucket must be one of: {', '.join(BUCKETS)}."}
+
+    if bucket == "day" and (parsed_end - parsed_start).days >= MAX_SERIES_DAYS:
+        return {"status": "error", "message": "That range is too long for daily buckets. Use week or month."}
+
+    top_n = max(1, min(int(top_n or DEFAULT_TOP_N), MAX_TOP_N))
+    previous_start, previous_end = previous_window(parsed_start, parsed_end)
+
+    #  Step 2: One grouped query over both windows
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            spending_query(
+                user_id,  # 🔐 Only this user's data
+                previous_start,
+                parsed_end,
+                category_keys(category) if category else (),
+            )
+        )
+        rows = result.all()
+
+    analysis = fold_spending(rows, parsed_start, parsed_end, bucket, top_n)
+
+    if not analysis["expense_count"] and not analysis["previous"]["expense_count"]:
+        return {
+            "status": "no_data",
+            "message": f"No expenses found between {parsed_start} and {parsed_end} or in the period before it."
+        }
+
+    analysis["previous"].update(start_date=previous_start.isoformat(), end_date=previous_end.isoformat())
+    return {
+        "status": "ok",
+        "message": f"Spending analysis from {parsed_start} to {parsed_end}, compared with {previous_start} to {previous_end}.",
+        "start_date": parsed_start.isoformat(),
+        "end_date": parsed_end.isoformat(),
+        "bucket": bucket,
+        **analysis,
+    }
+
+
+MAX_EDIT_OPTIONS = 10
+NOT_YOUR_EXPENSE = "❌ You cannot edit this expense because it does not belong to you."
+
+
+@mcp.tool()
+@instrument
+@write_behind.settled
+@user_limiter.limited
 async def edit_expense(
     user_id: str,
     id: Optional[int] = None,
@@ -337,38 +890,82 @@ async def edit_expense(
     🔐 Fully user-isolated — user can only edit their own expenses.
     """
 
-    async with AsyncSessionLocal() as db:
+    # ----------------------------------------
+    # STEP 1: Build match filters and update data (no DB yet)
+    # ----------------------------------------
+    if id is None:
+        filters = [Expense.user_id == user_id]  # 🔐 restrict to user's data
 
-        # ----------------------------------------
-        # STEP 1: If ID is not provided, find matches using filters
-        # ----------------------------------------
-        if id is None:
-            filters = [Expense.user_id == user_id]  # 🔐 restrict to user's data
+        if date:
+            try:
+                parsed_date = parse_date(date)
+                filters.append(Expense.date == parsed_date)
+            except ValueError:
+                return {"status": "error", "message": "Invalid date format. Use YYYY-MM-DD."}
 
-            if date:
-                try:
-                    parsed_date = datetime.strptime(date, "%Y-%m-%d").date()
-                    filters.append(Expense.date == parsed_date)
-                except ValueError:
-                    return {"status": "error", "message": "Invalid date format. Use YYYY-MM-DD."}
+        if amount is not None:
+            try:
+                filters.append(Expense.amount_cents == to_cents(amount))  # exact match
+            except ValueError:
+                return {"status": "error", "message": "Invalid amount."}
 
-            if amount is not None:
-                filters.append(Expense.amount == amount)
+        if category:
+            filters.append(Expense.category.in_(category_keys(category)))
 
-            if category:
-                filters.append(Expense.category.ilike(f"%{category}%"))
+        # If no identifying filters provided
+        if len(filters) == 1:  # only user_id filter
+            return {
+                "status": "ask_input",
+                "field": "date",
+                "message": "Please provide a date, category, or amount to identify which expense you want to edit."
+            }
 
-            # If no identifying filters provided
-            if len(filters) == 1:  # only user_id filter
-                return {
-                    "status": "ask_input",
-                    "field": "date",
-                    "message": "Please provide a date, category, or amount to identify which expense you want to edit."
-                }
+    update_data = {}
 
-            query = select(Expense).where(and_(*filters))
-            result = await db.execute(query)
-            matches = result.scalars().all()
+    if new_date:
+        try:
+            update_data["date"] = parse_date(new_date)
+        except ValueError:
+            return {"status": "error", "message": "Invalid new date format. Use YYYY-MM-DD."}
+
+    if new_amount is not None:
+        try:
+            update_data["amount_cents"] = to_cents(new_amount)
+        except ValueError:
+            return {"status": "error", "message": "Invalid new amount."}
+
+    if new_category:
+        update_data["category"] = normalize_category(new_category)
+
+    if new_subcategory:
+        update_data["subcategory"] = normalize_category(new_subcategory) or None
+
+    if new_note:
+        update_data["note"] = new_note
+
+    ask_fields = {
+        "status": "ask_input",
+        "field": "fields",
+        "message": "Please tell me which field(s) you want to update (amount, date, category, note, etc.)."
+    }
+    if not update_data and id is not None:
+        return ask_fields
+
+    # Changing date/amount/category moves money between rollup buckets,
+    # so we need the old values — read them under a row lock.
+    moves_rollup = bool({"date", "amount_cents", "category"} & update_data.keys())
+
+    async with AsyncSessionLocal() as db:
+        old = None
+
+        # ----------------------------------------
+        # STEP 2: If ID is not provided, find the match (one bounded query)
+        # ----------------------------------------
+        if id is None:
+            query = select_expenses(and_(*filters)).limit(MAX_EDIT_OPTIONS + 1)
+            if moves_rollup:
+                query = query.with_for_update()
+            matches = (await db.execute(query)).all()
 
             # No matches
             if not matches:
@@ -379,100 +976,72 @@ async def edit_expense(
 
             # If multiple matches
             if len(matches) > 1:
-                options = [
-                    {
-                        "id": e.id,
-                        "date": str(e.date),
-                        "amount": e.amount,
-                        "category": e.category,
-                        "subcategory": e.subcategory,
-                        "note": e.note,
-                    }
-                    for e in matches
-                ]
+                options = [serialize(e) for e in matches[:MAX_EDIT_OPTIONS]]
                 return {
                     "status": "ask_choice",
                     "message": "Multiple matching expenses found. Please select which one you want to edit.",
                     "options": options,
+                    "more_matches": len(matches) > MAX_EDIT_OPTIONS,
                 }
 
             # Exactly one match found
-            id = matches[0].id
+            old = matches[0]
+            id = old.id
 
-        # ----------------------------------------
-        # STEP 2: Verify this ID actually belongs to this user
-        # ----------------------------------------
-        existing_expense = await db.execute(
-            select(Expense).where(
-                Expense.id == id,
-                Expense.user_id == user_id  # 🔐 restrict by user
-            )
-        )
-        expense = existing_expense.scalars().first()
+            if not update_data:
+                return ask_fields
 
-        if not expense:
-            return {
-                "status": "error",
-                "message": "❌ You cannot edit this expense because it does not belong to you."
-            }
-
-        # ----------------------------------------
-        # STEP 3: Prepare update data
-        # ----------------------------------------
-        update_data = {}
-
-        if new_date:
-            try:
-                update_data["date"] = datetime.strptime(new_date, "%Y-%m-%d").date()
-            except ValueError:
-                return {"status": "error", "message": "Invalid new date format. Use YYYY-MM-DD."}
-
-        if new_amount is not None:
-            update_data["amount"] = float(new_amount)
-
-        if new_category:
-            update_data["category"] = new_category
-
-        if new_subcategory:
-            update_data["subcategory"] = new_subcategory
-
-        if new_note:
-            update_data["note"] = new_note
-
-        if not update_data:
-            return {
-                "status": "ask_input",
-                "field": "fields",
-                "message": "Please tell me which field(s) you want to update (amount, date, category, note, etc.)."
-            }
+        elif moves_rollup:
+            result = await db.execute(
+                select_expenses(
+                    Expense.id == id,
+                    Expense.user_id == user_id  # 🔐 restrict by user
+                ).with_for_update()
+            )
+            old = result.first()
+            if old is None:
+                return {"status": "error", "message": NOT_YOUR_EXPENSE}
 
         # ----------------------------------------
-        # STEP 4: Apply update
+        # STEP 3: Apply update — ownership is enforced by the WHERE clause
         # ----------------------------------------
-        await db.execute(
+        stmt = (
             update(Expense)
             .where(Expense.id == id, Expense.user_id == user_id)  # 🔐 prevent unauthorized edits
             .values(**update_data)
+            .execution_options(synchronize_session=False)
         )
+
+        if engine.dialect.update_returning:
+            updated = (await db.execute(stmt.returning(*EXPENSE_COLUMNS))).first()
+            if updated is None:
+                return {"status": "error", "message": NOT_YOUR_EXPENSE}
+        else:
+            # MySQL: no RETURNING. Build the row from what we read, or read it back.
+            result = await db.execute(stmt)
+            if result.rowcount == 0:
+                return {"status": "error", "message": NOT_YOUR_EXPENSE}
+            if old is not None:
+                updated = SimpleNamespace(**{**old._asdict(), **update_data})
+            else:
+                updated = (await db.execute(select_expenses(Expense.id == id))).first()
+
+        if moves_rollup:
+            await apply_deltas(
+                db,
+                delta(user_id, old.date, old.category, -old.amount_cents, -1)
+                + delta(user_id, updated.date, updated.category, updated.amount_cents),
+            )
+
         await db.commit()
 
-        # ----------------------------------------
-        # STEP 5: Return updated expense
-        # ----------------------------------------
-        updated = await db.get(Expense, id)
+        await invalidate_reads(user_id)
 
         return {
             "status": "ok",
             "message": f"Expense {id} updated successfully.",
-            "updated_fields": list(update_data.keys()),
-            "updated_expense": {
-                "id": updated.id,
-                "date": str(updated.date),
-                "amount": updated.amount,
-                "category": updated.category,
-                "subcategory": updated.subcategory,
-                "note": updated.note,
-            }
+            "updated_fields": [field.removesuffix("_cents") for field in update_data],
+            "updated_expense": serialize(updated)
         }
 
 
@@ -490,6 +1059,9 @@ async def edit_expense(
 #         return {"status": "ok", "message": f"Expense {id} deleted successfully"}
 
 @mcp.tool()
+@instrument
+@write_behind.settled
+@user_limiter.limited
 async def delete_expense(
     user_id: str,
     category: Optional[str] = None,
@@ -504,71 +1076,66 @@ async def delete_expense(
     🔐 Only deletes expenses owned by the logged-in user.
     """
 
-    async with AsyncSessionLocal() as db:
-
-        # ----------------------------------------------------
-        # 1. DELETE BY ID (only if expense belongs to this user)
-        # ----------------------------------------------------
-        if id is not None:
-            result = await db.execute(
-                delete(Expense).where(
-                    Expense.id == id,
-                    Expense.user_id == user_id   # 🔐 user isolation
-                )
+    # ----------------------------------------------------
+    # 1. DELETE BY ID (only if expense belongs to this user)
+    # ----------------------------------------------------
+    if id is not None:
+        async with AsyncSessionLocal() as db:
+            deleted = await _delete_returning(
+                db,
+                Expense.id == id,
+                Expense.user_id == user_id   # 🔐 user isolation
             )
-            await db.commit()
 
-            if result.rowcount == 0:
+            if not deleted:
                 return {
                     "status": "error",
                     "message": "❌ No expense found with this ID, or it does not belong to you."
                 }
 
-            return {
-                "status": "ok",
-                "message": f"Expense {id} deleted successfully."
-            }
+            await apply_deltas(db, _rollup_removal(user_id, deleted))
+            await db.commit()
+            await invalidate_reads(user_id)
 
-        # ----------------------------------------------------
-        # 2. If no ID, require date
-        # ----------------------------------------------------
-        if not date:
-            return {
-                "status": "error",
-                "message": "Please provide a date or an expense ID."
-            }
+        return {
+            "status": "ok",
+            "message": f"Expense {id} deleted successfully."
+        }
 
-        try:
-            parsed_date = datetime.strptime(date, "%Y-%m-%d").date()
-        except ValueError:
-            return {"status": "error", "message": "Invalid date format. Use YYYY-MM-DD."}
+    # ----------------------------------------------------
+    # 2. If no ID, require date
+    # ----------------------------------------------------
+    if not date:
+        return {
+            "status": "error",
+            "message": "Please provide a date or an expense ID."
+        }
 
-        # ----------------------------------------------------
-        # 3. Find expense by category + date (user only)
-        # ----------------------------------------------------
-        filters = [
-            Expense.user_id == user_id,   # 🔐 restrict to user
-            Expense.date == parsed_date,
-        ]
+    try:
+        parsed_date = parse_date(date)
+    except ValueError:
+        return {"status": "error", "message": "Invalid date format. Use YYYY-MM-DD."}
 
-        if category:
-            filters.append(Expense.category.ilike(f"%{category}%"))
+    filters = [
+        Expense.user_id == user_id,   # 🔐 restrict to user
+        Expense.date == parsed_date,
+    ]
 
-        query = select(Expense).where(and_(*filters))
-        result = await db.execute(query)
-        expense = result.scalars().first()
+    if category:
+        filters.append(Expense.category.in_(category_keys(category)))
+
+    async with AsyncSessionLocal() as db:
 
         # ----------------------------------------------------
-        # 4. Delete if exact match found
+        # 3. Match + delete one expense by category + date, atomically
         # ----------------------------------------------------
-        if expense:
-            await db.execute(
-                delete(Expense).where(
-                    Expense.id == expense.id,
-                    Expense.user_id == user_id  # 🔐 secure check
-                )
-            )
+        deleted = await _delete_returning(db, *filters, first_only=True)
+
+        if deleted:
+            expense = deleted[0]
+            await apply_deltas(db, _rollup_removal(user_id, deleted))
             await db.commit()
+            await invalidate_reads(user_id)
 
             return {
                 "status": "ok",
@@ -576,145 +1143,378 @@ async def delete_expense(
             }
 
         # ----------------------------------------------------
-        # 5. No match → show all expenses on that day for user
+        # 4. No match → show all expenses on that day for user
         # ----------------------------------------------------
         same_day = await db.execute(
-            select(Expense)
-            .where(
+            select_expenses(
                 Expense.user_id == user_id,  # 🔐 secure
                 Expense.date == parsed_date
             )
         )
-        same_day_expenses = same_day.scalars().all()
-
-        if same_day_expenses:
-            expense_list = [
-                {
-                    "id": e.id,
-                    "category": e.category,
-                    "subcategory": e.subcategory,
-                    "amount": e.amount,
-                    "note": e.note
-                }
-                for e in same_day_expenses
-            ]
+        same_day_expenses = same_day.all()
+
+    if same_day_expenses:
+        expense_list = [serialize(e) for e in same_day_expenses]
 
+        return {
+            "status": "ask_choice",
+            "message": f"No exact match found for '{category}'. Here are your expenses on {parsed_date}:",
+            "options": expense_list,
+        }
+
+    # ----------------------------------------------------
+    # 5. No expenses at all that day
+    # ----------------------------------------------------
+    return {
+        "status": "no_expense_on_day",
+        "message": f"You have no expenses on {parsed_date}. Please provide a different date.",
+    }
+
+
+MAX_BULK_DELETE_IDS = 1000
+
+
+@mcp.tool()
+@instrument
+@write_behind.settled
+@user_limiter.limited
+async def delete_expenses(
+    user_id: str,
+    ids: Optional[list[int]] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    category: Optional[str] = None,
+    confirm: bool = False
+):
+    """
+    Delete many expenses at once (user-specific):
+    - by a list of IDs
+    - or by a date range (start_date + end_date), optionally only one category
+
+    Range deletes first report how many expenses would go; call again with
+    confirm=true to actually delete them.
+
+    🔐 Only deletes expenses owned by the logged-in user.
+    """
+    filters = [Expense.user_id == user_id]   # 🔐 restrict to user
+
+    if ids:
+        if len(ids) > MAX_BULK_DELETE_IDS:
             return {
-                "status": "ask_choice",
-                "message": f"No exact match found for '{category}'. Here are your expenses on {parsed_date}:",
-                "options": expense_list,
+                "status": "error",
+                "message": f"Please delete at most {MAX_BULK_DELETE_IDS} expenses per call."
             }
+        filters.append(Expense.id.in_(ids))
 
-        # ----------------------------------------------------
-        # 6. No expenses at all that day
-        # ----------------------------------------------------
+    elif start_date or end_date:
+        start_date, end_date = expand_period(start_date, end_date)
+        if not (start_date and end_date):
+            return {
+                "status": "ask_input",
+                "field": "end_date" if start_date else "start_date",
+                "message": "Please provide both start_date and end_date for the range to delete."
+            }
+        try:
+            parsed_start = parse_date(start_date)
+            parsed_end = parse_date(end_date)
+        except ValueError:
+            return {"status": "error", "message": "Invalid date format. Use YYYY-MM-DD."}
+
+        if parsed_end < parsed_start:
+            return {"status": "error", "message": "End date cannot be earlier than start date."}
+
+        filters.append(Expense.date.between(parsed_start, parsed_end))
+        if category:
+            filters.append(Expense.category.in_(category_keys(category)))
+
+        if not confirm:
+            async with AsyncSessionLocal() as db:
+                count = (await db.execute(select(func.count()).where(*filters))).scalar()
+            if not count:
+                return {"status": "no_data", "message": f"No expenses found between {parsed_start} and {parsed_end}."}
+            return {
+                "status": "ask_confirm",
+                "count": count,
+                "message": f"This will permanently delete {count} expenses between {parsed_start} and {parsed_end}. "
+                           "Call again with confirm=true to proceed."
+            }
+
+    else:
         return {
-            "status": "no_expense_on_day",
-            "message": f"You have no expenses on {parsed_date}. Please provide a different date.",
+            "status": "ask_input",
+            "field": "ids_or_range",
+            "message": "Please provide expense IDs or a start_date + end_date to delete."
         }
 
+    async with AsyncSessionLocal() as db:
+        deleted = await _delete_returning(db, *filters)
+        await apply_deltas(db, _rollup_removal(user_id, deleted))
+        await db.commit()
+        await invalidate_reads(user_id)
 
+    if not deleted:
+        return {"status": "no_data", "message": "No matching expenses found. Nothing was deleted."}
 
-#MCP Resource
-import os
-CATEGORIES_PATH = os.path.join(os.path.dirname(__file__), "categories.json")
+    response = {
+        "status": "ok",
+        "message": f"Deleted {len(deleted)} expenses.",
+        "deleted": len(deleted),
+        "deleted_ids": sorted(row.id for row in deleted),
+    }
+    if ids:
+        response["not_found_ids"] = sorted(set(ids) - set(response["deleted_ids"]))
+    return response
 
-@mcp.resource("expense://categories", mime_type="application/json")
-async def categories():
-    print(">>> categories.json requested!")
-    with open(CATEGORIES_PATH, "r", encoding="utf-8") as f:
-        data = f.read()
-        print(">>> categories.json content:", data[:80])  # preview
-        return data
 
+# Columns a delete needs back to keep the rollup in step
+_DELETED_COLUMNS = (Expense.id, Expense.date, Expense.amount_cents, Expense.category)
 
 
-#MCP Prompt
-from datetime import datetime
-from fastmcp.prompts.prompt import PromptMessage, TextContent
-current_date = datetime.now().strftime("%Y-%m-%d")
+async def _delete_returning(db, *where, first_only: bool = False):
+    """
+    DELETE the rows matching `where` and return their (id, date, amount_cents, category).
+    `first_only` deletes just the lowest-id match. Single statement where the
+    dialect has DELETE ... RETURNING; on MySQL the rows are locked, then deleted.
+    """
+    if engine.dialect.delete_returning:
+        target = list(where)
+        if first_only:
+            first_id = select(Expense.id).where(*where).order_by(Expense.id).limit(1).scalar_subquery()
+            target.append(Expense.id == first_id)
+
+        result = await db.execute(
+            delete(Expense)
+            .where(*target)
+            .returning(*_DELETED_COLUMNS)
+            .execution_options(synchronize_session=False)
+        )
+        return result.all()
 
-@mcp.prompt(
-    name="kharchamind_system_prompt",
-    title="KharchaMind Core System Prompt",
-    description="Returns the full system prompt for KharchaMind with dynamic date injection.",
-    tags={"system", "kharchamind", "expenses", "ai-assistant"},
-)
-def kharchamind_prompt() -> PromptMessage:
-    prompt_text = f"""
-You are **KharchaMind (💰)** — an intelligent AI Expense Management Assistant designed to help users in India track and manage their daily expenses.
+    query = select(*_DELETED_COLUMNS).where(*where).with_for_update()
+    if first_only:
+        query = query.order_by(Expense.id).limit(1)
+    rows = (await db.execute(query)).all()
+
+    if rows:
+        await db.execute(
+            delete(Expense)
+            .where(Expense.id.in_([row.id for row in rows]))
+            .execution_options(synchronize_session=False)
+        )
+    return rows
+
+
+def _rollup_removal(user_id: str, deleted) -> list[dict]:
+    """Rollup deltas taking `deleted` rows back out."""
+    return build_rollup_rows((user_id, row.date, row.category, -row.amount_cents, -1) for row in deleted)
+
+
+# ---------- BUDGETS ---------- #
+
+@mcp.tool()
+@instrument
+@write_behind.settled
+@user_limiter.limited
+async def set_budget(
+    user_id: str,
+    category: str = None,
+    amount: float = None,
+    month: Optional[str] = None
+):
+    """
+    Set or change the user's spending limit for one category in one month.
+    `month` is YYYY-MM, a date, or "this month" / "next month" (default: this month).
+    An amount of 0 removes the budget.
+    """
+    if not category:
+        return {
+            "status": "ask_input",
+            "field": "category",
+            "message": "Which category is this budget for?"
+        }
+
+    if amount is None:
+        return {
+            "status": "ask_input",
+            "field": "amount",
+            "message": f"How much do you want to budget for {category}?"
+        }
+
+    try:
+        parsed_month = parse_month(month)
+    except ValueError:
+        return {"status": "error", "message": "Invalid month. Use YYYY-MM."}
+
+    try:
+        limit_cents = to_cents(amount)
+    except ValueError:
+        return {"status": "error", "message": "Invalid amount."}
+    if limit_cents < 0:
+        return {"status": "error", "message": "A budget cannot be negative."}
+
+    # Budgets are per taxonomy category, so the spent counter matches the rollup
+    index = get_index()
+    matches = index.resolve(category)
+    if len(matches) != 1:
+        return {
+            "status": "ask_input",
+            "field": "category",
+            "message": f"Which category did you mean by '{category}'?",
+            "options": list(matches or index.categories),
+        }
+    category = matches[0]
+    label = parsed_month.strftime("%Y-%m")
 
-It is currently **{current_date}**.  
-Any relative dates like “today”, “yesterday”, “this week”, “last month” must be interpreted based on **{current_date}**.
+    async with AsyncSessionLocal() as db:
+        if limit_cents == 0:
+            result = await db.execute(
+                delete(Budget).where(
+                    Budget.user_id == user_id,  # 🔐 Only this user's budget
+                    Budget.month == parsed_month,
+                    Budget.category == category,
+                )
+            )
+            await db.commit()
+            await invalidate_reads(user_id)
+            if not result.rowcount:
+                return {"status": "no_data", "message": f"You have no {category} budget for {label}."}
+            return {"status": "ok", "message": f"Removed your {category} budget for {label}."}
+
+        # One upsert: concurrent calls for the same budget can't collide on the primary key
+        await db.execute(upsert_budget(user_id, parsed_month, category, limit_cents))
+        spent = (await db.execute(spent_query(user_id, parsed_month, (category,)))).first()
+        await db.commit()
+        await invalidate_reads(user_id)
 
----
+    spent_cents = int(spent.total_cents) if spent else 0
+    return {
+        "status": "ok",
+        "message": f"Budget for {category} in {label} set to {from_cents(limit_cents)}.",
+        "data": {
+            "category": category,
+            "month": label,
+            "limit": from_cents(limit_cents),
+            "spent": from_cents(spent_cents),
+            "remaining": from_cents(limit_cents - spent_cents),
+        }
+    }
 
-#  Your Core Role:
-Understand natural language messages and convert them into the correct action by calling the appropriate **MCP tools** for:
-1. Adding a new expense
-2. Editing an existing expense
-3. Deleting an expense
-4. Listing expenses for a date or date range
-5. Summarizing total expenses
-6. Handling follow-up questions when tool inputs are missing
 
----
+@mcp.tool()
+@instrument
+@write_behind.settled
+@result_cache.cached("budget_status")
+@single_flight.coalesced("budget_status")
+@user_limiter.limited
+async def budget_status(
+    user_id: str,
+    month: Optional[str] = None,
+    category: Optional[str] = None
+):
+    """
+    How much of each budget is spent and how much is left in a month
+    (default: this month), e.g. "how much do I have left for food?".
+    For the current month each budget also gets a `daily_allowance` for the
+    remaining days. Spending in categories without a budget is listed under
+    `unbudgeted`.
+    """
+    try:
+        parsed_month = parse_month(month)
+    except ValueError:
+        return {"status": "error", "message": "Invalid month. Use YYYY-MM."}
+    label = parsed_month.strftime("%Y-%m")
 
-#  CATEGORY RULES (VERY IMPORTANT)
+    #  Maintained counters only: O(categories), whatever the history size
+    keys = category_keys(category) if category else ()
+    async with AsyncSessionLocal() as db:
+        budgets = (await db.execute(budgets_query(user_id, parsed_month, keys))).all()  # 🔐 Only this user's data
+        spent = (await db.execute(spent_query(user_id, parsed_month, keys))).all()
 
-You must **strictly** use the following categories and subcategories:
-(Your categories list will go here)
+    if not budgets:
+        scope = f" for '{category}'" if category else ""
+        return {
+            "status": "no_data",
+            "message": f"You have no budgets{scope} for {label}. Use set_budget to add one."
+        }
 
-DO NOT invent new categories or subcategories.
-DO NOT rename categories.
-DO NOT guess. Always match user input to your predefined categories.
+    status = fold_budgets(budgets, spent, parsed_month, today())
+    over = [row["category"] for row in status["budgets"] if row["state"] == "over"]
 
----
+    if status["total_remaining"] >= 0:
+        msg = f"Budget status for {label}: {status['total_remaining']} left of {status['total_limit']}."
+    else:
+        msg = f"Budget status for {label}: {-status['total_remaining']} over the total budget of {status['total_limit']}."
+    if over:
+        msg += f" Over budget: {', '.join(over)}."
 
-# Behavior & Reasoning Guidelines
+    return {"status": "ok", "message": msg, **status}
 
-## 1. Natural Language Understanding
-(… entire section …)
 
-## 2. Missing Required Fields
-(… entire section …)
 
-## 3. Date Interpretation Rules
-All dates are based on **{current_date}**.
-(… entire section …)
 
-## 4. MCP Tool Mappings
-- Add → `add_expense(date, amount, category, subcategory, note)`
-- Edit → `edit_expense(...)`
-- Delete → `delete_expense`
-- List → `list_expenses`
-- Summary → `summarize`
+#MCP Resource
 
-## 5. Currency Rules
-(… section …)
+@mcp.resource("expense://categories", mime_type="application/json")
+async def categories():
+    # Parsed once and cached; reloaded only when categories.json changes
+    return get_index().text
 
-## 6. Tone & Personality
-(… section …)
 
-## 7. Error Handling
-(… section …)
+@mcp.resource("expense://stats/cache", mime_type="application/json")
+async def cache_stats():
+    # Hit ratio, evictions and size of the read-through result cache
+    return result_cache.stats()
 
-## 8. No Hallucinations
-(… section …)
 
-## 9. Out-of-scope Messages
-(… section …)
+@mcp.resource("expense://exports/{user_id}/{export_id}/{part}", mime_type="application/octet-stream")
+async def export_part(user_id: str, export_id: str, part: str) -> bytes:
+    # One EXPORT_PART_BYTES piece of a finished export_expenses file (🔐 looked up under user_id)
+    path = exports.find_export(user_id, export_id)
+    if path is None:
+        raise ValueError(f"No export {export_id!r} for this user (it may have expired).")
+    if not part.isdigit():
+        raise ValueError("part must be a non-negative integer.")
+    return await asyncio.to_thread(exports.read_part, path, int(part))
 
----
 
-# First-time Introduction:
-“Hello!  I'm **KharchaMind (💰)** — your personal AI expense assistant…”
+#Metrics endpoint (HTTP transport only)
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse
 
----
-"""
+def metric_gauges() -> dict:
+    """This process's gauge groups for /metrics."""
+    return {
+        "db_pool": ("Connection pool occupancy and checkout waits.", pool_stats(engine)),
+        "result_cache": ("Read-through result cache counters.", result_cache.stats()),
+        "single_flight": ("Coalesced identical in-flight reads.", single_flight.stats()),
+        "user_limiter": ("Per-user tool concurrency limit.", user_limiter.stats()),
+        "write_behind": ("Queued add_expense rows and group commits.", write_behind.stats()),
+        "cpu_offload": ("Listings encoded in the CPU process pool vs inline.", cpu_offload.stats()),
+    }
+
+
+@mcp.custom_route("/metrics", methods=["GET"])
+async def metrics(request: Request) -> PlainTextResponse:
+    # Under several workers: tool metrics for all of them, gauges per worker (see services/metrics.py)
+    body = render_metrics(metric_gauges())
+    return PlainTextResponse(body, media_type="text/plain; version=0.0.4")
+
+
+
+#MCP Prompt
+from fastmcp.prompts.prompt import PromptMessage, TextContent
+from services.prompt import render_system_prompt
+
+@mcp.prompt(
+    name="kharchamind_system_prompt",
+    title="KharchaMind Core System Prompt",
+    description="Returns the full system prompt for KharchaMind with today's date and the category list injected.",
+    tags={"system", "kharchamind", "expenses", "ai-assistant"},
+)
+def kharchamind_prompt() -> PromptMessage:
     return PromptMessage(
         role="user",
-        content=TextContent(type="text", text=prompt_text)
+        content=TextContent(type="text", text=render_system_prompt())
     )
 
 
@@ -725,9 +1525,86 @@ All dates are based on **{current_date}**.
 #     mcp.run(transport="stdio")
 
 
+def create_app():
+    """ASGI app for one worker process (uvicorn factory: `main:create_app`)."""
+    # Any worker may receive any request, so no MCP session state lives in a process
+    return mcp.http_app(stateless_http=True)
+
+
+def serve_workers(workers: int, host: str, port: int):
+    """
+    Run `workers` uvicorn processes sharing one listening socket. The parent
+    migrates the schema once before spawning them, so workers start with
+    DB_SCHEMA_CHECK=off instead of racing each other through create_all.
+    Each worker builds its own engine, with its pool capped at
+    DB_CONNECTION_BUDGET // WEB_CONCURRENCY (see db/pool.py).
+
+    Each worker also keeps its own metrics, and a scrape of /metrics lands
+    on any one of them. So workers publish snapshots to METRICS_DIR (a
+    fresh temp directory unless set) and /metrics reports the tool
+    metrics summed over all workers, gauges labelled by worker pid; see
+    services/metrics.py. Budget reconciliation runs in one worker only
+    (BUDGET_RECONCILE_LOCK, see db/budgets.py).
+    """
+    import shutil
+    import uvicorn
+    import tempfile
+    from pathlib import Path
+
+    if write_behind.mode == "behind":
+        # Read-your-writes for queued rows only holds inside the process that queued them
+        raise SystemExit("EXPENSE_WRITE_MODE=behind needs a single worker; use 'group' with WEB_CONCURRENCY > 1.")
+
+    async def migrate():
+        try:
+            await init_db()
+        finally:
+            await engine.dispose()      # workers are spawned; nothing may inherit these connections
+
+    asyncio.run(migrate())
+
+    os.environ["DB_SCHEMA_CHECK"] = "off"
+    # A process-local result cache never sees writes made through other workers
+    os.environ.setdefault("CACHE_ENABLED", "false")
+    # Snapshots left by an earlier run would be added to this run's totals
+    own_metrics_dir = not os.getenv("METRICS_DIR")
+    metrics_dir = Path(tempfile.mkdtemp(prefix="kharchamind-metrics-") if own_metrics_dir else os.environ["METRICS_DIR"])
+    metrics_dir.mkdir(parents=True, exist_ok=True)
+    for stale in metrics_dir.glob("*.json"):
+        stale.unlink()
+    os.environ["METRICS_DIR"] = str(metrics_dir)
+    # Every worker starts the budget reconciliation timer; only the lock holder runs it
+    os.environ.setdefault("BUDGET_RECONCILE_LOCK", os.path.join(tempfile.gettempdir(), f"kharchamind-reconcile-{port}.lock"))
+
+    try:
+        uvicorn.run(
+            "main:create_app",
+            factory=True,
+            host=host,
+            port=port,
+            workers=workers,
+            lifespan="on",
+            timeout_graceful_shutdown=env_int("SHUTDOWN_TIMEOUT", 30),
+        )
+    finally:
+        if own_metrics_dir:
+            shutil.rmtree(metrics_dir, ignore_errors=True)
+
+
+# Spawned workers run this file as __mp_main__ before uvicorn imports "main";
+# alias it so each worker builds the app (engine, pool, caches) only once.
+if __name__ == "__mp_main__":
+    sys.modules.setdefault("main", sys.modules[__name__])
+
+
 if __name__ == "__main__":
-    asyncio.run(init_db())  # ensure tables exist before starting MCP server
-    mcp.run(transport="http", host="0.0.0.0", port=8000)
+    # Schema check and pool warm-up run in the lifespan, inside the server's loop
+    port = env_int("PORT", 8000)
+    workers = env_int("WEB_CONCURRENCY", 1)
+    if workers > 1:
+        serve_workers(workers, "0.0.0.0", port)
+    else:
+        mcp.run(transport="http", host="0.0.0.0", port=port)
 
 
 
@@ -0,0 +1,19 @@
+from sqlalchemy import Column, BigInteger, String, Date, DateTime, func
+from db.database import Base
+
+
+class Budget(Base):
+    """
+    A user's spending limit for one category in one month.
+
+    Only the limit lives here: spent-to-date is the matching `month` row
+    of expense_rollups, which the write tools already keep current.
+    """
+    __tablename__ = "budgets"
+
+    user_id = Column(String(36), primary_key=True)
+    month = Column(Date, primary_key=True)              # first day of the month
+    category = Column(String(255), primary_key=True)
+
+    limit_cents = Column(BigInteger, nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
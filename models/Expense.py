@@ -1,5 +1,5 @@
 # models/Expense.py
-from sqlalchemy import Column, Integer, String, Date, Float, ForeignKey
+from sqlalchemy import Column, Integer, BigInteger, String, Date, ForeignKey, Index, event
 from sqlalchemy.orm import relationship
 from db.database import Base
 from models.User import User
@@ -8,7 +8,8 @@ class Expense(Base):
     __tablename__ = "expenses"
 
     id = Column(Integer, primary_key=True, index=True)
-    amount = Column(Float, nullable=False)
+    # Integer minor units (cents): sums and equality matches stay exact
+    amount_cents = Column(BigInteger, nullable=False)
     date = Column(Date, nullable=False)
     category = Column(String(255), nullable=False)
     subcategory = Column(String(255), nullable=True)
@@ -19,3 +20,27 @@ class Expense(Base):
 
     # Relationship (optional but useful)
     user = relationship("User")
+
+    # Every tool filters on user_id + date, so index them together.
+    # The category index carries amount_cents as a trailing column so summaries
+    # are answered from the index alone (MySQL has no INCLUDE clause).
+    __table_args__ = (
+        Index("ix_expenses_user_date", "user_id", "date"),
+        Index("ix_expenses_user_category_date", "user_id", "category", "date", "amount_cents"),
+        # search_expenses (db/search.py); SQLite gets an FTS5 table instead
+        Index("ft_expenses_note_subcategory", "note", "subcategory", mysql_prefix="FULLTEXT").ddl_if(dialect="mysql"),
+    )
+
+
+# The SQLite FTS5 table and its triggers aren't Table objects, so create_all
+# and drop_all reach them through these hooks.
+@event.listens_for(Expense.__table__, "after_create")
+def _create_search_index(target, connection, **kw):
+    from db.search import install
+    install(connection)
+
+
+@event.listens_for(Expense.__table__, "after_drop")
+def _drop_search_index(target, connection, **kw):
+    from db.search import uninstall
+    uninstall(connection)
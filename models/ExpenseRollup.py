@@ -0,0 +1,22 @@
+# models/ExpenseRollup.py
+from sqlalchemy import Column, Integer, BigInteger, String, Date
+from db.database import Base
+
+
+class ExpenseRollup(Base):
+    """
+    Pre-aggregated expense totals per user, category and period.
+
+    Every expense is counted twice: once in its `day` row and once in its
+    `month` row (period_start = first of the month). Kept current by the
+    write tools — see db/rollup.py.
+    """
+    __tablename__ = "expense_rollups"
+
+    user_id = Column(String(36), primary_key=True)
+    period = Column(String(5), primary_key=True)        # "day" | "month"
+    period_start = Column(Date, primary_key=True)
+    category = Column(String(255), primary_key=True)
+
+    total_cents = Column(BigInteger, nullable=False, default=0)
+    expense_count = Column(Integer, nullable=False, default=0)
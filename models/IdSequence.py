@@ -0,0 +1,15 @@
+from sqlalchemy import Column, String, BigInteger
+from db.database import Base
+
+
+class IdSequence(Base):
+    """
+    High-water marks for ids handed out before their row is inserted.
+
+    `next_id` is the first id not yet reserved by any worker; the
+    write-behind queue claims blocks from it (see db/write_behind.py).
+    """
+    __tablename__ = "id_sequences"
+
+    name = Column(String(64), primary_key=True)        # table the ids are for
+    next_id = Column(BigInteger, nullable=False)
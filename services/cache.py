@@ -0,0 +1,195 @@
+# services/cache.py
+"""
+Per-user read-through cache for read-only tool results.
+
+Entries are keyed by (tool, user_id, user generation, today, normalized
+args). Write tools call `invalidate_user` after committing, which bumps the
+user's generation counter — every older entry for that user becomes
+unreachable at once and ages out through LRU/TTL eviction.
+
+Storage sits behind a small async backend interface (`get`, `set`,
+`incr`, `counter`) so a shared store such as Redis can replace the
+process-local `MemoryBackend` when running more than one worker. Shared
+backends must keep generation counters without expiry.
+
+`MemoryBackend` keeps at most CACHE_MAX_GENERATIONS counters, least
+recently used first out. A user without a counter is at the backend's
+epoch, which moves past every evicted counter's value, so entries cached
+before an eviction are never served again (the price: users without a
+counter lose their cached entries too).
+
+Settings (defaults in brackets):
+
+    CACHE_ENABLED           turn the cache on/off                   [true]
+    CACHE_TTL_SECONDS       lifetime of one cached result           [60]
+    CACHE_MAX_ENTRIES       entries kept before LRU eviction        [2048]
+    CACHE_MAX_BYTES         approx. JSON bytes kept before eviction [16 MiB]
+    CACHE_MAX_GENERATIONS   per-user generation counters kept       [100000]
+"""
+import json
+import time
+import inspect
+import functools
+from collections import OrderedDict
+
+from services.dates import today
+from services.env import env_int, env_bool
+
+# Only successful reads are worth keeping
+CACHEABLE_STATUSES = ("ok", "no_data")
+
+
+class MemoryBackend:
+    """Process-local LRU + TTL store bounded by entry count, bytes and counters."""
+
+    def __init__(self, max_entries: int, max_bytes: int, max_counters: int = 100_000, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_counters = max(1, max_counters)
+        self._clock = clock
+        self._data = OrderedDict()      # key -> (expires_at, size, value)
+        self._counters = OrderedDict()  # key -> value, least recently used first
+        self._epoch = 0                 # value of every counter not in _counters
+        self.bytes = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.counter_evictions = 0
+
+    def _drop(self, key):
+        _, size, _ = self._data.pop(key)
+        self.bytes -= size
+
+    async def get(self, key: str):
+        item = self._data.get(key)
+        if item is None:
+            return None
+
+        expires_at, _, value = item
+        if expires_at <= self._clock():
+            self._drop(key)
+            self.expirations += 1
+            return None
+
+        self._data.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value, ttl: float, size: int):
+        if size > self.max_bytes:
+            return
+        if key in self._data:
+            self._drop(key)
+
+        self._data[key] = (self._clock() + ttl, size, value)
+        self.bytes += size
+
+        while len(self._data) > self.max_entries or self.bytes > self.max_bytes:
+            self._drop(next(iter(self._data)))
+            self.evictions += 1
+
+    async def incr(self, key: str) -> int:
+        value = self._counters.pop(key, self._epoch) + 1
+        self._counters[key] = value
+
+        while len(self._counters) > self.max_counters:
+            _, dropped = self._counters.popitem(last=False)
+            # The dropped key now reads as the epoch: move it past every value that key had
+            self._epoch = max(self._epoch, dropped) + 1
+            self.counter_evictions += 1
+        return value
+
+    async def counter(self, key: str) -> int:
+        value = self._counters.get(key)
+        if value is None:
+            return self._epoch
+        self._counters.move_to_end(key)
+        return value
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._data),
+            "bytes": self.bytes,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "generations": len(self._counters),
+            "generation_evictions": self.counter_evictions,
+        }
+
+
+class ResultCache:
+    def __init__(self, backend, ttl: float, enabled: bool = True):
+        self.backend = backend
+        self.ttl = ttl
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    async def invalidate_user(self, user_id: str):
+        """Make every cached result for `user_id` unreachable."""
+        if not self.enabled:
+            return
+        await self.backend.incr(f"gen:{user_id}")
+        self.invalidations += 1
+
+    def cached(self, tool: str):
+        """Decorator for a read-only tool whose first parameter is `user_id`."""
+
+        def decorate(fn):
+            signature = inspect.signature(fn)
+
+            @functools.wraps(fn)
+            async def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return await fn(*args, **kwargs)
+
+                bound = signature.bind(*args, **kwargs)
+                bound.apply_defaults()
+                params = dict(bound.arguments)
+                user_id = params.pop("user_id")
+
+                generation = await self.backend.counter(f"gen:{user_id}")
+                # today() is part of the key: "last month" means something else tomorrow
+                key = f"{tool}:{user_id}:{generation}:{today()}:" + json.dumps(
+                    params, sort_keys=True, default=str
+                )
+
+                result = await self.backend.get(key)
+                if result is not None:
+                    self.hits += 1
+                    return result
+
+                self.misses += 1
+                result = await fn(*args, **kwargs)
+
+                if isinstance(result, dict) and result.get("status") in CACHEABLE_STATUSES:
+                    size = len(json.dumps(result, default=str))
+                    await self.backend.set(key, result, self.ttl, size)
+                return result
+
+            return wrapper
+
+        return decorate
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        stats = {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "invalidations": self.invalidations,
+        }
+        if hasattr(self.backend, "stats"):
+            stats.update(self.backend.stats())
+        return stats
+
+
+result_cache = ResultCache(
+    MemoryBackend(
+        max_entries=env_int("CACHE_MAX_ENTRIES", 2048),
+        max_bytes=env_int("CACHE_MAX_BYTES", 16 * 1024 * 1024),
+        max_counters=env_int("CACHE_MAX_GENERATIONS", 100_000),
+    ),
+    ttl=env_int("CACHE_TTL_SECONDS", 60),
+    enabled=env_bool("CACHE_ENABLED", True),
+)
@@ -0,0 +1,163 @@
+# services/categories.py
+"""
+In-memory index of categories.json.
+
+The file is parsed once into an immutable `CategoryIndex` holding the
+serialized resource text, a content version (ETag-style) and frozen
+lookup sets for O(1) validation. `get_index()` re-stats the file at most
+once per `RELOAD_CHECK_SECONDS` and rebuilds the index only when its
+mtime changes.
+
+Categories and subcategories are stored normalized (`normalize_category`), so filters resolve
+user input to concrete values here and query with `=` / `IN` — an indexed
+lookup instead of a `LIKE '%…%'` scan.
+
+Expenses may be saved under a category outside categories.json;
+`category_warning` gives the add tools a note to flag those with.
+"""
+import os
+import json
+import time
+import difflib
+import hashlib
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Mapping
+
+CATEGORIES_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "categories.json")
+RELOAD_CHECK_SECONDS = 1.0
+
+# difflib ratio needed for a typo ("fod", "transprt") to count as a match
+FUZZY_CUTOFF = 0.75
+MAX_FUZZY_MATCHES = 3
+
+
+def normalize_category(value) -> str:
+    """" Personal Care " / "personal-care" → "personal_care", the stored form."""
+    return "_".join(str(value).lower().replace("-", " ").replace("_", " ").split())
+
+
+@dataclass(frozen=True)
+class CategoryIndex:
+    text: str                                   # exact file contents, served as-is
+    version: str                                # content hash, changes when the file does
+    mtime_ns: int
+    categories: Mapping[str, frozenset[str]]    # category -> subcategories
+    subcategory_names: frozenset[str]           # every subcategory, across categories
+    category_codes: Mapping[str, int]           # stable codes in file order, for columnar output
+    subcategory_codes: Mapping[str, int]
+
+    def is_category(self, category: str) -> bool:
+        return category in self.categories
+
+    def is_subcategory(self, category: str, subcategory: str) -> bool:
+        return subcategory in self.categories.get(category, ())
+
+    def resolve(self, value) -> tuple[str, ...]:
+        """
+        User input → canonical categories: the exact name, else every name
+        with a word starting with the input ("kids" → family_kids), else the
+        closest spellings. Empty when nothing is close.
+        """
+        key = normalize_category(value)
+        if not key:
+            return ()
+        if key in self.categories:
+            return (key,)
+
+        prefixed = _word_prefix_matches(key, self.categories)
+        if prefixed:
+            return prefixed
+
+        return tuple(difflib.get_close_matches(key, self.categories, MAX_FUZZY_MATCHES, FUZZY_CUTOFF))
+
+
+def _word_prefix_matches(key: str, names) -> tuple[str, ...]:
+    return tuple(
+        name for name in names
+        if any(word.startswith(key) for word in (name, *name.split("_")))
+    )
+
+
+def load_index(path: str = CATEGORIES_PATH) -> CategoryIndex:
+    with open(path, "rb") as f:
+        raw = f.read()
+        mtime_ns = os.fstat(f.fileno()).st_mtime_ns
+
+    parsed = json.loads(raw)
+    subcategory_names = frozenset(sub for subs in parsed.values() for sub in subs if sub != "other")
+    all_subcategories = dict.fromkeys(sub for subs in parsed.values() for sub in subs)
+    return CategoryIndex(
+        text=raw.decode("utf-8"),
+        version=hashlib.sha256(raw).hexdigest()[:16],
+        mtime_ns=mtime_ns,
+        categories=MappingProxyType({name: frozenset(subs) for name, subs in parsed.items()}),
+        subcategory_names=subcategory_names,
+        category_codes=MappingProxyType({name: code for code, name in enumerate(parsed)}),
+        subcategory_codes=MappingProxyType({name: code for code, name in enumerate(all_subcategories)}),
+    )
+
+
+_index: CategoryIndex | None = None
+_checked_at = 0.0
+
+
+def get_index() -> CategoryIndex:
+    """Current index, reloaded if categories.json changed on disk."""
+    global _index, _checked_at
+
+    now = time.monotonic()
+    if _index is not None and now - _checked_at < RELOAD_CHECK_SECONDS:
+        return _index
+
+    _checked_at = now
+    try:
+        mtime_ns = os.stat(CATEGORIES_PATH).st_mtime_ns
+    except OSError:
+        if _index is not None:
+            return _index  # keep serving the last good copy
+        raise
+
+    if _index is None or mtime_ns != _index.mtime_ns:
+        try:
+            _index = load_index()
+        except (OSError, ValueError):
+            if _index is None:
+                raise
+            # Half-written or invalid file: keep the last good copy until it's fixed
+
+    return _index
+
+
+def category_keys(value) -> tuple[str, ...]:
+    """
+    Stored category values a filter for `value` should match: the resolved
+    canonical names, the normalized input itself, and subcategory names it
+    prefixes — the last two catch expenses saved under a category outside
+    categories.json (often a subcategory, e.g. "dining_out").
+    """
+    index = get_index()
+    key = normalize_category(value)
+    if not key:
+        return ()
+    return tuple(dict.fromkeys((
+        *index.resolve(key),
+        key,
+        *sorted(_word_prefix_matches(key, index.subcategory_names)),
+    )))
+
+
+def category_warning(category: str, subcategory: str | None = None) -> str | None:
+    """
+    A note for the reply when `category` (or its `subcategory`), both as
+    stored (normalized), is not in categories.json, with the closest standard names. None when
+    both are standard. The expense is saved either way.
+    """
+    index = get_index()
+    if not index.is_category(category):
+        suggestions = index.resolve(category)
+        hint = f" Did you mean: {', '.join(suggestions)}?" if suggestions else ""
+        return f"'{category}' is not a standard category; it was saved as given.{hint}"
+    if subcategory and not index.is_subcategory(category, subcategory):
+        return f"'{subcategory}' is not a standard {category} subcategory; it was saved as given."
+    return None
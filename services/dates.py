@@ -0,0 +1,158 @@
+# services/dates.py
+"""
+Date parsing shared by every tool.
+
+`parse_date` uses `date.fromisoformat` (C-implemented, far cheaper than
+`strptime`) behind a bounded LRU, since the same few dates repeat across
+calls. Relative terms ("today", "last month", …) are resolved here against
+the server's current date instead of being left to the prompt.
+"""
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+
+# Single-day terms
+DAY_TERMS = {
+    "today": 0,
+    "yesterday": 1,
+    "day before yesterday": 2,
+}
+
+# Period terms → (start, end)
+PERIOD_TERMS = (
+    "this week", "last week",
+    "this month", "last month",
+    "this year", "last year",
+)
+
+
+def today() -> date:
+    return date.today()
+
+
+def _normalize(value: str) -> str:
+    return " ".join(value.strip().lower().replace("_", " ").split())
+
+
+@lru_cache(maxsize=1024)
+def _parse_iso(value: str) -> date:
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        # strptime also accepts unpadded parts like 2025-1-5
+        return datetime.strptime(value, "%Y-%m-%d").date()
+
+
+def parse_date(value: str) -> date:
+    """YYYY-MM-DD or a relative day ("today", "yesterday") → date. Raises ValueError."""
+    if not isinstance(value, str):
+        raise ValueError(f"Invalid date: {value!r}")
+
+    term = _normalize(value)
+    if term in DAY_TERMS:
+        return today() - timedelta(days=DAY_TERMS[term])
+
+    return _parse_iso(value.strip())
+
+
+def is_period(value) -> bool:
+    return isinstance(value, str) and _normalize(value) in PERIOD_TERMS
+
+
+def period_range(value: str) -> tuple[date, date]:
+    """"this week" / "last month" / … → inclusive (start, end). Raises ValueError."""
+    term = _normalize(value)
+    now = today()
+
+    if term in ("this week", "last week"):
+        start = now - timedelta(days=now.weekday())             # Monday
+        if term == "last week":
+            start -= timedelta(days=7)
+        return start, start + timedelta(days=6)
+
+    if term in ("this month", "last month"):
+        start = now.replace(day=1)
+        if term == "last month":
+            start = (start - timedelta(days=1)).replace(day=1)
+        end = (start.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
+        return start, end
+
+    if term in ("this year", "last year"):
+        year = now.year if term == "this year" else now.year - 1
+        return date(year, 1, 1), date(year, 12, 31)
+
+    raise ValueError(f"Unknown period: {value!r}")
+
+
+def expand_period(start_date, end_date):
+    """
+    If `start_date` names a period ("last month") and `end_date` is empty or
+    the same term, return the period as ISO (start, end). Otherwise unchanged.
+    """
+    if is_period(start_date) and (not end_date or _normalize(end_date) == _normalize(start_date)):
+        start, end = period_range(start_date)
+        return start.isoformat(), end.isoformat()
+    return start_date, end_date
+
+
+BUCKETS = ("day", "week", "month")
+
+
+def bucket_start(d: date, bucket: str) -> date:
+    """First day of the day/week (Monday)/month bucket holding `d`."""
+    if bucket == "day":
+        return d
+    if bucket == "week":
+        return d - timedelta(days=d.weekday())
+    if bucket == "month":
+        return d.replace(day=1)
+    raise ValueError(f"Unknown bucket: {bucket!r}")
+
+
+def next_bucket(d: date, bucket: str) -> date:
+    """Start of the bucket after the one starting at `d`."""
+    if bucket == "month":
+        return (d.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return d + timedelta(days=7 if bucket == "week" else 1)
+
+
+def _add_months(d: date, months: int) -> date:
+    index = d.year * 12 + d.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def previous_window(start: date, end: date) -> tuple[date, date]:
+    """
+    The window to compare [start, end] against: the same number of whole
+    months before it when the range is whole months (March → February),
+    otherwise the same number of days immediately before it.
+    """
+    if start.day == 1 and (end + timedelta(days=1)).day == 1:
+        months = (end.year - start.year) * 12 + end.month - start.month + 1
+        return _add_months(start, -months), start - timedelta(days=1)
+
+    length = end - start + timedelta(days=1)
+    return start - length, start - timedelta(days=1)
+
+
+def parse_month(value=None) -> date:
+    """
+    First day of a month. Empty means this month; also accepts "YYYY-MM",
+    a date ("2025-03-14", "today") and "this/last/next month". Raises ValueError.
+    """
+    if not value:
+        return today().replace(day=1)
+    if not isinstance(value, str):
+        raise ValueError(f"Invalid month: {value!r}")
+
+    term = _normalize(value)
+    if term in ("this month", "last month", "next month"):
+        return _add_months(today(), {"this month": 0, "last month": -1, "next month": 1}[term])
+
+    parts = value.strip().split("-")
+    if len(parts) == 2:
+        try:
+            return date(int(parts[0]), int(parts[1]), 1)
+        except ValueError:
+            raise ValueError(f"Invalid month: {value!r}") from None
+
+    return parse_date(value).replace(day=1)
@@ -0,0 +1,213 @@
+# services/export.py
+"""
+Export files for `export_expenses`.
+
+The tool streams the user's rows from a server-side cursor and hands them
+over a chunk at a time (`EXPORT_CHUNK_ROWS`). Each chunk is written to the
+file before the next one is fetched, so memory stays bounded by the chunk
+size however many rows are exported.
+
+    csv       header + one line per expense, amounts as exact decimals
+              ("12.50"); compress=True gzips the file (.csv.gz)
+    parquet   one row group per chunk, amounts as int64 cents; needs
+              pyarrow, the `parquet` extra (`uv sync --extra parquet`
+              or `pip install ".[parquet]"`). compress=True selects the
+              gzip column codec instead of snappy. The file stays a plain
+              .parquet, which readers expect.
+
+A file is written under a `.part` name and renamed when it is complete,
+so a half-written export is never served. Finished files live in
+EXPORT_DIR, one directory per user (a hash of the user id). They are read
+back in EXPORT_PART_BYTES pieces through the
+`expense://exports/{user_id}/{export_id}/{part}` resource. Files older
+than EXPORT_TTL_SECONDS are no longer served, and are removed whenever a
+new export starts. Workers
+on one host share the directory; workers on separate hosts need a shared
+EXPORT_DIR for resource reads to find the file.
+
+Settings (defaults in brackets):
+
+    EXPORT_DIR            where export files are written        [<tmp>/kharchamind-exports]
+    EXPORT_CHUNK_ROWS     rows fetched and written per chunk     [10000]
+    EXPORT_PART_BYTES     bytes per resource part                [1048576]
+    EXPORT_TTL_SECONDS    age at which export files are deleted  [3600]
+"""
+import os
+import re
+import csv
+import gzip
+import time
+import hashlib
+import secrets
+import tempfile
+import importlib.util
+from pathlib import Path
+
+from services.env import env_int
+from services.money import format_cents
+
+EXPORT_DIR = Path(os.getenv("EXPORT_DIR") or Path(tempfile.gettempdir()) / "kharchamind-exports")
+EXPORT_CHUNK_ROWS = max(1, env_int("EXPORT_CHUNK_ROWS", 10_000))
+EXPORT_PART_BYTES = max(1024, env_int("EXPORT_PART_BYTES", 1024 * 1024))
+EXPORT_TTL_SECONDS = env_int("EXPORT_TTL_SECONDS", 3600)
+
+EXPORT_FORMATS = ("csv", "parquet")
+
+# Columns in file order (rows arrive in db.reads.EXPENSE_COLUMNS order)
+HEADER = ("id", "date", "amount", "category", "subcategory", "note")
+
+_EXPORT_ID = re.compile(r"[0-9a-f]{16}")
+
+
+def parquet_available() -> bool:
+    return importlib.util.find_spec("pyarrow") is not None
+
+
+def suffix(format: str, compress: bool) -> str:
+    if format == "parquet":
+        return ".parquet"
+    return ".csv.gz" if compress else ".csv"
+
+
+def mime_type(format: str, compress: bool) -> str:
+    if format == "parquet":
+        return "application/vnd.apache.parquet"
+    return "application/gzip" if compress else "text/csv"
+
+
+# ---------- WRITERS ---------- #
+
+class CsvExport:
+    def __init__(self, path: Path, compress: bool):
+        if compress:
+            self._file = gzip.open(path, "wt", encoding="utf-8", newline="")
+        else:
+            self._file = open(path, "w", encoding="utf-8", newline="")
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(HEADER)
+
+    def write(self, rows):
+        self._writer.writerows(
+            (row.id, row.date.isoformat(), format_cents(row.amount_cents),
+             row.category, row.subcategory or "", row.note or "")
+            for row in rows
+        )
+
+    def close(self):
+        self._file.close()
+
+
+class ParquetExport:
+    def __init__(self, path: Path, compress: bool):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self._pa = pa
+        self._schema = pa.schema([
+            ("id", pa.int64()),
+            ("date", pa.date32()),
+            ("amount_cents", pa.int64()),
+            ("category", pa.string()),
+            ("subcategory", pa.string()),
+            ("note", pa.string()),
+        ])
+        self._writer = pq.ParquetWriter(path, self._schema, compression="gzip" if compress else "snappy")
+
+    def write(self, rows):
+        columns = list(zip(*rows)) if rows else [()] * len(self._schema)
+        table = self._pa.Table.from_arrays(
+            [self._pa.array(column, type=field.type) for column, field in zip(columns, self._schema)],
+            schema=self._schema,
+        )
+        self._writer.write_table(table)
+
+    def close(self):
+        self._writer.close()
+
+
+# ---------- FILES ---------- #
+
+def _user_dir(user_id: str) -> Path:
+    # Hashed: user ids are not trusted as path components
+    return EXPORT_DIR / hashlib.sha256(user_id.encode()).hexdigest()[:32]
+
+
+class ExportFile:
+    """One export being written: `write` chunks, then `finish` (or `discard` on failure)."""
+
+    def __init__(self, user_id: str, format: str, compress: bool):
+        self.export_id = secrets.token_hex(8)
+        self.format = format
+        self.compress = compress
+        self.rows = 0
+
+        directory = _user_dir(user_id)
+        directory.mkdir(parents=True, exist_ok=True)
+        self.path = directory / f"{self.export_id}{suffix(format, compress)}"
+        self._partial = self.path.with_name(self.path.name + ".part")
+        writer = ParquetExport if format == "parquet" else CsvExport
+        self._writer = writer(self._partial, compress)
+
+    def write(self, rows):
+        """Append one chunk (Rows or tuples in EXPENSE_COLUMNS order). Blocking: run off the loop."""
+        self._writer.write(rows)
+        self.rows += len(rows)
+
+    def finish(self) -> int:
+        """Close and publish the file. Returns its size in bytes."""
+        self._writer.close()
+        os.replace(self._partial, self.path)
+        return self.path.stat().st_size
+
+    def discard(self):
+        try:
+            self._writer.close()
+        finally:
+            self._partial.unlink(missing_ok=True)
+
+
+def _expired(mtime: float, now: float | None = None) -> bool:
+    return EXPORT_TTL_SECONDS > 0 and mtime < (now or time.time()) - EXPORT_TTL_SECONDS
+
+
+def find_export(user_id: str, export_id: str, now: float | None = None) -> Path | None:
+    """The finished export `export_id` if it belongs to `user_id` and hasn't expired."""
+    if not _EXPORT_ID.fullmatch(export_id):
+        return None
+    for candidate in _user_dir(user_id).glob(f"{export_id}.*"):
+        if candidate.suffix == ".part":
+            continue
+        try:
+            # Not swept yet (that only happens when an export starts) but past its TTL
+            if _expired(candidate.stat().st_mtime, now):
+                return None
+        except FileNotFoundError:
+            return None     # swept meanwhile
+        return candidate
+    return None
+
+
+def read_part(path: Path, part: int) -> bytes:
+    """Bytes [part * EXPORT_PART_BYTES, (part + 1) * EXPORT_PART_BYTES) of the file."""
+    with open(path, "rb") as f:
+        f.seek(part * EXPORT_PART_BYTES)
+        return f.read(EXPORT_PART_BYTES)
+
+
+def part_count(size: int) -> int:
+    return max(1, -(-size // EXPORT_PART_BYTES))
+
+
+def sweep(now: float | None = None) -> int:
+    """Delete export files (finished or abandoned) older than EXPORT_TTL_SECONDS. Returns how many."""
+    if EXPORT_TTL_SECONDS <= 0 or not EXPORT_DIR.is_dir():
+        return 0
+    removed = 0
+    for path in EXPORT_DIR.glob("*/*"):
+        try:
+            if _expired(path.stat().st_mtime, now):
+                path.unlink()
+                removed += 1
+        except FileNotFoundError:
+            continue    # another worker swept it first
+    return removed
@@ -0,0 +1,139 @@
+# services/flight.py
+"""
+Request coalescing and per-user concurrency limits for tool calls.
+
+`SingleFlight.coalesced(tool)` makes concurrent identical read calls — same
+tool, user and arguments — share one in-flight task and its result, so an
+agent retrying or fanning out costs one session and one query. The shared
+task is shielded: a caller that goes away doesn't cancel it for the others.
+Write tools call `forget_user` after committing, so a read issued after a
+write never joins a flight that started before it.
+
+`UserLimiter.limited` caps how many calls one user can have running at
+once, so a single tenant can't hold every pooled connection.
+
+Settings (defaults in brackets):
+
+    COALESCE_ENABLED        share identical in-flight reads     [true]
+    USER_MAX_CONCURRENCY    running tool calls per user, 0=off  [4]
+"""
+import json
+import asyncio
+import inspect
+import functools
+
+from services.env import env_int, env_bool
+
+
+def _bind(fn):
+    """(user_id, args key) extractor for a tool whose first parameter is `user_id`."""
+    signature = inspect.signature(fn)
+
+    def bind(args, kwargs) -> tuple[str, str]:
+        bound = signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        params = dict(bound.arguments)
+        user_id = params.pop("user_id")
+        return user_id, json.dumps(params, sort_keys=True, default=str)
+
+    return bind
+
+
+class SingleFlight:
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._flights = {}      # (tool, user_id, args) -> asyncio.Task
+        self.started = 0
+        self.joined = 0
+
+    def forget_user(self, user_id: str):
+        """Stop new calls for `user_id` from joining flights already running."""
+        for key in [key for key in self._flights if key[1] == user_id]:
+            del self._flights[key]
+
+    def coalesced(self, tool: str):
+        """Decorator for a read-only tool whose first parameter is `user_id`."""
+
+        def decorate(fn):
+            bind = _bind(fn)
+
+            @functools.wraps(fn)
+            async def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return await fn(*args, **kwargs)
+
+                user_id, params = bind(args, kwargs)
+                key = (tool, user_id, params)
+
+                task = self._flights.get(key)
+                if task is None:
+                    task = asyncio.ensure_future(fn(*args, **kwargs))
+                    self._flights[key] = task
+                    task.add_done_callback(functools.partial(self._land, key))
+                    self.started += 1
+                else:
+                    self.joined += 1
+
+                return await asyncio.shield(task)
+
+            return wrapper
+
+        return decorate
+
+    def _land(self, key, task):
+        if self._flights.get(key) is task:
+            del self._flights[key]
+        if not task.cancelled():
+            task.exception()    # retrieved: callers that are gone won't log it
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "in_flight": len(self._flights),
+            "started": self.started,
+            "joined": self.joined,
+        }
+
+
+class UserLimiter:
+    def __init__(self, limit: int):
+        self.limit = limit
+        self._slots = {}        # user_id -> [Semaphore, holders + waiters]
+        self.waits = 0
+
+    def limited(self, fn):
+        """Run `fn` (first parameter `user_id`) within its user's concurrency slots."""
+
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            if self.limit <= 0:
+                return await fn(*args, **kwargs)
+
+            user_id = args[0] if args else kwargs["user_id"]
+            slot = self._slots.get(user_id)
+            if slot is None:
+                slot = self._slots[user_id] = [asyncio.Semaphore(self.limit), 0]
+
+            slot[1] += 1
+            try:
+                if slot[0].locked():
+                    self.waits += 1
+                async with slot[0]:
+                    return await fn(*args, **kwargs)
+            finally:
+                slot[1] -= 1
+                if not slot[1]:
+                    del self._slots[user_id]    # idle users don't keep a semaphore
+
+        return wrapper
+
+    def stats(self) -> dict:
+        return {
+            "limit": self.limit,
+            "active_users": len(self._slots),
+            "waits": self.waits,
+        }
+
+
+single_flight = SingleFlight(enabled=env_bool("COALESCE_ENABLED", True))
+user_limiter = UserLimiter(limit=env_int("USER_MAX_CONCURRENCY", 4))
@@ -0,0 +1,80 @@
+# services/ingest.py
+"""
+Parsing and up-front validation for bulk expense imports.
+
+Rows may arrive as a list of dicts, CSV text (header row required) or JSONL
+text. Every row is validated before anything touches the database, so an
+import either goes in whole or not at all.
+"""
+import io
+import csv
+import json
+
+from services.dates import parse_date
+from services.money import to_cents
+from services.categories import normalize_category
+
+FIELDS = ("date", "amount", "category", "subcategory", "note")
+
+
+def parse_csv(text: str) -> list[dict]:
+    reader = csv.DictReader(io.StringIO(text.strip()))
+    return [{k.strip().lower(): v for k, v in row.items() if k} for row in reader]
+
+
+def parse_jsonl(text: str) -> list:
+    rows = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            rows.append(json.loads(line))
+        except ValueError:
+            rows.append(line)  # reported as invalid by validate_rows
+    return rows
+
+
+def _clean(row) -> tuple[dict | None, str | None]:
+    if not isinstance(row, dict):
+        return None, "Row is not an object."
+
+    raw_date = str(row.get("date") or "").strip()
+    if not raw_date:
+        return None, "Missing date."
+    try:
+        parsed_date = parse_date(raw_date)
+    except ValueError:
+        return None, f"Invalid date '{raw_date}'. Use YYYY-MM-DD."
+
+    raw_amount = row.get("amount")
+    if raw_amount in (None, ""):
+        return None, "Missing amount."
+    try:
+        amount_cents = to_cents(raw_amount)
+    except ValueError:
+        return None, f"Invalid amount '{raw_amount}'."
+
+    category = normalize_category(row.get("category") or "")
+    if not category:
+        return None, "Missing category."
+
+    return {
+        "date": parsed_date,
+        "amount_cents": amount_cents,
+        "category": category,
+        "subcategory": normalize_category(row.get("subcategory") or "") or None,
+        "note": (str(row.get("note") or "").strip() or None),
+    }, None
+
+
+def validate_rows(rows: list) -> tuple[list[dict], list[dict]]:
+    """Return (clean rows, errors). `errors` holds {"row", "status", "message"} per bad row."""
+    clean, errors = [], []
+    for i, row in enumerate(rows, start=1):
+        cleaned, error = _clean(row)
+        if error:
+            errors.append({"row": i, "status": "error", "message": error})
+        else:
+            clean.append(cleaned)
+    return clean, errors
@@ -0,0 +1,49 @@
+# services/log.py
+"""
+Level-gated, non-blocking logging for the server.
+
+Tool code only enqueues records (QueueHandler); a background listener thread
+does the actual write to stderr. stdout is left alone — the stdio transport
+speaks the MCP protocol over it.
+
+    LOG_LEVEL   DEBUG | INFO | WARNING | ERROR   [INFO]
+"""
+import os
+import sys
+import queue
+import atexit
+import logging
+from logging.handlers import QueueHandler, QueueListener
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+
+# Our own loggers follow LOG_LEVEL; third-party libraries stay at WARNING
+APP_LOGGERS = ("kharchamind", "db", "services")
+
+_listener = None
+
+
+def setup_logging(level: str = LOG_LEVEL):
+    """Route the root logger through a queue to a stderr writer thread (idempotent)."""
+    global _listener
+    if _listener is not None:
+        return
+
+    records = queue.SimpleQueue()
+    writer = logging.StreamHandler(sys.stderr)
+    writer.setFormatter(logging.Formatter(LOG_FORMAT))
+
+    root = logging.getLogger()
+    root.setLevel(logging.WARNING)
+    root.addHandler(QueueHandler(records))
+    for name in APP_LOGGERS:
+        logging.getLogger(name).setLevel(level)
+
+    _listener = QueueListener(records, writer, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+
+def get_logger(name: str) -> logging.Logger:
+    return logging.getLogger(name)
@@ -0,0 +1,271 @@
+# services/metrics.py
+"""
+Per-tool metrics in Prometheus text format.
+
+`instrument` wraps a tool coroutine and records:
+- mcp_tool_seconds          total latency histogram
+- mcp_tool_db_seconds       time spent inside database round trips
+- mcp_tool_python_seconds   everything else (row handling, response building)
+- mcp_tool_rows_returned    items in the response's list fields (rows of a columnar listing)
+- mcp_tool_calls_total      calls by response status (ok, ask_input, error, …)
+
+Database time is collected from SQLAlchemy cursor events into a per-call
+ContextVar, so concurrent calls never mix their numbers. `render()` produces
+the text served at /metrics. Kept dependency-free on purpose.
+
+Every worker process keeps its own numbers. With METRICS_DIR set (the
+multi-worker server sets it to a fresh directory), each worker publishes
+a JSON snapshot there every METRICS_PUBLISH_SECONDS, and /metrics, served
+by whichever worker takes the scrape, adds up the tool metrics of every
+snapshot, so counters are totals for the whole server and never jump
+between scrapes. Other workers' numbers are at most one interval old.
+Gauges (pool, cache, ...) describe one process and are not added up:
+each worker's appear with a `worker="<pid>"` label. A worker that shuts
+down keeps its counts in the total but drops its gauges.
+
+Settings (defaults in brackets):
+
+    METRICS_DIR               where workers publish snapshots      [unset = this process only]
+    METRICS_PUBLISH_SECONDS   seconds between snapshots             [5]
+"""
+import os
+import json
+import time
+import asyncio
+import functools
+from pathlib import Path
+from bisect import bisect_left
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from sqlalchemy import event
+
+from services.env import env_int
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+ROW_BUCKETS = (0, 1, 5, 10, 50, 100, 500, 1000, 5000, 10000)
+
+METRICS_DIR = Path(os.environ["METRICS_DIR"]) if os.getenv("METRICS_DIR") else None
+METRICS_PUBLISH_SECONDS = env_int("METRICS_PUBLISH_SECONDS", 5)
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, buckets):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        self._series = defaultdict(lambda: [[0] * (len(self.buckets) + 1), 0.0, 0])
+
+    def observe(self, label: str, value: float):
+        counts, _, _ = series = self._series[label]
+        counts[bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def state(self) -> dict:
+        return {label: series for label, series in self._series.items()}
+
+    def merge(self, state: dict):
+        for label, (counts, total, count) in state.items():
+            series = self._series[label]
+            series[0] = [a + b for a, b in zip(series[0], counts)]
+            series[1] += total
+            series[2] += count
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for label, (counts, total, count) in sorted(self._series.items()):
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                lines.append(f'{self.name}_bucket{{tool="{label}",le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{tool="{label}",le="+Inf"}} {count}')
+            lines.append(f'{self.name}_sum{{tool="{label}"}} {total:.6f}')
+            lines.append(f'{self.name}_count{{tool="{label}"}} {count}')
+        return lines
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self._values = defaultdict(int)
+
+    def inc(self, tool: str, status: str):
+        self._values[(tool, status)] += 1
+
+    def state(self) -> list:
+        return [[tool, status, value] for (tool, status), value in self._values.items()]
+
+    def merge(self, state: list):
+        for tool, status, value in state:
+            self._values[(tool, status)] += value
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for (tool, status), value in sorted(self._values.items()):
+            lines.append(f'{self.name}{{tool="{tool}",status="{status}"}} {value}')
+        return lines
+
+
+tool_seconds = Histogram("mcp_tool_seconds", "Tool call latency in seconds.", LATENCY_BUCKETS)
+db_seconds = Histogram("mcp_tool_db_seconds", "Time per tool call spent in database round trips.", LATENCY_BUCKETS)
+python_seconds = Histogram(
+    "mcp_tool_python_seconds", "Time per tool call outside the database (row handling, serialization).",
+    LATENCY_BUCKETS,
+)
+rows_returned = Histogram("mcp_tool_rows_returned", "Items returned in list fields per tool call.", ROW_BUCKETS)
+tool_calls = Counter("mcp_tool_calls_total", "Tool calls by response status.")
+
+TOOL_METRICS = (tool_calls, tool_seconds, db_seconds, python_seconds, rows_returned)
+
+# Seconds of DB time for the tool call running in this context
+_db_time: ContextVar[list | None] = ContextVar("db_time", default=None)
+
+
+def track_db_time(engine):
+    """Attach cursor timing listeners to `engine` (an AsyncEngine)."""
+    sync_engine = engine.sync_engine
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info["query_started"] = time.perf_counter()
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        acc = _db_time.get()
+        started = conn.info.pop("query_started", None)
+        if acc is not None and started is not None:
+            acc[0] += time.perf_counter() - started
+
+
+@contextmanager
+def count_statements(engine):
+    """Count every statement sent through `engine` while the block runs (COMMIT excluded)."""
+    counter = {"statements": 0}
+
+    def before_cursor_execute(*args):
+        counter["statements"] += 1
+
+    event.listen(engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield counter
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+
+
+def _count_rows(result) -> int:
+    if not isinstance(result, dict):
+        return 0
+    rows = 0
+    for value in result.values():
+        if isinstance(value, list):
+            rows += len(value)
+        elif isinstance(value, dict) and isinstance(value.get("id"), list):
+            rows += len(value["id"])    # format="columnar": parallel arrays, one id per row
+    return rows
+
+
+def instrument(fn):
+    """Record latency, DB time, rows and status for a tool coroutine."""
+    name = fn.__name__
+
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        acc = [0.0]
+        token = _db_time.set(acc)
+        started = time.perf_counter()
+        status = "exception"
+        result = None
+        try:
+            result = await fn(*args, **kwargs)
+            status = result.get("status", "unknown") if isinstance(result, dict) else "ok"
+            return result
+        finally:
+            elapsed = time.perf_counter() - started
+            _db_time.reset(token)
+            tool_seconds.observe(name, elapsed)
+            db_seconds.observe(name, acc[0])
+            python_seconds.observe(name, max(elapsed - acc[0], 0.0))
+            rows_returned.observe(name, _count_rows(result))
+            tool_calls.inc(name, status)
+
+    return wrapper
+
+
+def _gauges(name: str, help_text: str, values_by_worker: dict) -> list[str]:
+    """One gauge group; `values_by_worker` maps a worker pid (None: no label) to its values."""
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} gauge"]
+    for worker, values in values_by_worker.items():
+        label = "" if worker is None else f',worker="{worker}"'
+        for key, value in values.items():
+            if isinstance(value, bool):
+                value = int(value)
+            if isinstance(value, (int, float)):
+                lines.append(f'{name}{{field="{key}"{label}}} {value}')
+    return lines
+
+
+# ---------- WORKER SNAPSHOTS (METRICS_DIR) ---------- #
+
+def publish(extra_gauges: dict | None = None):
+    """Write this process's snapshot to METRICS_DIR (no-op when unset). `None` gauges: retired."""
+    if METRICS_DIR is None:
+        return
+    snapshot = {
+        "pid": os.getpid(),
+        "tools": {metric.name: metric.state() for metric in TOOL_METRICS},
+        "gauges": extra_gauges,
+    }
+    path = METRICS_DIR / f"{os.getpid()}.json"
+    partial = path.with_name(path.name + ".part")
+    partial.write_text(json.dumps(snapshot))
+    os.replace(partial, path)     # readers never see half a snapshot
+
+
+def _snapshots() -> list[dict]:
+    snapshots = []
+    for path in METRICS_DIR.glob("*.json"):
+        try:
+            snapshots.append(json.loads(path.read_text()))
+        except FileNotFoundError:
+            continue
+    return snapshots
+
+
+async def publish_periodically(gauges, interval: float):
+    """`publish(gauges())` every `interval` seconds until cancelled."""
+    while True:
+        await asyncio.sleep(interval)
+        publish(gauges())
+
+
+def render(extra_gauges: dict | None = None) -> str:
+    """
+    Prometheus text exposition of every metric (plus optional gauge
+    groups, name -> (help, values)). With METRICS_DIR: every worker's.
+    """
+    if METRICS_DIR is None:
+        metrics = TOOL_METRICS
+        gauges = {name: (help_text, {None: values}) for name, (help_text, values) in (extra_gauges or {}).items()}
+    else:
+        publish(extra_gauges)
+        metrics = tuple(
+            Histogram(metric.name, metric.help, metric.buckets) if isinstance(metric, Histogram)
+            else Counter(metric.name, metric.help)
+            for metric in TOOL_METRICS
+        )
+        gauges = {}
+        for snapshot in sorted(_snapshots(), key=lambda snapshot: snapshot["pid"]):
+            for metric in metrics:
+                metric.merge(snapshot["tools"].get(metric.name, {} if isinstance(metric, Histogram) else []))
+            for name, (help_text, values) in (snapshot["gauges"] or {}).items():
+                gauges.setdefault(name, (help_text, {}))[1][snapshot["pid"]] = values
+
+    lines = []
+    for metric in metrics:
+        lines.extend(metric.render())
+    for name, (help_text, values_by_worker) in gauges.items():
+        lines.extend(_gauges(name, help_text, values_by_worker))
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,37 @@
+# services/money.py
+"""
+Amounts are stored as integer minor units (cents / paise) so sums,
+rollups and equality matches are exact. Conversion happens only at the
+tool boundary: inputs go through `to_cents`, responses through `from_cents`.
+"""
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+CENT = Decimal("0.01")
+
+
+def to_cents(value) -> int:
+    """12.5 / "12.50" / Decimal("12.5") → 1250. Raises ValueError."""
+    if isinstance(value, bool):
+        raise ValueError(f"Invalid amount: {value!r}")
+    try:
+        # str() first: Decimal(0.1) would carry the float's binary error along
+        amount = Decimal(str(value).strip())
+    except (InvalidOperation, TypeError):
+        raise ValueError(f"Invalid amount: {value!r}") from None
+    if not amount.is_finite():
+        raise ValueError(f"Invalid amount: {value!r}")
+    return int(amount.quantize(CENT, rounding=ROUND_HALF_UP) * 100)
+
+
+def from_cents(cents) -> float:
+    """1250 → 12.5 for JSON responses (None stays None)."""
+    if cents is None:
+        return None
+    return int(cents) / 100
+
+
+def format_cents(cents) -> str:
+    """1250 → "12.50", -5 → "-0.05": exact decimal text for files and exports."""
+    sign = "-" if cents < 0 else ""
+    whole, fraction = divmod(abs(int(cents)), 100)
+    return f"{sign}{whole}.{fraction:02d}"
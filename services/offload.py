@@ -0,0 +1,64 @@
+# services/offload.py
+"""
+Optional process pool for CPU-heavy response building.
+
+Every tool call on a worker shares one event loop, so encoding a very
+large listing stalls every other request on that worker for as long as it
+takes. `CpuOffload.run` moves such work into a ProcessPoolExecutor once
+the input reaches `OFFLOAD_MIN_ROWS`, and runs it inline below that.
+Arguments and results are pickled across the process boundary, so
+offloading only pays off for large inputs on a machine with spare cores.
+The function must be importable at module level.
+
+Settings (defaults in brackets):
+
+    CPU_OFFLOAD_WORKERS   processes in the pool, 0 = off   [0]
+    OFFLOAD_MIN_ROWS      rows before work is offloaded    [1000]
+"""
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from services.env import env_int
+
+
+class CpuOffload:
+    def __init__(self, workers: int, min_rows: int):
+        self.workers = workers
+        self.min_rows = min_rows
+        self._pool = None
+        self.offloaded = 0
+        self.inline = 0
+
+    def offloads(self, size: int) -> bool:
+        return self.workers > 0 and size >= self.min_rows
+
+    def _executor(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # spawn, not fork: forking a process with a running loop and driver threads is unsafe
+            self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+        return self._pool
+
+    async def run(self, fn, *args, size: int):
+        """`fn(*args)`, in the pool when `size` (rows, items) is large enough."""
+        if not self.offloads(size):
+            self.inline += 1
+            return fn(*args)
+        self.offloaded += 1
+        return await asyncio.get_running_loop().run_in_executor(self._executor(), fn, *args)
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "min_rows": self.min_rows,
+            "offloaded": self.offloaded,
+            "inline": self.inline,
+        }
+
+
+cpu_offload = CpuOffload(workers=env_int("CPU_OFFLOAD_WORKERS", 0), min_rows=env_int("OFFLOAD_MIN_ROWS", 1000))
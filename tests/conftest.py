@@ -0,0 +1,40 @@
+# tests/conftest.py
+"""
+Tests run the tools against a throwaway SQLite file (aiosqlite, from the
+`dev` dependency group). DATABASE_URL is set before anything imports
+db.database, so a developer's .env is never touched.
+
+    uv run pytest
+"""
+import os
+import tempfile
+
+TEST_DB_PATH = os.path.join(tempfile.gettempdir(), "km_test.sqlite3")
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{TEST_DB_PATH}"
+
+import pytest  # noqa: E402
+
+import main as server  # noqa: E402
+from db.database import Base, engine  # noqa: E402
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+async def db():
+    """A fresh schema per test; the result cache and per-user limiter are off."""
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+
+    cache_enabled, limit = server.result_cache.enabled, server.user_limiter.limit
+    server.result_cache.enabled = False
+    server.user_limiter.limit = 0
+    try:
+        yield engine
+    finally:
+        server.result_cache.enabled, server.user_limiter.limit = cache_enabled, limit
+        await engine.dispose()
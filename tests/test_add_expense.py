@@ -0,0 +1,68 @@
+import pytest
+from sqlalchemy import insert
+
+import main as server
+from models.User import User
+
+pytestmark = pytest.mark.anyio
+
+add_expense = server.add_expense.fn
+add_expenses_batch = server.add_expenses_batch.fn
+
+
+@pytest.fixture
+async def alice(db):
+    async with db.begin() as conn:
+        await conn.execute(insert(User), [{"id": "alice", "email": "alice@test.local"}])
+
+
+async def test_standard_category_has_no_warning(alice):
+    result = await add_expense("alice", "2024-03-05", 250, "Food", "dining_out")
+
+    assert result["status"] == "ok"
+    assert "warning" not in result
+
+
+async def test_unknown_category_is_saved_and_flagged(alice):
+    result = await add_expense("alice", "2024-03-05", 250, "fod")
+
+    assert result["status"] == "ok"
+    assert result["data"]["category"] == "fod"
+    assert "not a standard category" in result["warning"]
+    assert "food" in result["warning"]
+
+
+async def test_unknown_subcategory_is_flagged(alice):
+    result = await add_expense("alice", "2024-03-05", 250, "food", "pizza")
+
+    assert result["status"] == "ok"
+    assert "'pizza' is not a standard food subcategory" in result["warning"]
+
+
+async def test_batch_groups_warnings(alice):
+    result = await add_expenses_batch("alice", expenses=[
+        {"date": "2024-03-05", "amount": 10, "category": "food", "subcategory": "groceries"},
+        {"date": "2024-03-06", "amount": 20, "category": "dining"},
+        {"date": "2024-03-07", "amount": 30, "category": "Dining"},
+    ])
+
+    assert result["status"] == "ok"
+    assert result["inserted"] == 3
+    assert len(result["warnings"]) == 1
+    assert result["warnings"][0]["rows"] == 2
+    assert "'dining' is not a standard category" in result["warnings"][0]["message"]
+
+
+async def test_subcategory_is_stored_normalized(alice):
+    result = await add_expense("alice", "2024-03-05", 250, "Food", "Dining Out")
+    assert "warning" not in result
+
+    listing = await server.list_expenses.fn("alice", "2024-03-01", "2024-03-31", format="columnar")
+    expenses = listing["expenses"]
+    assert expenses["dictionary"]["subcategory"][str(expenses["subcategory"][0])] == "dining_out"
+
+    edited = await server.edit_expense.fn("alice", id=result["data"]["id"], new_subcategory="Coffee-Tea")
+    assert edited["updated_expense"]["subcategory"] == "coffee_tea"
+
+    batch = await add_expenses_batch("alice", csv_data="date,amount,category,subcategory\n2024-03-06,5,food,Delivery Fees\n")
+    assert "warnings" not in batch
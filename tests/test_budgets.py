@@ -0,0 +1,44 @@
+import asyncio
+
+import pytest
+from sqlalchemy import insert, select
+
+import main as server
+from db.database import AsyncSessionLocal
+from models.Budget import Budget
+from models.User import User
+
+pytestmark = pytest.mark.anyio
+
+set_budget = server.set_budget.fn
+
+
+@pytest.fixture
+async def alice(db):
+    async with db.begin() as conn:
+        await conn.execute(insert(User), [{"id": "alice", "email": "alice@test.local"}])
+
+
+async def limits() -> list[int]:
+    async with AsyncSessionLocal() as db:
+        return list((await db.scalars(select(Budget.limit_cents))).all())
+
+
+async def test_set_budget_replaces_the_limit(alice):
+    await server.add_expense.fn("alice", "2024-03-05", 30, "food")
+
+    first = await set_budget("alice", "food", 100, "2024-03")
+    second = await set_budget("alice", "food", 120, "2024-03")
+
+    assert first["status"] == second["status"] == "ok"
+    assert second["data"]["spent"] == 30
+    assert second["data"]["remaining"] == 90
+    assert await limits() == [12_000]
+
+
+async def test_concurrent_set_budget_calls_all_succeed(alice):
+    results = await asyncio.gather(*(set_budget("alice", "food", amount, "2024-03") for amount in (10, 20, 30, 40)))
+
+    assert [result["status"] for result in results] == ["ok"] * 4
+    assert len(await limits()) == 1
+    assert (await limits())[0] in (1_000, 2_000, 3_000, 4_000)
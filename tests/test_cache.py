@@ -0,0 +1,249 @@
+import json
+
+import pytest
+
+from services.cache import MemoryBackend, ResultCache
+
+pytestmark = pytest.mark.anyio
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class JsonBackend:
+    """
+    Stand-in for a shared store such as Redis: values are stored as JSON
+    text and decoded on every get, counters never expire, and there is no
+    `stats()`.
+    """
+
+    def __init__(self, clock):
+        self._clock = clock
+        self._data = {}
+        self._counters = {}
+
+    async def get(self, key: str):
+        item = self._data.get(key)
+        if item is None:
+            return None
+        expires_at, payload = item
+        if expires_at <= self._clock():
+            del self._data[key]
+            return None
+        return json.loads(payload)
+
+    async def set(self, key: str, value, ttl: float, size: int):
+        self._data[key] = (self._clock() + ttl, json.dumps(value))
+
+    async def incr(self, key: str) -> int:
+        self._counters[key] = self._counters.get(key, 0) + 1
+        return self._counters[key]
+
+    async def counter(self, key: str) -> int:
+        return self._counters.get(key, 0)
+
+
+def memory_backend(clock, max_entries=100, max_bytes=1 << 20, max_counters=100):
+    return MemoryBackend(max_entries=max_entries, max_bytes=max_bytes, max_counters=max_counters, clock=clock)
+
+
+@pytest.fixture(params=["memory", "json"])
+def backend(request):
+    clock = Clock()
+    backend = memory_backend(clock) if request.param == "memory" else JsonBackend(clock)
+    return backend, clock
+
+
+def counted_tool(cache, status="ok"):
+    """A cached fake read tool that records every call that reaches it."""
+    calls = []
+
+    @cache.cached("list_expenses")
+    async def list_expenses(user_id, category=None, limit=20):
+        calls.append((user_id, category, limit))
+        return {"status": status, "expenses": [{"id": len(calls), "category": category}]}
+
+    return list_expenses, calls
+
+
+async def test_miss_then_hit(backend):
+    backend, _ = backend
+    cache = ResultCache(backend, ttl=60)
+    tool, calls = counted_tool(cache)
+
+    first = await tool("alice", "food")
+    second = await tool("alice", category="food", limit=20)    # same call, spelled differently
+
+    assert second == first
+    assert len(calls) == 1
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+async def test_other_args_and_users_miss(backend):
+    backend, _ = backend
+    cache = ResultCache(backend, ttl=60)
+    tool, calls = counted_tool(cache)
+
+    await tool("alice", "food")
+    await tool("alice", "travel")
+    await tool("bob", "food")
+
+    assert len(calls) == 3
+    assert cache.hits == 0
+
+
+async def test_uncacheable_status_is_not_stored(backend):
+    backend, _ = backend
+    cache = ResultCache(backend, ttl=60)
+    tool, calls = counted_tool(cache, status="error")
+
+    await tool("alice")
+    await tool("alice")
+
+    assert len(calls) == 2
+
+
+async def test_entries_expire_after_ttl(backend):
+    backend, clock = backend
+    cache = ResultCache(backend, ttl=60)
+    tool, calls = counted_tool(cache)
+
+    await tool("alice")
+    clock.now += 59
+    await tool("alice")
+    assert len(calls) == 1
+
+    clock.now += 1
+    await tool("alice")
+    assert len(calls) == 2
+
+
+async def test_invalidate_user_bumps_generation(backend):
+    backend, _ = backend
+    cache = ResultCache(backend, ttl=60)
+    tool, calls = counted_tool(cache)
+
+    await tool("alice")
+    await tool("bob")
+    await cache.invalidate_user("alice")
+
+    assert await backend.counter("gen:alice") == 1
+    await tool("alice")     # new generation: recomputed
+    await tool("bob")       # untouched
+    assert [user for user, _, _ in calls] == ["alice", "bob", "alice"]
+
+    await tool("alice")     # and cached again under the new generation
+    assert len(calls) == 3
+    assert cache.invalidations == 1
+
+
+async def test_lru_eviction_by_entries():
+    backend = memory_backend(Clock(), max_entries=2)
+    cache = ResultCache(backend, ttl=60)
+    tool, calls = counted_tool(cache)
+
+    await tool("alice", "a")
+    await tool("alice", "b")
+    await tool("alice", "a")    # hit: "a" is now the most recent
+    await tool("alice", "c")    # evicts "b", the least recent
+
+    assert backend.stats()["entries"] == 2
+    assert backend.evictions == 1
+    await tool("alice", "a")
+    assert len(calls) == 3
+    await tool("alice", "b")
+    assert len(calls) == 4
+
+
+async def test_eviction_by_bytes():
+    entry_size = len(json.dumps({"status": "ok", "expenses": [{"id": 1, "category": "a"}]}))
+    backend = memory_backend(Clock(), max_bytes=2 * entry_size)
+    cache = ResultCache(backend, ttl=60)
+    tool, calls = counted_tool(cache)
+
+    for category in "abc":
+        await tool("alice", category)
+
+    assert backend.bytes <= 2 * entry_size
+    assert backend.stats()["entries"] == 2
+    await tool("alice", "a")    # the oldest entry went first
+    assert len(calls) == 4
+
+
+async def test_oversized_result_is_not_stored():
+    backend = memory_backend(Clock(), max_bytes=10)
+    cache = ResultCache(backend, ttl=60)
+    tool, calls = counted_tool(cache)
+
+    await tool("alice")
+    await tool("alice")
+
+    assert len(calls) == 2
+    assert backend.bytes == 0
+
+
+async def test_generation_counters_are_bounded():
+    backend = memory_backend(Clock(), max_counters=2)
+    cache = ResultCache(backend, ttl=60)
+    tool, calls = counted_tool(cache)
+
+    await cache.invalidate_user("alice")
+    await tool("alice")                     # cached under alice's generation 1
+    await tool("dave")                      # dave never wrote: cached under the epoch
+    await cache.invalidate_user("bob")
+    await cache.invalidate_user("carol")    # alice's counter is the least recently used
+
+    assert backend.stats()["generations"] == 2
+    assert backend.stats()["generation_evictions"] == 1
+
+    # Without her counter alice must not land back on a generation she already used
+    await tool("alice")
+    await tool("dave")
+    assert [user for user, _, _ in calls] == ["alice", "dave", "alice", "dave"]
+
+    await tool("alice")                     # cached again at the new epoch
+    assert len(calls) == 4
+
+
+async def test_epoch_passes_every_evicted_generation():
+    backend = memory_backend(Clock(), max_counters=1)
+
+    for _ in range(5):
+        await backend.incr("gen:alice")
+    await backend.incr("gen:bob")           # evicts alice at 5
+
+    assert await backend.counter("gen:alice") == 6
+    assert await backend.counter("gen:bob") == 1
+    assert await backend.incr("gen:alice") == 7    # and evicts bob at 1: epoch 7
+    assert await backend.counter("gen:bob") == 7
+
+
+async def test_disabled_cache_passes_through(backend):
+    backend, _ = backend
+    cache = ResultCache(backend, ttl=60, enabled=False)
+    tool, calls = counted_tool(cache)
+
+    await tool("alice")
+    await tool("alice")
+    await cache.invalidate_user("alice")
+
+    assert len(calls) == 2
+    assert await backend.counter("gen:alice") == 0
+
+
+async def test_stats_with_and_without_backend_stats():
+    clock = Clock()
+    for backend in (memory_backend(clock), JsonBackend(clock)):
+        cache = ResultCache(backend, ttl=60)
+        tool, _ = counted_tool(cache)
+        await tool("alice")
+        await tool("alice")
+
+        stats = cache.stats()
+        assert stats["hit_ratio"] == 0.5
+        assert ("entries" in stats) == isinstance(backend, MemoryBackend)
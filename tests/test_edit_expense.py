@@ -0,0 +1,68 @@
+from datetime import date
+
+import pytest
+from sqlalchemy import insert
+
+import main as server
+from models.Expense import Expense
+from models.User import User
+from services.metrics import count_statements
+
+pytestmark = pytest.mark.anyio
+
+edit_expense = server.edit_expense.fn
+
+
+async def add_row(engine, user_id="alice", **values) -> int:
+    async with engine.begin() as conn:
+        await conn.execute(insert(User), [{"id": user_id, "email": f"{user_id}@test.local"}])
+        result = await conn.execute(insert(Expense).values(
+            user_id=user_id, date=date(2024, 3, 5), amount_cents=25_000,
+            category="food", subcategory="restaurant", note="", **values,
+        ))
+    return result.inserted_primary_key[0]
+
+
+async def test_id_edit_is_one_statement(db):
+    expense_id = await add_row(db)
+
+    with count_statements(db) as counter:
+        result = await edit_expense("alice", id=expense_id, new_note="team lunch")
+
+    assert result["status"] == "ok"
+    assert result["updated_expense"]["note"] == "team lunch"
+    assert counter["statements"] == 1, counter
+
+
+async def test_match_edit_is_bounded(db):
+    await add_row(db)
+
+    with count_statements(db) as counter:
+        result = await edit_expense("alice", date="2024-03-05", amount=250, new_note="team lunch")
+
+    assert result["status"] == "ok"
+    # One bounded SELECT for the match, then the UPDATE
+    assert counter["statements"] == 2, counter
+
+
+async def test_rollup_edit_is_bounded(db):
+    expense_id = await add_row(db)
+
+    with count_statements(db) as counter:
+        result = await edit_expense("alice", id=expense_id, new_amount=300)
+
+    assert result["status"] == "ok"
+    assert result["updated_expense"]["amount"] == 300
+    # Locked read of the old row, the UPDATE and one rollup upsert
+    assert counter["statements"] <= 3, counter
+
+
+async def test_other_users_expense_is_refused(db):
+    expense_id = await add_row(db)
+
+    for changes in ({"new_note": "mine now"}, {"new_amount": 1}):
+        result = await edit_expense("other", id=expense_id, **changes)
+        assert result == {"status": "error", "message": server.NOT_YOUR_EXPENSE}
+
+    untouched = await edit_expense("alice", id=expense_id, new_note="still alice's")
+    assert untouched["updated_expense"]["amount"] == 250
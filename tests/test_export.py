@@ -0,0 +1,76 @@
+import os
+import csv
+import time
+from datetime import date
+
+import pytest
+from sqlalchemy import insert
+
+import main as server
+from models.Expense import Expense
+from models.User import User
+from services import export as exports
+
+pytestmark = pytest.mark.anyio
+
+export_expenses = server.export_expenses.fn
+
+ROWS = [
+    (date(2024, 1, 3), 12_550, "food", "restaurant", "office lunch"),
+    (date(2024, 2, 14), 99_900, "shopping", None, None),
+    (date(2024, 2, 29), 1, "travel", "cab", "uber, airport"),
+]
+
+
+@pytest.fixture
+async def expenses(db, monkeypatch, tmp_path):
+    monkeypatch.setattr(exports, "EXPORT_DIR", tmp_path)
+    async with db.begin() as conn:
+        await conn.execute(insert(User), [{"id": "alice", "email": "alice@test.local"}])
+        await conn.execute(insert(Expense), [
+            {"user_id": "alice", "date": day, "amount_cents": cents,
+             "category": category, "subcategory": subcategory, "note": note}
+            for day, cents, category, subcategory, note in ROWS
+        ])
+
+
+async def test_parquet_round_trip(expenses):
+    pq = pytest.importorskip("pyarrow.parquet")
+
+    result = await export_expenses("alice", "2024-01-01", "2024-12-31", format="parquet")
+
+    assert result["status"] == "ok"
+    assert result["rows"] == len(ROWS)
+    table = pq.read_table(result["path"])
+    assert table.column_names == ["id", "date", "amount_cents", "category", "subcategory", "note"]
+    assert [tuple(row[name] for name in ("date", "amount_cents", "category", "subcategory", "note"))
+            for row in table.to_pylist()] == ROWS
+
+
+async def test_csv_round_trip(expenses):
+    result = await export_expenses("alice", "2024-01-01", "2024-12-31")
+
+    with open(result["path"], newline="", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    assert [(row["date"], row["amount"], row["note"]) for row in rows] == [
+        ("2024-01-03", "125.50", "office lunch"),
+        ("2024-02-14", "999.00", ""),
+        ("2024-02-29", "0.01", "uber, airport"),
+    ]
+
+
+async def test_expired_export_is_not_served(expenses):
+    result = await export_expenses("alice", "2024-01-01", "2024-12-31")
+    export_id = result["export_id"]
+
+    assert exports.find_export("alice", export_id) is not None
+    assert exports.find_export("bob", export_id) is None
+
+    later = time.time() + exports.EXPORT_TTL_SECONDS + 1
+    assert exports.find_export("alice", export_id, now=later) is None
+
+    # Same for a file that has been sitting there, through the resource
+    stale = time.time() - exports.EXPORT_TTL_SECONDS - 1
+    os.utime(result["path"], (stale, stale))
+    with pytest.raises(ValueError, match="expired"):
+        await server.export_part.fn("alice", export_id, "0")
@@ -0,0 +1,89 @@
+import os
+import json
+from collections import defaultdict
+
+import pytest
+
+from services import metrics
+
+
+@pytest.fixture
+def fresh_metrics(monkeypatch):
+    """Empty tool metrics for the test, restored afterwards."""
+    for metric in metrics.TOOL_METRICS:
+        if isinstance(metric, metrics.Histogram):
+            monkeypatch.setattr(metric, "_series", defaultdict(metric._series.default_factory))
+        else:
+            monkeypatch.setattr(metric, "_values", defaultdict(int))
+
+
+def sample(text: str, series: str) -> float | None:
+    for line in text.splitlines():
+        if line.startswith(series + " "):
+            return float(line.rsplit(" ", 1)[1])
+    return None
+
+
+def test_single_process_render_has_no_worker_label(fresh_metrics, monkeypatch):
+    monkeypatch.setattr(metrics, "METRICS_DIR", None)
+    metrics.tool_calls.inc("list_expenses", "ok")
+
+    text = metrics.render({"db_pool": ("Pool.", {"checked_out": 2, "enabled": True})})
+
+    assert sample(text, 'mcp_tool_calls_total{tool="list_expenses",status="ok"}') == 1
+    assert sample(text, 'db_pool{field="checked_out"}') == 2
+    assert sample(text, 'db_pool{field="enabled"}') == 1
+    assert "worker=" not in text
+
+
+def test_render_sums_every_workers_snapshot(fresh_metrics, monkeypatch, tmp_path):
+    monkeypatch.setattr(metrics, "METRICS_DIR", tmp_path)
+
+    # Another worker's last published snapshot
+    other = metrics.Histogram(metrics.tool_seconds.name, "", metrics.LATENCY_BUCKETS)
+    other.observe("list_expenses", 0.2)
+    (tmp_path / "1.json").write_text(json.dumps({
+        "pid": 1,
+        "tools": {metrics.tool_calls.name: [["list_expenses", "ok", 5]], other.name: other.state()},
+        "gauges": {"db_pool": ["Pool.", {"checked_out": 3}]},
+    }))
+    # A worker that shut down: its counts stay, its gauges are gone
+    (tmp_path / "2.json").write_text(json.dumps({
+        "pid": 2, "tools": {metrics.tool_calls.name: [["list_expenses", "ok", 10]]}, "gauges": None,
+    }))
+
+    metrics.tool_calls.inc("list_expenses", "ok")
+    metrics.tool_seconds.observe("list_expenses", 0.02)
+    text = metrics.render({"db_pool": ("Pool.", {"checked_out": 1})})
+
+    assert sample(text, 'mcp_tool_calls_total{tool="list_expenses",status="ok"}') == 16
+    assert sample(text, 'mcp_tool_seconds_count{tool="list_expenses"}') == 2
+    assert sample(text, 'mcp_tool_seconds_bucket{tool="list_expenses",le="0.025"}') == 1
+    assert sample(text, 'mcp_tool_seconds_bucket{tool="list_expenses",le="0.25"}') == 2
+    assert sample(text, 'db_pool{field="checked_out",worker="1"}') == 3
+    assert sample(text, f'db_pool{{field="checked_out",worker="{os.getpid()}"}}') == 1
+    assert 'worker="2"' not in text
+    assert text.count("# TYPE db_pool gauge") == 1
+
+    # Rendering published this process's snapshot for the other workers
+    assert (tmp_path / f"{os.getpid()}.json").exists()
+    assert sample(metrics.render(), 'mcp_tool_calls_total{tool="list_expenses",status="ok"}') == 16
+
+
+@pytest.mark.anyio
+async def test_rows_returned_counts_rows_and_columnar_listings(fresh_metrics):
+    listings = {
+        "rows": {"status": "ok", "expenses": [{"id": 1}, {"id": 2}, {"id": 3}]},
+        "columnar": {"status": "ok", "total": 3, "expenses": {"id": [1, 2, 3], "date": ["2024-01-01"] * 3}},
+    }
+
+    @metrics.instrument
+    async def list_expenses(format):
+        return listings[format]
+
+    for format in listings:
+        await list_expenses(format)
+
+    text = metrics.render()
+    assert sample(text, 'mcp_tool_rows_returned_sum{tool="list_expenses"}') == 6
+    assert sample(text, 'mcp_tool_rows_returned_bucket{tool="list_expenses",le="1"}') == 0
@@ -0,0 +1,47 @@
+from datetime import date
+
+import pytest
+from sqlalchemy import insert, select
+
+from db.migrations import apply_migrations, schema_version, _seed_expense_ids
+from models.Expense import Expense
+from models.IdSequence import IdSequence
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_migration_8_normalizes_subcategories(db):
+    async with db.begin() as conn:
+        await conn.execute(insert(schema_version), [
+            {"version": version, "description": "applied"} for version in range(1, 8)
+        ])
+        await conn.execute(insert(Expense), [
+            {"user_id": "alice", "date": date(2024, 3, 5), "amount_cents": 100, "category": "food",
+             "subcategory": subcategory}
+            for subcategory in ("Dining Out", "dining_out", " ", None)
+        ])
+
+    async with db.begin() as conn:
+        applied = await conn.run_sync(apply_migrations)
+        stored = (await conn.scalars(select(Expense.subcategory).order_by(Expense.id))).all()
+
+    assert applied == [8, 9]
+    assert stored == ["dining_out", "dining_out", None, None]
+
+
+async def test_id_sequence_seeded_above_existing_ids(db):
+    async with db.begin() as conn:
+        await conn.execute(insert(schema_version), [
+            {"version": version, "description": "applied"} for version in range(1, 9)
+        ])
+        await conn.execute(insert(Expense), [
+            {"id": 41, "user_id": "alice", "date": date(2024, 3, 5), "amount_cents": 100, "category": "food"}
+        ])
+
+    async with db.begin() as conn:
+        applied = await conn.run_sync(apply_migrations)
+        await conn.run_sync(_seed_expense_ids)     # already there: no second row
+        seeded = (await conn.execute(select(IdSequence.name, IdSequence.next_id))).all()
+
+    assert applied == [9]
+    assert seeded == [("expenses", 42)]
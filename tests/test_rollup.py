@@ -0,0 +1,113 @@
+import fcntl
+import asyncio
+from datetime import date
+
+import pytest
+from sqlalchemy import insert, update
+
+import main as server
+from db import budgets
+from db.budgets import reconcile
+from db.database import AsyncSessionLocal
+from db.rollup import verify_user
+from models.ExpenseRollup import ExpenseRollup
+from models.User import User
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def alice(db):
+    async with db.begin() as conn:
+        await conn.execute(insert(User), [{"id": "alice", "email": "alice@test.local"}])
+    await server.add_expense.fn("alice", "2024-03-05", 10, "food")
+    return db
+
+
+async def corrupt(engine):
+    async with engine.begin() as conn:
+        await conn.execute(update(ExpenseRollup).where(ExpenseRollup.user_id == "alice").values(total_cents=1))
+
+
+async def total_spent() -> float:
+    return (await server.summarize.fn("alice", "2024-03-01", "2024-03-31"))["total_spent"]
+
+
+async def test_verify_reports_and_repairs_drift(alice):
+    await corrupt(alice)
+
+    async with AsyncSessionLocal() as db:
+        report = await verify_user(db, "alice", repair=True)
+        await db.commit()
+    assert report["repaired"] and report["mismatches"]
+
+    async with AsyncSessionLocal() as db:
+        assert (await verify_user(db, "alice"))["mismatches"] == []
+    assert await total_spent() == 10
+
+
+async def test_repair_keeps_a_write_committed_while_it_runs(alice):
+    await corrupt(alice)
+
+    async with AsyncSessionLocal() as db:
+        execute = db.execute
+        concurrent = []
+
+        async def execute_then_add(*args, **kwargs):
+            result = await execute(*args, **kwargs)
+            if not concurrent:
+                # Another call adds an expense right after the repair's first statement
+                concurrent.append(asyncio.create_task(server.add_expense.fn("alice", "2024-03-06", 7, "food")))
+                await asyncio.sleep(0.1)
+            return result
+
+        db.execute = execute_then_add
+        report = await verify_user(db, "alice", repair=True)
+        await db.commit()
+
+    added = await concurrent[0]
+    assert report["repaired"]
+    assert added["status"] == "ok"
+
+    async with AsyncSessionLocal() as db:
+        assert (await verify_user(db, "alice"))["mismatches"] == []
+    assert await total_spent() == 17
+
+
+async def test_reconcile_repairs_real_drift_only(alice, monkeypatch):
+    assert (await server.set_budget.fn("alice", "food", 100, "2024-03"))["status"] == "ok"
+    async with AsyncSessionLocal() as db:
+        report = await reconcile(db, date(2024, 3, 1), repair=True)
+    assert (report["checked"], report["mismatches"]) == (1, [])
+
+    await corrupt(alice)
+    async with AsyncSessionLocal() as db:
+        report = await reconcile(db, date(2024, 3, 1), repair=True)
+        await db.commit()
+    assert [m["category"] for m in report["mismatches"]] == ["food"]
+    assert report["repaired_users"] == ["alice"]
+    assert await total_spent() == 10
+
+    # Drift that is gone by the time the user is locked is not rebuilt
+    async def clean(db, user_id, repair=False):
+        return {"repaired": False}
+
+    await corrupt(alice)
+    monkeypatch.setattr("db.budgets.verify_user", clean)
+    async with AsyncSessionLocal() as db:
+        report = await reconcile(db, date(2024, 3, 1), repair=True)
+    assert report["mismatches"] and report["repaired_users"] == []
+
+
+def test_only_one_process_reconciles(monkeypatch, tmp_path):
+    lock = tmp_path / "reconcile.lock"
+    monkeypatch.setattr(budgets, "RECONCILE_LOCK", str(lock))
+    monkeypatch.setattr(budgets, "_lock_file", None)
+
+    with open(lock, "a") as other_worker:
+        fcntl.flock(other_worker, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        assert not budgets._holds_reconcile_lock()
+
+    assert budgets._holds_reconcile_lock()
+    assert budgets._holds_reconcile_lock()      # and keeps it
+    budgets._lock_file.close()
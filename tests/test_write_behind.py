@@ -0,0 +1,87 @@
+from datetime import date
+
+import anyio
+import pytest
+from sqlalchemy import insert, select
+from sqlalchemy.exc import OperationalError
+
+from db.write_behind import IdBlocks, WriteBehind
+from models.Expense import Expense
+from models.User import User
+
+pytestmark = pytest.mark.anyio
+
+
+def expense_row():
+    return {"user_id": "alice", "date": date(2024, 3, 5), "amount_cents": 25_000,
+            "category": "food", "subcategory": None, "note": None}
+
+
+@pytest.fixture
+async def alice(db):
+    async with db.begin() as conn:
+        await conn.execute(insert(User), [{"id": "alice", "email": "alice@test.local"}])
+    return db
+
+
+async def stored_ids(engine) -> list[int]:
+    async with engine.connect() as conn:
+        return list((await conn.scalars(select(Expense.id))).all())
+
+
+@pytest.mark.parametrize("mode", ["group", "behind"])
+async def test_submit_commits_queued_row(alice, mode):
+    writer = WriteBehind(mode, batch_size=10, delay=0.001, queue_max=10, id_block=10)
+    writer.start()
+    try:
+        expense_id = await writer.submit(expense_row())
+    finally:
+        await writer.stop()
+
+    assert await stored_ids(alice) == [expense_id]
+    assert writer.stats()["rows"] == 1
+
+
+async def test_submit_after_stop_during_id_reservation_still_writes(alice):
+    writer = WriteBehind("group", batch_size=10, delay=0.001, queue_max=10, id_block=10)
+    committed = []
+    writer.start(on_commit=lambda user_id: _record(committed, user_id))
+
+    take = writer.ids.take
+
+    async def take_while_stopping(n=1):
+        ids = await take(n)
+        await writer.stop()     # the server shut down while the id was being reserved
+        return ids
+
+    writer.ids.take = take_while_stopping
+    with anyio.fail_after(5):     # a row left on the dead writer's queue never lands
+        expense_id = await writer.submit(expense_row())
+
+    assert await stored_ids(alice) == [expense_id]
+    assert writer.stats()["queued"] == 0
+    assert not writer._pending
+    assert committed == ["alice"]
+
+
+async def _record(committed, user_id):
+    committed.append(user_id)
+
+
+async def test_reserve_retries_a_mysql_deadlock(alice, monkeypatch):
+    import db.write_behind as write_behind
+
+    attempts = []
+
+    class DeadlocksOnce:
+        def begin(self):
+            attempts.append(1)
+            if len(attempts) == 1:
+                raise OperationalError("INSERT INTO id_sequences", {}, Exception(1213, "Deadlock found"))
+            return alice.begin()
+
+    monkeypatch.setattr(write_behind, "engine", DeadlocksOnce())
+    ids = IdBlocks(Expense.__table__, block_size=10)
+
+    assert await ids.take(2) == range(1, 3)
+    assert len(attempts) == 2